@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Cached inventory of the resources in an Azure resource group.
+
+One `az resource list --resource-group` call per group answers every
+"does this resource exist?" check made while importing and destroying.
+The inventory is kept until something changes the group (a deletion),
+at which point the caller invalidates it and the next lookup lists it again.
+Whether several groups exist is answered by one `az group list` for all of them.
+
+Only a ResourceGroupNotFound error means a group is absent. Any other failure
+of the listing (auth, throttling, network) raises InventoryError and is not
+cached, so a transient error is never mistaken for "nothing to import or delete".
+"""
+
+import json
+import subprocess
+
+SUBNET_TYPE = 'Microsoft.Network/virtualNetworks/subnets'
+VIRTUAL_NETWORK_TYPE = 'Microsoft.Network/virtualNetworks'
+
+# Inventories keyed by resource group name, None when the group does not exist
+_inventories = {}
+
+
+class InventoryError(Exception):
+    """The resources of a group could not be listed, so their existence is unknown."""
+
+
+def _resource_key(resource_type, resource_name):
+    """Azure resource types and names are case-insensitive."""
+    return (resource_type.lower(), resource_name.lower())
+
+
+def load_inventory(resource_group_name):
+    """List every resource in the group with a single az call.
+
+    Returns a dict keyed by (type, name), or None if the group does not exist.
+    Raises InventoryError if az fails for any other reason.
+    """
+    try:
+        result = subprocess.run(
+            ["az", "resource", "list",
+             "--resource-group", resource_group_name,
+             "--query", "[].{name: name, type: type, id: id}",
+             "--output", "json"],
+            capture_output=True,
+            text=True,
+            check=False
+        )
+    except FileNotFoundError:
+        print("Warning: Azure CLI not found, assuming no resources exist")
+        return None
+
+    if result.returncode != 0:
+        # A missing group is reported as an error by az resource list
+        if 'ResourceGroupNotFound' in result.stderr:
+            return None
+        raise InventoryError(f"Could not list the resources of {resource_group_name}: "
+                             f"{result.stderr.strip() or f'exit code {result.returncode}'}")
+
+    inventory = {}
+    for resource in json.loads(result.stdout or '[]'):
+        inventory[_resource_key(resource['type'], resource['name'])] = resource
+    return inventory
+
+
+def get_inventory(resource_group_name, refresh=False):
+    """Return the cached inventory for the group, listing it on first use."""
+    if refresh or resource_group_name not in _inventories:
+        _inventories[resource_group_name] = load_inventory(resource_group_name)
+    return _inventories[resource_group_name]
+
+
+def invalidate_inventory(resource_group_name=None):
+    """Drop the cached inventory so the next lookup lists the group again."""
+    if resource_group_name is None:
+        _inventories.clear()
+    else:
+        _inventories.pop(resource_group_name, None)
+
+
+def list_resource_groups():
+    """Provisioning state of every resource group in the subscription, from a single az call.
+
+    Returns a dict keyed by lower-cased group name, or None if the groups could not be listed.
+    """
+    try:
+        result = subprocess.run(
+            ["az", "group", "list", "--output", "json"],
+            capture_output=True,
+            text=True,
+            check=False
+        )
+    except FileNotFoundError:
+        print("Warning: Azure CLI not found, cannot list resource groups")
+        return None
+
+    if result.returncode != 0:
+        return None
+
+    return {
+        group['name'].lower(): (group.get('properties') or {}).get('provisioningState')
+        for group in json.loads(result.stdout or '[]')
+    }
+
+
+def existing_resource_groups(resource_group_names):
+    """Return the given groups that exist, checked with one listing of all groups.
+
+    Falls back to one check per group if the groups could not be listed. A group
+    that can't be checked either is counted as existing, so a teardown still
+    tries to delete it and reports it as remaining instead of skipping it.
+    """
+    groups = list_resource_groups()
+    if groups is None:
+        return [name for name in resource_group_names if _group_exists_or_unknown(name)]
+    return [name for name in resource_group_names if name.lower() in groups]
+
+
+def _group_exists_or_unknown(resource_group_name):
+    try:
+        return resource_group_exists(resource_group_name)
+    except InventoryError as e:
+        print(f"Warning: {e}, treating {resource_group_name} as still there")
+        return True
+
+
+def resource_group_exists(resource_group_name):
+    """Check if a resource group exists."""
+    return get_inventory(resource_group_name) is not None
+
+
+def list_resources(resource_group_name):
+    """Return the resources in the group as a list of {name, type, id} dicts."""
+    inventory = get_inventory(resource_group_name)
+    return list(inventory.values()) if inventory else []
+
+
+def subnet_exists(subnet_id):
+    """Ask for a subnet by its id; az resource list does not return subnets."""
+    result = subprocess.run(
+        ["az", "network", "vnet", "subnet", "show", "--ids", subnet_id,
+         "--query", "id", "-o", "tsv"],
+        capture_output=True,
+        text=True,
+        check=False
+    )
+    if result.returncode == 0:
+        return bool(result.stdout.strip())
+    if 'NotFound' in result.stderr:
+        return False
+    raise InventoryError(f"Could not look up subnet {subnet_id}: "
+                         f"{result.stderr.strip() or f'exit code {result.returncode}'}")
+
+
+def resource_exists(resource_group_name, resource_type, resource_name, parent_name=None):
+    """Check if an Azure resource exists in the group.
+
+    Subnets are child resources: pass the name of their virtual network as parent_name.
+    """
+    inventory = get_inventory(resource_group_name)
+    if inventory is None:
+        return False
+
+    # Subnets are not returned by az resource list. Without their virtual
+    # network they can't exist; with it, the subnet itself is looked up.
+    if resource_type.lower() == SUBNET_TYPE.lower():
+        vnet = inventory.get(_resource_key(VIRTUAL_NETWORK_TYPE, parent_name or ''))
+        return vnet is not None and subnet_exists(f"{vnet['id']}/subnets/{resource_name}")
+
+    return _resource_key(resource_type, resource_name) in inventory
+
+
+def resource_exists_by_id(resource_id):
+    """Check if the resource with the given ARM id exists.
+
+    Handles resource group ids and provider ids, including one level of child
+    resource (e.g. virtualNetworks/<vnet>/subnets/<subnet>).
+    """
+    parts = resource_id.strip('/').split('/')
+    # subscriptions/<sub>/resourceGroups/<rg>[/providers/<namespace>/<type>/<name>[/<child type>/<child name>]]
+    resource_group_name = parts[3]
+    if len(parts) <= 4:
+        return resource_group_exists(resource_group_name)
+
+    namespace = parts[5]
+    type_segments = parts[6::2]
+    name_segments = parts[7::2]
+    resource_type = f"{namespace}/{'/'.join(type_segments)}"
+    parent_name = name_segments[-2] if len(name_segments) > 1 else None
+    return resource_exists(resource_group_name, resource_type, name_segments[-1], parent_name)
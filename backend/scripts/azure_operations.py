@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Asynchronous Azure deletions with provisioning-state polling.
+
+Deletions are submitted with --no-wait, so the CLI returns as soon as Azure
+has accepted them. The provisioning state of the group or resource is then
+polled on short intervals that grow while the deletion is in progress, so
+waiting ends as soon as Azure is done instead of after a fixed sleep (or the
+30 second default interval of `az ... wait`). Every wait is recorded as a
+span with the number of polls and the time it took.
+
+Several resource groups are deleted together: all deletions are submitted at
+once and a single `az group list` per poll tracks every one of them.
+
+Environment variables:
+    BITESWIPE_DELETE_DEADLINE       Seconds to wait for one deletion (default: 1800)
+    BITESWIPE_POLL_INTERVAL_SCALE   Factor applied to the polling intervals, e.g. for
+                                    the fake az harness (default: 1)
+"""
+
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import azure_inventory
+import deploy_trace
+import readiness
+
+DELETE_DEADLINE_SECONDS = int(os.getenv('BITESWIPE_DELETE_DEADLINE', '1800'))
+POLL_INTERVAL_SCALE = float(os.getenv('BITESWIPE_POLL_INTERVAL_SCALE', '1'))
+# (first, longest) interval between polls. Small resources go in seconds, a group with a VM takes minutes
+RESOURCE_POLL_INTERVALS = (2.0 * POLL_INTERVAL_SCALE, 10.0 * POLL_INTERVAL_SCALE)
+GROUP_POLL_INTERVALS = (5.0 * POLL_INTERVAL_SCALE, 20.0 * POLL_INTERVAL_SCALE)
+
+# Provisioning state reported once the group or resource no longer exists
+DELETED = "Deleted"
+# Polls a deletion may stay in the state it had before (e.g. Succeeded) without ever
+# reaching Deleting; Azure normally reports Deleting within seconds of accepting it
+MAX_POLLS_BEFORE_DELETING = 6
+
+
+def _provisioning_state(command):
+    """Run a show command. Returns the provisioning state, DELETED, or None if it can't be told."""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, check=False)
+    except FileNotFoundError:
+        return None
+    if result.returncode == 0:
+        return result.stdout.strip() or None
+    # Both ResourceGroupNotFound and ResourceNotFound mean the deletion is complete
+    if result.returncode == 3 or "NotFound" in result.stderr:
+        return DELETED
+    return None
+
+
+def get_group_state(resource_group_name):
+    """Provisioning state of a resource group (e.g. Succeeded, Deleting) or DELETED."""
+    return _provisioning_state(
+        ["az", "group", "show",
+         "--name", resource_group_name,
+         "--query", "properties.provisioningState",
+         "--output", "tsv"]
+    )
+
+
+def get_resource_state(resource_group_name, resource_type, resource_name):
+    """Provisioning state of a resource or DELETED."""
+    return _provisioning_state(
+        ["az", "resource", "show",
+         "--resource-group", resource_group_name,
+         "--resource-type", resource_type,
+         "--name", resource_name,
+         "--query", "properties.provisioningState",
+         "--output", "tsv"]
+    )
+
+
+def get_subnet_state(resource_group_name, vnet_name, subnet_name):
+    """Provisioning state of a subnet or DELETED."""
+    return _provisioning_state(
+        ["az", "network", "vnet", "subnet", "show",
+         "--resource-group", resource_group_name,
+         "--vnet-name", vnet_name,
+         "--name", subnet_name,
+         "--query", "provisioningState",
+         "--output", "tsv"]
+    )
+
+
+def submit_group_delete(resource_group_name, force=False):
+    """Ask Azure to delete a resource group without waiting. Returns True if it was accepted."""
+    result = subprocess.run(
+        ["az", "group", "delete",
+         "--name", resource_group_name,
+         "--yes", "--no-wait"] + (["--force"] if force else []),
+        check=False
+    )
+    return result.returncode == 0
+
+
+def submit_resource_delete(resource_group_name, resource_type, resource_name, force=False):
+    """Ask Azure to delete a resource without waiting. Returns True if it was accepted."""
+    result = subprocess.run(
+        ["az", "resource", "delete",
+         "--resource-group", resource_group_name,
+         "--resource-type", resource_type,
+         "--name", resource_name,
+         "--no-wait"] + (["--force"] if force else []),
+        check=False
+    )
+    return result.returncode == 0
+
+
+def submit_subnet_delete(resource_group_name, vnet_name, subnet_name):
+    """Ask Azure to delete a subnet without waiting. Returns True if it was accepted.
+
+    Subnets are child resources of their virtual network, which
+    `az resource delete --resource-type` can't resolve without it.
+    """
+    result = subprocess.run(
+        ["az", "network", "vnet", "subnet", "delete",
+         "--resource-group", resource_group_name,
+         "--vnet-name", vnet_name,
+         "--name", subnet_name,
+         "--no-wait"],
+        check=False
+    )
+    return result.returncode == 0
+
+
+def _record_state(states, state, polls):
+    """Add a polled state to the observed states. Returns True once deleted, None while pending
+    and False once the deletion has failed: the state is Failed, it went into Deleting and
+    came back out, or it never left its previous state within MAX_POLLS_BEFORE_DELETING polls."""
+    if not states or states[-1] != state:
+        states.append(state)
+    if state == DELETED:
+        return True
+    if state == "Failed":
+        return False
+    if "Deleting" in states:
+        return False if state not in (None, "Deleting") else None
+    if state is not None and polls >= MAX_POLLS_BEFORE_DELETING:
+        return False
+    return None
+
+
+def _report_outcome(label, outcome, states, elapsed, polls, deadline_seconds):
+    if outcome:
+        print(f"[{label}] Deleted after {elapsed:.1f}s ({polls} polls)")
+    elif outcome is False:
+        progress = f"stayed {states[0]}" if len(states) == 1 else f"went {' -> '.join(map(str, states))}"
+        print(f"[{label}] Deletion failed in Azure after {elapsed:.1f}s, state {progress}")
+    else:
+        print(f"[{label}] Still not deleted after {elapsed:.1f}s (deadline {deadline_seconds}s)")
+
+
+def wait_for_deletion(label, get_state, deadline_seconds=DELETE_DEADLINE_SECONDS,
+                      intervals=RESOURCE_POLL_INTERVALS):
+    """Poll get_state() until it reports DELETED. Returns True once deleted.
+
+    Returns False if the deadline passes, or as soon as the deletion failed in
+    Azure: the state is Failed, went into Deleting and came back out of it, or
+    never reached Deleting within MAX_POLLS_BEFORE_DELETING polls.
+    """
+    progress = {'polls': 0, 'states': [], 'outcome': None}
+
+    def check():
+        progress['polls'] += 1
+        progress['outcome'] = _record_state(progress['states'], get_state(), progress['polls'])
+        return progress['outcome'] is not None
+
+    start = time.monotonic()
+    with deploy_trace.span(f"delete {label}", category="delete") as span_args:
+        readiness.poll_until(
+            check,
+            start + deadline_seconds,
+            initial_interval=intervals[0],
+            max_interval=intervals[1],
+        )
+        span_args.update(polls=progress['polls'], states=progress['states'], deleted=bool(progress['outcome']))
+
+    _report_outcome(label, progress['outcome'], progress['states'], time.monotonic() - start,
+                    progress['polls'], deadline_seconds)
+    return bool(progress['outcome'])
+
+
+def wait_for_group_deletions(resource_group_names, deadline_seconds=DELETE_DEADLINE_SECONDS,
+                             intervals=GROUP_POLL_INTERVALS):
+    """Poll the state of several resource groups with one listing per poll.
+
+    Returns a dict of group name to True (deleted) or False (failed or still there at the deadline).
+    """
+    states = {name: [] for name in resource_group_names}
+    outcomes = {}
+    progress = {'polls': 0}
+    start = time.monotonic()
+
+    def check():
+        progress['polls'] += 1
+        groups = azure_inventory.list_resource_groups()
+        if groups is None:
+            return False
+        for name in resource_group_names:
+            if name in outcomes:
+                continue
+            outcome = _record_state(states[name], groups.get(name.lower(), DELETED), progress['polls'])
+            if outcome is not None:
+                outcomes[name] = outcome
+                _report_outcome(name, outcome, states[name], time.monotonic() - start,
+                                progress['polls'], deadline_seconds)
+        return len(outcomes) == len(resource_group_names)
+
+    with deploy_trace.span("delete resource groups", category="delete",
+                           groups=list(resource_group_names)) as span_args:
+        readiness.poll_until(
+            check,
+            start + deadline_seconds,
+            initial_interval=intervals[0],
+            max_interval=intervals[1],
+        )
+        span_args.update(polls=progress['polls'], states=states,
+                         deleted=[name for name, outcome in outcomes.items() if outcome])
+
+    for name in resource_group_names:
+        if name not in outcomes:
+            _report_outcome(name, None, states[name], time.monotonic() - start,
+                            progress['polls'], deadline_seconds)
+    return {name: outcomes.get(name, False) for name in resource_group_names}
+
+
+def submit_group_deletes(resource_group_names, force=False):
+    """Submit the deletion of every group at once. Returns the groups whose deletion Azure accepted."""
+    resource_group_names = list(resource_group_names)
+    if not resource_group_names:
+        return []
+    for name in resource_group_names:
+        print(f"[{name}] Submitting resource group deletion...")
+    with ThreadPoolExecutor(max_workers=len(resource_group_names)) as executor:
+        accepted = list(executor.map(lambda name: submit_group_delete(name, force), resource_group_names))
+
+    for name, was_accepted in zip(resource_group_names, accepted):
+        if not was_accepted:
+            print(f"[{name}] Azure refused the deletion")
+    return [name for name, was_accepted in zip(resource_group_names, accepted) if was_accepted]
+
+
+def delete_groups(resource_group_names, force=False, deadline_seconds=DELETE_DEADLINE_SECONDS):
+    """Submit the deletion of every group at once and wait for all of them together.
+
+    Returns a dict of group name to True if that group is gone.
+    """
+    resource_group_names = list(resource_group_names)
+    results = {name: False for name in resource_group_names}
+    accepted = submit_group_deletes(resource_group_names, force)
+    if accepted:
+        results.update(wait_for_group_deletions(accepted, deadline_seconds))
+    return results
+
+
+def delete_group(resource_group_name, force=False, deadline_seconds=DELETE_DEADLINE_SECONDS):
+    """Delete a resource group and wait for it to be gone. Returns True on success."""
+    return delete_groups([resource_group_name], force, deadline_seconds)[resource_group_name]
+
+
+def delete_resource(resource_group_name, resource_type, resource_name, force=False,
+                    deadline_seconds=DELETE_DEADLINE_SECONDS):
+    """Delete a resource and wait for it to be gone. Returns True on success."""
+    print(f"[{resource_name}] Deleting {resource_type}...")
+    if not submit_resource_delete(resource_group_name, resource_type, resource_name, force):
+        print(f"[{resource_name}] Azure refused the deletion")
+        return False
+    return wait_for_deletion(
+        resource_name,
+        lambda: get_resource_state(resource_group_name, resource_type, resource_name),
+        deadline_seconds,
+        RESOURCE_POLL_INTERVALS,
+    )
+
+
+def delete_subnet(resource_group_name, vnet_name, subnet_name, deadline_seconds=DELETE_DEADLINE_SECONDS):
+    """Delete a subnet of a virtual network and wait for it to be gone. Returns True on success."""
+    print(f"[{subnet_name}] Deleting subnet of {vnet_name}...")
+    if not submit_subnet_delete(resource_group_name, vnet_name, subnet_name):
+        print(f"[{subnet_name}] Azure refused the deletion")
+        return False
+    return wait_for_deletion(
+        subnet_name,
+        lambda: get_subnet_state(resource_group_name, vnet_name, subnet_name),
+        deadline_seconds,
+        RESOURCE_POLL_INTERVALS,
+    )
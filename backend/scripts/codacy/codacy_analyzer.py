@@ -15,9 +15,14 @@ import argparse
 import urllib.request
 import urllib.parse
 import urllib.error
+import time
 from typing import Dict, List, Any, Optional, Union
 from pathlib import Path
 
+# The metrics module is shared with the deploy scripts one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import metrics  # noqa: E402
+
 # ANSI color codes for terminal output
 class Colors:
     GREEN = '\033[92m'
@@ -94,9 +99,10 @@ class CodacyAnalyzer:
         
         try:
             req = urllib.request.Request(url, headers=self.headers)
-            with urllib.request.urlopen(req) as response:
+            with metrics.timer("codacy_api_request", endpoint="branch_diff"), urllib.request.urlopen(req) as response:
                 return json.loads(response.read().decode('utf-8'))
         except urllib.error.HTTPError as e:
+            metrics.inc("codacy_api_errors", endpoint="branch_diff", code=e.code)
             if e.code == 404:
                 print(f"Error: Branch or repository not found. Check that both '{current_branch}' and '{base_branch}' exist.")
                 return {"error": f"Branch or repository not found (404). Check that both '{current_branch}' and '{base_branch}' exist."}
@@ -104,6 +110,7 @@ class CodacyAnalyzer:
                 print(f"HTTP Error {e.code}: {e.reason}")
                 return {"error": f"HTTP Error {e.code}: {e.reason}"}
         except urllib.error.URLError as e:
+            metrics.inc("codacy_api_errors", endpoint="branch_diff", code="network")
             print(f"Error fetching branch diff: {e}")
             return {"error": str(e)}
     
@@ -117,13 +124,15 @@ class CodacyAnalyzer:
         
         try:
             req = urllib.request.Request(url, headers=self.headers)
-            with urllib.request.urlopen(req) as response:
+            with metrics.timer("codacy_api_request", endpoint="pull_requests"), urllib.request.urlopen(req) as response:
                 data = json.loads(response.read().decode('utf-8'))
                 return data.get("data", [])
         except urllib.error.HTTPError as e:
+            metrics.inc("codacy_api_errors", endpoint="pull_requests", code=e.code)
             print(f"HTTP Error {e.code}: {e.reason}")
             return []
         except urllib.error.URLError as e:
+            metrics.inc("codacy_api_errors", endpoint="pull_requests", code="network")
             print(f"Error fetching pull requests: {e}")
             return []
     
@@ -138,7 +147,7 @@ class CodacyAnalyzer:
         
         try:
             req = urllib.request.Request(url, headers=self.headers)
-            with urllib.request.urlopen(req) as response:
+            with metrics.timer("codacy_api_request", endpoint="pull_request_issues"), urllib.request.urlopen(req) as response:
                 data = json.loads(response.read().decode('utf-8'))
                 issues = data.get("data", [])
                 if issues:
@@ -146,6 +155,8 @@ class CodacyAnalyzer:
                 else:
                     print("No issues found at standard endpoint, trying detailed PR info...")
         except urllib.error.URLError as e:
+            metrics.inc("codacy_api_errors", endpoint="pull_request_issues",
+                        code=getattr(e, 'code', None) or "network")
             print(f"Error fetching PR issues: {e}")
         
         # If no issues found, try getting detailed PR info
@@ -157,7 +168,7 @@ class CodacyAnalyzer:
         
         try:
             req = urllib.request.Request(url, headers=self.headers)
-            with urllib.request.urlopen(req) as response:
+            with metrics.timer("codacy_api_request", endpoint="pull_request"), urllib.request.urlopen(req) as response:
                 data = json.loads(response.read().decode('utf-8'))
                 print(f"PR Details: {json.dumps(data, indent=2)}")
                 
@@ -174,9 +185,11 @@ class CodacyAnalyzer:
                 
                 return issues
         except urllib.error.HTTPError as e:
+            metrics.inc("codacy_api_errors", endpoint="pull_request", code=e.code)
             print(f"HTTP Error {e.code} for PR details: {e.reason}")
             return []
         except urllib.error.URLError as e:
+            metrics.inc("codacy_api_errors", endpoint="pull_request", code="network")
             print(f"Error fetching PR details: {e}")
             return []
     
@@ -443,6 +456,18 @@ class CodacyAnalyzer:
                 print(f"    Suggestion: {Colors.BLUE}{suggestion['fix']}{Colors.END}")
 
 
+def record_analysis_metrics(analysis: Dict):
+    """Issue counts of the analysis as gauges, so CI can graph them per run"""
+    metrics.set_gauge("codacy_analysis_ok", int("error" not in analysis))
+    metrics.set_gauge("codacy_issue_count", analysis.get("total_issues", 0))
+    for severity, count in analysis.get("by_severity", {}).items():
+        metrics.set_gauge("codacy_issues_by_severity", count, severity=severity)
+    for delta_type, count in analysis.get("by_delta_type", {}).items():
+        metrics.set_gauge("codacy_issues_by_delta", count, delta=delta_type)
+    for category, count in analysis.get("by_category", {}).items():
+        metrics.set_gauge("codacy_issues_by_category", count, category=category)
+
+
 def main():
     """Main function to parse arguments and run the analyzer"""
     parser = argparse.ArgumentParser(description="Codacy Analyzer - Fetch and analyze Codacy issues")
@@ -516,6 +541,7 @@ def main():
     
     # Analyze results
     analysis = analyzer.analyze_results(results)
+    record_analysis_metrics(analysis)
     
     # Generate suggestions
     suggestions = analyzer.suggest_fixes(analysis)
@@ -655,4 +681,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    metrics.configure("codacy_analyzer")
+    started = time.monotonic()
+    try:
+        main()
+    finally:
+        metrics.observe("run", time.monotonic() - started, action="codacy_analysis")
+        metrics.export()
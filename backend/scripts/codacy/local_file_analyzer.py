@@ -16,9 +16,14 @@ import argparse
 import subprocess
 import datetime
 import platform
+import time
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
+# The metrics module is shared with the deploy scripts one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import metrics  # noqa: E402
+
 # ANSI color codes for terminal output
 class Colors:
     GREEN = '\033[92m'
@@ -392,6 +397,20 @@ def print_summary(results: Dict):
     else:
         print(f"{Colors.YELLOW}Unexpected results format. Check the output file for details.{Colors.END}")
 
+def record_lint_metrics(results: Dict):
+    """Issue counts of the lint run as gauges, so CI can graph them per run"""
+    metrics.set_gauge("lint_ok", int("error" not in results))
+    issues = results.get("results")
+    if not isinstance(issues, list):
+        return
+    metrics.set_gauge("lint_issue_count", len(issues))
+    severities = {}
+    for issue in issues:
+        severity = issue.get("severity", "unknown")
+        severities[severity] = severities.get(severity, 0) + 1
+    for severity, count in severities.items():
+        metrics.set_gauge("lint_issues_by_severity", count, severity=severity)
+
 def main():
     """Main function"""
     args = parse_arguments()
@@ -422,15 +441,19 @@ def main():
             sys.exit(1)
     
     # Check Docker image
-    if not check_docker_image(args.verbose):
+    with metrics.timer("docker_image_check"):
+        image_found = check_docker_image(args.verbose)
+    if not image_found:
         print(f"{Colors.RED}Failed to find or build ESLint Docker image. Exiting.{Colors.END}")
         sys.exit(1)
     
     # Run ESLint analysis
-    if analyze_all:
-        results = run_eslint_docker(None, repo_root, args.verbose, not args.no_cache, analyze_all=True)
-    else:
-        results = run_eslint_docker(file_path, repo_root, args.verbose, not args.no_cache)
+    with metrics.timer("lint", scope="all" if analyze_all else "file"):
+        if analyze_all:
+            results = run_eslint_docker(None, repo_root, args.verbose, not args.no_cache, analyze_all=True)
+        else:
+            results = run_eslint_docker(file_path, repo_root, args.verbose, not args.no_cache)
+    record_lint_metrics(results)
     
     # Save results
     output_file = save_results(results, file_path, args.output_dir)
@@ -440,4 +463,10 @@ def main():
     print_summary(results)
 
 if __name__ == "__main__":
-    main()
+    metrics.configure("local_file_analyzer")
+    started = time.monotonic()
+    try:
+        main()
+    finally:
+        metrics.observe("run", time.monotonic() - started, action="lint")
+        metrics.export()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Run a subprocess and stream its output with bounded memory.
+
+stdout and stderr are multiplexed with a selector on the calling thread, so
+no reader threads are started per command. Output is printed as it arrives,
+optionally appended to a log file, and only the last few lines are kept in
+memory for the error report when the command fails.
+
+Commands may be given as an argv list (run without a shell) or, for the
+odd pipeline, as a string (run through the shell).
+"""
+
+import collections
+import os
+import selectors
+import shlex
+import subprocess
+
+# Lines kept in memory for error reports
+DEFAULT_TAIL_LINES = 50
+# Longest partial line buffered before it is emitted anyway (e.g. progress bars without newlines)
+MAX_LINE_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def format_command(command):
+    """Return a printable version of an argv list or shell string."""
+    return command if isinstance(command, str) else shlex.join(str(arg) for arg in command)
+
+
+def stream_command(command, cwd=None, log_file=None, tail_lines=DEFAULT_TAIL_LINES, env=None):
+    """Run a command, streaming its output. Returns (exit code, list of the last output lines)."""
+    tail = collections.deque(maxlen=tail_lines)
+    log = open(log_file, 'a', encoding='utf-8') if log_file else None
+
+    def emit(prefix, raw_line):
+        line = raw_line.decode('utf-8', errors='replace').rstrip('\r')
+        print(f"{prefix}: {line}", flush=True)
+        tail.append(f"{prefix}: {line}")
+        if log:
+            log.write(f"{line}\n")
+
+    try:
+        if log:
+            log.write(f"$ {format_command(command)}\n")
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            env=env,
+            shell=isinstance(command, str),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        selector = selectors.DefaultSelector()
+        selector.register(process.stdout, selectors.EVENT_READ, "OUT")
+        selector.register(process.stderr, selectors.EVENT_READ, "ERR")
+        partial = {"OUT": b"", "ERR": b""}
+
+        while selector.get_map():
+            for key, _ in selector.select():
+                prefix = key.data
+                chunk = os.read(key.fileobj.fileno(), READ_CHUNK_BYTES)
+                if not chunk:
+                    # End of stream: flush whatever is left without a trailing newline
+                    if partial[prefix]:
+                        emit(prefix, partial[prefix])
+                        partial[prefix] = b""
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+
+                *lines, partial[prefix] = (partial[prefix] + chunk).split(b"\n")
+                for line in lines:
+                    emit(prefix, line)
+                if len(partial[prefix]) > MAX_LINE_BYTES:
+                    emit(prefix, partial[prefix])
+                    partial[prefix] = b""
+
+        selector.close()
+        return process.wait(), list(tail)
+    finally:
+        if log:
+            log.close()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Deployment context shared by the deploy/destroy scripts.
+
+Values such as the Azure subscription id, the owner tag and the Terraform
+variable defaults are resolved once per process. The ones that are expensive
+to look up and can't change under the scripts' feet (file parses) are also
+persisted to a short-lived on-disk cache, so scripts chained in one CI job
+skip the lookups. The subscription id is not persisted: `az account set` or
+`az login` may switch it at any time.
+
+Environment variables:
+    BITESWIPE_CONTEXT_CACHE   Path of the on-disk cache
+                              (default: ~/.cache/biteswipe/deploy_context.json)
+    BITESWIPE_CONTEXT_TTL     Lifetime of cached values in seconds, 0 disables
+                              the on-disk cache (default: 900)
+"""
+
+import getpass
+import json
+import os
+import pathlib
+import re
+import subprocess
+import time
+
+# Determine the path to the terraform directory relative to the script
+script_dir = pathlib.Path(__file__).resolve().parent
+TERRAFORM_DIR = script_dir.parent / 'terraform'
+
+CACHE_FILE = pathlib.Path(os.getenv(
+    'BITESWIPE_CONTEXT_CACHE',
+    pathlib.Path.home() / '.cache' / 'biteswipe' / 'deploy_context.json'
+))
+CACHE_TTL_SECONDS = int(os.getenv('BITESWIPE_CONTEXT_TTL', '900'))
+
+# Values resolved by this process
+_memory_cache = {}
+# Contents of the on-disk cache, loaded on first use
+_disk_cache = None
+
+
+def _load_disk_cache():
+    """Read the on-disk cache once, dropping expired entries."""
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = {}
+        if CACHE_TTL_SECONDS > 0:
+            try:
+                with open(CACHE_FILE, 'r') as f:
+                    entries = json.load(f)
+                now = time.time()
+                _disk_cache = {
+                    key: entry for key, entry in entries.items()
+                    if entry.get('expires_at', 0) > now
+                }
+            except (FileNotFoundError, IOError, ValueError):
+                pass
+    return _disk_cache
+
+
+def _save_disk_cache():
+    """Write the on-disk cache atomically so concurrent scripts never read half a file."""
+    if CACHE_TTL_SECONDS <= 0:
+        return
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = CACHE_FILE.with_name(f"{CACHE_FILE.name}.{os.getpid()}.tmp")
+        with open(temp_file, 'w') as f:
+            json.dump(_disk_cache, f, indent=2)
+        os.replace(temp_file, CACHE_FILE)
+    except (IOError, OSError) as e:
+        print(f"Warning: Could not write deployment context cache: {e}")
+
+
+def _cached(key, resolve, persist=True):
+    """Return the value for key, resolving it only if neither cache has it."""
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    if persist:
+        entry = _load_disk_cache().get(key)
+        if entry is not None:
+            _memory_cache[key] = entry['value']
+            return entry['value']
+
+    value = resolve()
+    # Failed lookups are not cached, so the next call tries again
+    if value is not None:
+        _memory_cache[key] = value
+        if persist:
+            _load_disk_cache()[key] = {
+                'value': value,
+                'expires_at': time.time() + CACHE_TTL_SECONDS,
+            }
+            _save_disk_cache()
+    return value
+
+
+def clear_cache():
+    """Forget every cached value, in memory and on disk."""
+    global _disk_cache
+    _memory_cache.clear()
+    _disk_cache = {}
+    if CACHE_FILE.exists():
+        CACHE_FILE.unlink()
+
+
+def _resolve_subscription_id_from_cli():
+    """Ask the Azure CLI for the current subscription id."""
+    try:
+        result = subprocess.run(
+            ["az", "account", "show", "--query", "id", "-o", "tsv"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        subscription_id = result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        print("Warning: Could not get subscription ID from Azure CLI")
+        return None
+
+    if subscription_id:
+        print(f"Using Azure Subscription ID from CLI: {subscription_id}")
+    return subscription_id or None
+
+
+def get_azure_subscription_id():
+    """Get the Azure subscription ID from environment or from az CLI."""
+    subscription_id = os.getenv('ARM_SUBSCRIPTION_ID')
+    if subscription_id:
+        return subscription_id
+
+    # Only kept for this process, a persisted id would outlive a switch of the active account
+    subscription_id = _cached('subscription_id', _resolve_subscription_id_from_cli, persist=False)
+    if not subscription_id:
+        print("Error: Azure subscription ID not found. Make sure you're logged in to Azure CLI or ARM_SUBSCRIPTION_ID is set.")
+    return subscription_id
+
+
+def _read_terraform_variables(variables_file):
+    """Parse the default of every string variable in a Terraform variables file."""
+    with open(variables_file, 'r') as f:
+        content = f.read()
+
+    variables = {}
+    for match in re.finditer(r'variable\s+"([^"]+)"\s+{(.*?)\n}', content, re.DOTALL):
+        default = re.search(r'default\s+=\s+"([^"]+)"', match.group(2))
+        if default:
+            variables[match.group(1)] = default.group(1)
+    return variables
+
+
+def get_terraform_variables(terraform_dir=TERRAFORM_DIR):
+    """Return the string defaults from variables.tf, parsed once per change of the file."""
+    variables_file = pathlib.Path(terraform_dir) / 'variables.tf'
+    stat = variables_file.stat()
+    # The key changes whenever the file does, so edits are never served stale
+    key = f"terraform_variables:{variables_file.resolve()}:{stat.st_mtime_ns}:{stat.st_size}"
+    return _cached(key, lambda: _read_terraform_variables(variables_file))
+
+
+def get_terraform_variable(var_name, terraform_dir=TERRAFORM_DIR):
+    """Read a variable value from the Terraform variables file."""
+    variables = get_terraform_variables(terraform_dir)
+    if var_name in variables:
+        return variables[var_name]
+    raise ValueError(f"Variable {var_name} not found in variables.tf")
+
+
+def _resolve_owner_tag(prefix, read_tfvars, terraform_dir):
+    """Work out the owner tag without any caching."""
+    # First check if a prefix was provided as a command-line argument
+    if prefix:
+        return prefix
+
+    # Check if we're running on GitHub Actions main or develop branch
+    github_ref = os.getenv('GITHUB_REF')
+    if github_ref == 'refs/heads/main':
+        # Use a fixed production tag for main branch
+        return "master"
+    if github_ref == 'refs/heads/develop':
+        # Use a fixed development tag for develop branch
+        return "dev"
+
+    # For any other case, try to read from terraform.tfvars
+    if read_tfvars:
+        try:
+            with open(pathlib.Path(terraform_dir) / "terraform.tfvars", "r") as f:
+                match = re.search(r'owner_tag\s*=\s*"([^"]+)"', f.read())
+                if match:
+                    return match.group(1)
+        except (FileNotFoundError, IOError):
+            pass
+
+    # If no terraform.tfvars, check if we're in GitHub Actions
+    owner = os.getenv('GITHUB_ACTOR')
+    if owner:
+        return owner
+
+    # Fallback to system username for local runs
+    return getpass.getuser()
+
+
+def get_owner_tag(prefix=None, read_tfvars=True, terraform_dir=TERRAFORM_DIR):
+    """Get the owner tag from command-line argument, environment or terraform.tfvars.
+
+    The scripts rewrite terraform.tfvars themselves, so the owner tag is only
+    remembered for the lifetime of the process and never persisted.
+    """
+    key = f"owner_tag:{prefix}:{read_tfvars}:{pathlib.Path(terraform_dir).resolve()}"
+    return _cached(key, lambda: _resolve_owner_tag(prefix, read_tfvars, terraform_dir), persist=False)
+
+
+def get_resource_group_name(owner_tag):
+    """Name of the resource group that holds an owner's deployment."""
+    return f"{owner_tag}-biteswipe-resources"
@@ -3,63 +3,55 @@
 import os
 import subprocess
 import pathlib
-import re
+import signal
 import sys
 import time
-import json
 import argparse
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import command_runner
+import deploy_context
+import deploy_pipeline
+import deploy_trace
+import generate_tfvars
+import metrics
+import readiness
+import service_sync
+import terraform_imports
+import terraform_init
+import terraform_plan_cache
+import terraform_state
+import update_ssh_config_with_new_ips as ssh_config
 
 # Determine the path to the terraform directory relative to the script
 script_dir = pathlib.Path(__file__).resolve().parent
-TERRAFORM_DIR = script_dir.parent / 'terraform'
+BACKEND_DIR = script_dir.parent
+BASE_TERRAFORM_DIR = BACKEND_DIR / 'terraform'
+# Parallel deploys run every environment in its own working copy of BASE_TERRAFORM_DIR
+TERRAFORM_DIR = pathlib.Path(os.getenv('BITESWIPE_TERRAFORM_DIR', BASE_TERRAFORM_DIR))
+ENVIRONMENTS_DIR = BASE_TERRAFORM_DIR / 'environments'
+
+# Where the timing trace of a deployment is written
+TRACE_FILE = pathlib.Path(os.getenv('BITESWIPE_TRACE_FILE', TERRAFORM_DIR / 'deploy_trace.json'))
+
+# Output of every command run by run_command is also appended here
+COMMAND_LOG_FILE = pathlib.Path(os.getenv('BITESWIPE_COMMAND_LOG', TERRAFORM_DIR / 'terraform.log'))
+
+# SSH config host of the deployed VM; parallel deploys add one host per environment
+SSH_HOST_NAME = "CPEN321_SERVER"
+
+# Time limits for the post-apply checks
+SERVER_IP_DEADLINE_SECONDS = 60
+READINESS_DEADLINE_SECONDS = int(os.getenv('BITESWIPE_READINESS_DEADLINE', '180'))
 
 def get_terraform_variable(var_name):
     """Read a variable value from the Terraform variables file."""
-    variables_file = TERRAFORM_DIR / 'variables.tf'
-    with open(variables_file, 'r') as f:
-        content = f.read()
-    
-    # Find the variable block
-    pattern = rf'variable\s+"{var_name}"\s+{{.*?default\s+=\s+"([^"]+)".*?}}'
-    match = re.search(pattern, content, re.DOTALL)
-    if match:
-        return match.group(1)
-    raise ValueError(f"Variable {var_name} not found in variables.tf")
+    return deploy_context.get_terraform_variable(var_name, TERRAFORM_DIR)
 
 def get_owner_tag(prefix=None):
     """Get the owner tag from command-line argument, environment or terraform.tfvars."""
-    # First check if a prefix was provided as a command-line argument
-    if prefix:
-        return prefix
-        
-    # Check if we're running on GitHub Actions main or develop branch
-    github_ref = os.getenv('GITHUB_REF')
-    if github_ref:
-        if github_ref == 'refs/heads/main':
-            # Use a fixed production tag for main branch
-            return "master"
-        elif github_ref == 'refs/heads/develop':
-            # Use a fixed development tag for develop branch
-            return "dev"
-    
-    # For any other case, try to read from terraform.tfvars
-    try:
-        with open(TERRAFORM_DIR / "terraform.tfvars", "r") as f:
-            content = f.read()
-            match = re.search(r'owner_tag\s*=\s*"([^"]+)"', content)
-            if match:
-                return match.group(1)
-    except (FileNotFoundError, IOError):
-        pass
-        
-    # If no terraform.tfvars, check if we're in GitHub Actions
-    owner = os.getenv('GITHUB_ACTOR')
-    if owner:
-        return owner
-        
-    # Fallback to system username for local runs
-    import getpass
-    return getpass.getuser()
+    return deploy_context.get_owner_tag(prefix, terraform_dir=TERRAFORM_DIR)
 
 # Get the private key path from Terraform variables
 AZURE_VM_PRIVATE_KEY_PATHNAME_STR = get_terraform_variable("ssh_private_key_path")
@@ -72,58 +64,44 @@ if not AZURE_VM_PRIVATE_KEY_PATHNAME.is_file():
     raise ValueError("Private key file not found at the specified path.")
 
 
+def run_command_exit_code(command, cwd=None, expected_codes=(0,)):
+    """Run a command, stream its output in real-time and return its exit code.
+
+    Exit codes outside expected_codes are reported as failures. Returns None
+    if the command could not be started.
+    """
+    # e.g. "terraform plan", so the metric labels stay few
+    command_name = " ".join(command_runner.format_command(command).split()[:2])
+    with deploy_trace.span(command_runner.format_command(command), category="command") as span_args, \
+            metrics.timer("command", command=command_name):
+        try:
+            return_code, tail = command_runner.stream_command(command, cwd=cwd, log_file=COMMAND_LOG_FILE)
+        except Exception as e:
+            print(f"Exception occurred while executing command: {command_runner.format_command(command)}")
+            print(f"Exception details: {e}")
+            span_args['error'] = repr(e)
+            metrics.inc("commands", command=command_name, result="error")
+            return None
+        span_args['exit_code'] = return_code
+    metrics.inc("commands", command=command_name, result="ok" if return_code in expected_codes else "failed")
+
+    if return_code in expected_codes:
+        return return_code
+
+    print(f"Command failed with exit code: {return_code}")
+    error_lines = [line for line in tail if line.startswith("ERR: ")]
+    if error_lines:
+        print("Last error output:")
+        for line in error_lines:
+            print(f"  {line}")
+    return return_code
+
 def run_command(command, cwd=None):
-    """Run a command and stream its output in real-time."""
-    try:
-        # Use Popen to create a process we can read from as it runs
-        process = subprocess.Popen(
-            command,
-            cwd=cwd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1  # Line buffered
-        )
-        
-        # Stream output in real-time
-        stdout_data = []
-        stderr_data = []
-        
-        # Function to handle output stream
-        def read_stream(stream, data_list, prefix):
-            for line in iter(stream.readline, ''):
-                if line:
-                    print(f"{prefix}: {line.rstrip()}")
-                    data_list.append(line)
-            stream.close()
-        
-        # Create threads to read stdout and stderr concurrently
-        import threading
-        stdout_thread = threading.Thread(target=read_stream, args=(process.stdout, stdout_data, "OUT"))
-        stderr_thread = threading.Thread(target=read_stream, args=(process.stderr, stderr_data, "ERR"))
-        
-        # Start the threads
-        stdout_thread.start()
-        stderr_thread.start()
-        
-        # Wait for threads to complete
-        stdout_thread.join()
-        stderr_thread.join()
-        
-        # Wait for the process to finish and get the return code
-        return_code = process.wait()
-        
-        if return_code == 0:
-            return True
-        else:
-            print(f"Command failed with exit code: {return_code}")
-            return False
-            
-    except Exception as e:
-        print(f"Exception occurred while executing command: {command}")
-        print(f"Exception details: {e}")
-        return False
+    """Run a command and stream its output in real-time.
+
+    Pass an argv list to run the command without a shell.
+    """
+    return run_command_exit_code(command, cwd) == 0
 
 def set_script_directory():
     # Get the directory where the script is located
@@ -140,401 +118,238 @@ def kill_terraform_processes():
     subprocess.run(["pkill", "terraform"], check=False)
 
 
-def clean_lock_files():
-    # Clean up any existing lock files
-    lock_files = [".terraform.tfstate.lock.info", "terraform.tfstate.lock.info"]
-    for lock_file in lock_files:
-        if os.path.exists(lock_file):
-            os.remove(lock_file)
-
-
-def force_unlock_terraform():
-    # Force unlock if there's a lock
-    try:
-        command = "terraform force-unlock 2>&1"
-        if os.name == "nt":  # Windows
-            grep_command = 'findstr /C:"Lock Info:" /C:"ID:"'
-            awk_command = 'for /f "tokens=2" %i in (\'findstr /C:"ID:"\') do @echo %i'
-        else:  # Unix-like systems
-            grep_command = "grep 'Lock Info:' -A 2 | grep 'ID:'"
-            awk_command = "awk '{print $2}'"
-
-        # Build the full command
-        full_command = f"{command} | {grep_command} | {awk_command}"
-
-        # Execute the command to get the lock ID
-        lock_id = subprocess.check_output(full_command, shell=True, text=True).strip()
-
-        # If a lock ID was found, force unlock
-        if lock_id:
-            subprocess.run(
-                ["terraform", "force-unlock", "-force", lock_id], check=False
-            )
-    except subprocess.CalledProcessError:
-        pass
-
-
-def get_azure_resources(owner_tag):
-    """Get all Azure resources with the given prefix."""
-    try:
-        # List all resources in the resource group
-        result = subprocess.check_output(
-            ["az", "resource", "list", 
-             "--resource-group", f"{owner_tag}-biteswipe-resources",
-             "--query", "[].{name: name, type: type, id: id}",
-             "--output", "json"],
-            text=True
-        )
-        return json.loads(result)
-    except subprocess.CalledProcessError:
-        print(f"Warning: Could not list resources in resource group {owner_tag}-biteswipe-resources")
-        return []
-
-def get_terraform_resource_type(azure_type):
-    """Convert Azure resource type to Terraform resource type."""
-    # Map of Azure resource types to Terraform resource types
-    type_map = {
-        'Microsoft.Network/virtualNetworks': 'azurerm_virtual_network',
-        'Microsoft.Network/publicIPAddresses': 'azurerm_public_ip',
-        'Microsoft.Network/networkSecurityGroups': 'azurerm_network_security_group',
-        'Microsoft.Network/networkInterfaces': 'azurerm_network_interface',
-        'Microsoft.Network/virtualNetworks/subnets': 'azurerm_subnet',
-        'Microsoft.Compute/virtualMachines': 'azurerm_linux_virtual_machine',
-        'Microsoft.Resources/resourceGroups': 'azurerm_resource_group'
-    }
-    return type_map.get(azure_type)
-
-def get_terraform_resource_name(resource_name, owner_tag):
-    """Generate Terraform resource name from Azure resource name."""
-    # Remove the owner prefix from resource name
-    name = resource_name.replace(f"{owner_tag}-biteswipe-", "")
-    
-    # Map of Azure resource names to Terraform resource names
-    name_map = {
-        'network': 'vnet',
-        'public-ip': 'public_ip',
-        'nsg': 'nsg',
-        'nic': 'nic',
-        'internal': 'subnet',
-        'resources': 'rg'
-    }
-    return name_map.get(name, name)
-
 def get_azure_subscription_id():
     """Get the Azure subscription ID from environment or from az CLI."""
-    subscription_id = os.getenv('ARM_SUBSCRIPTION_ID')
-    if not subscription_id:
-        try:
-            # Try to get the subscription ID using az CLI
-            result = subprocess.check_output(
-                ["az", "account", "show", "--query", "id", "-o", "tsv"],
-                text=True
-            ).strip()
-            if result:
-                subscription_id = result
-                print(f"Using Azure Subscription ID from CLI: {subscription_id}")
-                return subscription_id
-        except subprocess.CalledProcessError:
-            print("Warning: Could not get subscription ID from Azure CLI")
-    
-    if not subscription_id:
-        print("Error: Azure subscription ID not found. Make sure you're logged in to Azure CLI or ARM_SUBSCRIPTION_ID is set.")
-    else:
-        print(f"Using Azure Subscription ID from env: {subscription_id}")
-        
-    return subscription_id
-
-def import_resource_group(owner_tag):
-    """Import the resource group into Terraform state."""
-    subscription_id = get_azure_subscription_id()
-    if not subscription_id:
-        print("Warning: Azure subscription ID not found. Skipping resource group import.")
-        return False
-        
-    resource_group_name = f"{owner_tag}-biteswipe-resources"
-    resource_id = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}"
-    
-    try:
-        # Check if the resource group exists
-        print(f"Checking if resource group {resource_group_name} exists...")
-        result = subprocess.run(
-            ["az", "group", "show", "--name", resource_group_name],
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        
-        if result.returncode != 0:
-            print(f"Resource group {resource_group_name} does not exist.")
-            return False
-            
-        print(f"Resource group {resource_group_name} exists. Importing to Terraform state...")
-        subprocess.run(
-            ["terraform", "import", "azurerm_resource_group.rg", resource_id],
-            cwd=TERRAFORM_DIR,
-            check=True
-        )
-        print(f"Successfully imported resource group {resource_group_name}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Warning: Failed to import resource group {resource_group_name}")
-        print(f"Error: {e}")
-        return False
-
-def is_in_terraform_state(resource_address):
-    """Check if a resource is already in the Terraform state."""
-    try:
-        result = subprocess.run(
-            ["terraform", "state", "list", resource_address],
-            cwd=TERRAFORM_DIR,
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        # If the command returns the resource address, it's in the state
-        return resource_address in result.stdout
-    except Exception:
-        # If there's an error, assume it's not in the state
-        return False
+    return deploy_context.get_azure_subscription_id()
 
-def import_existing_resources(owner_tag):
-    """Import existing resources into Terraform state."""
+def import_existing_resources(owner_tag, subscription_id=None):
+    """Generate import blocks for existing resources so the next plan imports them."""
     print(f"\n🔍 Searching for existing resources with prefix '{owner_tag}-biteswipe'...")
     
     # Get subscription ID
-    subscription_id = get_azure_subscription_id()
+    subscription_id = subscription_id or get_azure_subscription_id()
     if not subscription_id:
         print("Cannot import resources: No valid subscription ID")
+        terraform_imports.clear_import_blocks(TERRAFORM_DIR)
         return False
 
-    # Define specific resources to import
-    resources_to_import = [
-        {
-            'type': 'azurerm_resource_group',
-            'name': 'rg',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources"
-        },
-        {
-            'type': 'azurerm_subnet',
-            'name': 'subnet',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/virtualNetworks/{owner_tag}-biteswipe-network/subnets/{owner_tag}-internal"
-        },
-        {
-            'type': 'azurerm_virtual_network',
-            'name': 'vnet',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/virtualNetworks/{owner_tag}-biteswipe-network"
-        },
-        {
-            'type': 'azurerm_network_security_group',
-            'name': 'nsg',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/networkSecurityGroups/{owner_tag}-biteswipe-nsg"
-        },
-        {
-            'type': 'azurerm_public_ip',
-            'name': 'public_ip',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/publicIPAddresses/{owner_tag}-biteswipe-public-ip"
-        },
-        {
-            'type': 'azurerm_network_interface',
-            'name': 'nic',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/networkInterfaces/{owner_tag}-biteswipe-nic"
-        },
-        {
-            'type': 'azurerm_linux_virtual_machine',
-            'name': 'vm',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Compute/virtualMachines/{owner_tag}-biteswipe"
-        },
-        {
-            'type': 'azurerm_network_interface_security_group_association',
-            'name': 'nic_nsg_association',
-            'id': f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/networkInterfaces/{owner_tag}-biteswipe-nic|/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/networkSecurityGroups/{owner_tag}-biteswipe-nsg"
-        }
-    ]
+    # All missing resources are imported together by the terraform plan/apply that follows
+    missing_imports = terraform_imports.find_missing_imports(owner_tag, subscription_id, TERRAFORM_DIR)
+    terraform_imports.write_import_blocks(missing_imports, TERRAFORM_DIR)
+    metrics.set_gauge("pending_imports", len(missing_imports))
 
-    success = True
-    for resource in resources_to_import:
-        resource_type = resource['type']
-        resource_name = resource['name']
-        resource_id = resource['id']
+    if missing_imports:
+        print(f"\n✅ {len(missing_imports)} resource(s) will be imported by the Terraform plan:")
+        for address, _ in missing_imports:
+            print(f"  - {address}")
+    else:
+        print("\n✅ No resources need to be imported.")
+    
+    return True
 
-        # Check if resource already exists in Terraform state
-        check_state_cmd = f"terraform state show {resource_type}.{resource_name}"
-        result = subprocess.run(check_state_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
-        if result.returncode == 0:
-            print(f"Resource {resource_type}.{resource_name} already in Terraform state, skipping import.")
-            continue
-
-        # For network interface security group association, we need to check if it exists in Azure first
-        if resource_type == 'azurerm_network_interface_security_group_association':
-            # Extract NIC and NSG IDs from the composite ID
-            nic_id, nsg_id = resource_id.split('|')
-            
-            # Check if the association exists by checking if the NIC has an NSG
-            check_cmd = ["az", "network", "nic", "show", "--ids", nic_id, "--query", "networkSecurityGroup.id", "-o", "tsv"]
-            result = subprocess.run(check_cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0 and result.stdout.strip() == nsg_id:
-                print(f"Importing {resource_type}.{resource_name}...")
-                import_cmd = f"terraform import {resource_type}.{resource_name} '{resource_id}'"
-                subprocess.run(import_cmd, shell=True, check=True)
-                print(f"✅ Successfully imported {resource_type}.{resource_name}")
-            else:
-                print(f"Resource {resource_id} does not exist in Azure, skipping...")
-            continue
+def plan_terraform_changes(owner_tag, run_mode="app", force_redeploy=False, use_plan_cache=True):
+    """Make sure an up-to-date plan exists. Returns True/False for changes, or None on failure.
 
-        # For all other resources, check if they exist in Azure
-        print(f"Importing {resource_type}.{resource_name}...")
-        import_cmd = f"terraform import {resource_type}.{resource_name} {resource_id}"
-        try:
-            subprocess.run(import_cmd, shell=True, check=True)
-            print(f"✅ Successfully imported {resource_type}.{resource_name}")
-        except subprocess.CalledProcessError as e:
-            print(f"Failed to import {resource_type}.{resource_name}: {e}")
-            success = False
+    A saved plan is reused when nothing it was computed from has changed.
+    """
+    extra_files = [get_terraform_variable("ssh_public_key_path")]
+    fingerprint = terraform_plan_cache.compute_fingerprint(owner_tag, run_mode, TERRAFORM_DIR, extra_files, BACKEND_DIR)
 
-    if success:
-        print("\n✅ All resources imported successfully!")
-    else:
-        print("\n⚠️ Some resources failed to import. Check the logs above for details.")
-    
-    return success
+    if use_plan_cache and not force_redeploy:
+        saved_plan = terraform_plan_cache.load_reusable_plan(fingerprint, TERRAFORM_DIR)
+        if saved_plan is not None:
+            print("\n♻️  Configuration and state unchanged since the last plan, reusing it")
+            metrics.inc("plan_cache", result="hit")
+            return saved_plan['has_changes']
+    metrics.inc("plan_cache", result="miss")
+
+    print("\n📋 Running Terraform plan...")
+    plan_cmd = [
+        "terraform", "plan", "-detailed-exitcode",
+        f"-var=owner_tag={owner_tag}", f"-var=run_mode={run_mode}", f"-var=backend_dir={BACKEND_DIR}",
+        "-out=tfplan"
+    ]
+    if force_redeploy:
+        plan_cmd.append("-replace=null_resource.deploy_backend")
+    exit_code = run_command_exit_code(
+        plan_cmd,
+        cwd=TERRAFORM_DIR,
+        expected_codes=(terraform_plan_cache.PLAN_NO_CHANGES, terraform_plan_cache.PLAN_HAS_CHANGES)
+    )
+    if exit_code not in (terraform_plan_cache.PLAN_NO_CHANGES, terraform_plan_cache.PLAN_HAS_CHANGES):
+        terraform_plan_cache.clear_plan(TERRAFORM_DIR)
+        return None
+    has_changes = exit_code == terraform_plan_cache.PLAN_HAS_CHANGES
 
-def run_terraform_commands(owner_tag, run_mode="app"):
-    """Run Terraform plan and apply commands with prompt for approval."""
+    terraform_plan_cache.save_plan_meta(fingerprint, has_changes, TERRAFORM_DIR)
+    return has_changes
+
+def terraform_init_step(terraform_dir):
+    """Initialize the working directory (skipped when the providers are unchanged)."""
     print("\n🔍 Running Terraform init...")
-    if not run_command("terraform init", cwd=TERRAFORM_DIR):
-        return False
-        
-    # Try to import existing resource group if it exists
-    print("\n🔍 Checking for existing resource group...")
-    import_resource_group_script = script_dir / "import_resource_group.sh"
-    if os.path.exists(import_resource_group_script):
-        # Pass owner_tag as an argument to the script
-        if not run_command(f"{import_resource_group_script} {owner_tag}", cwd=script_dir):
-            print("Warning: Resource group import failed, but continuing with deployment")
-            
-    # Try to import other existing resources
+    if not terraform_init.init_terraform(terraform_dir, runner=run_command):
+        raise deploy_pipeline.StepFailed("Terraform init failed")
+    return {}
+
+
+def import_existing_resources_step(owner_tag, subscription_id):
+    """Find existing resources (including the resource group) that are missing from the state."""
     print("\n🔍 Checking for existing Azure resources...")
     try:
-        import_existing_resources(owner_tag)
+        import_existing_resources(owner_tag, subscription_id)
     except Exception as e:
         print(f"Warning: Resource import failed: {e}")
         print("Continuing with deployment...")
-        
-    print("\n📋 Running Terraform plan...")
-    plan_cmd = f"terraform plan -var=\"owner_tag={owner_tag}\" -var=\"run_mode={run_mode}\" -out=tfplan"
-    if not run_command(plan_cmd, cwd=TERRAFORM_DIR):
-        return False
-        
-    print("\n🚀 Running Terraform apply...")
-    apply_result = run_command("terraform apply -auto-approve tfplan", cwd=TERRAFORM_DIR)
-    
+        terraform_imports.clear_import_blocks(TERRAFORM_DIR)
+    return {}
+
+
+def terraform_plan_step(owner_tag, run_mode, force_redeploy, use_plan_cache):
+    """Make sure an up-to-date plan exists and report whether it has changes."""
+    has_changes = plan_terraform_changes(owner_tag, run_mode, force_redeploy, use_plan_cache)
+    if has_changes is None:
+        terraform_imports.clear_import_blocks(TERRAFORM_DIR)
+        raise deploy_pipeline.StepFailed("Terraform plan failed")
+    return {'has_changes': has_changes}
+
+
+def terraform_apply_step(has_changes):
+    """Apply the plan if it has changes."""
+    if has_changes:
+        print("\n🚀 Running Terraform apply...")
+        apply_result = run_command(["terraform", "apply", "-auto-approve", "tfplan"], cwd=TERRAFORM_DIR)
+        # An applied (or failed) plan is stale either way
+        terraform_plan_cache.clear_plan(TERRAFORM_DIR)
+    else:
+        print("\n✅ No changes. Infrastructure and services are up to date, skipping apply.")
+        apply_result = True
+
+    # The imports are now part of the state (or will be regenerated on the next run)
+    terraform_imports.clear_import_blocks(TERRAFORM_DIR)
+    terraform_state.invalidate_state_index(TERRAFORM_DIR)
+
     if not apply_result:
         print("\n❌ Terraform apply command failed with non-zero exit code!")
-        
+
         # Check if we can get the server IP to determine if it's a partial deployment
-        try:
-            print("\n🔍 Checking for partial deployment...")
-            server_ip = subprocess.check_output(
-                ["terraform", "output", "-raw", "server_public_ip"],
-                cwd=TERRAFORM_DIR
-            ).decode('utf-8').strip()
-            
-            if server_ip:
-                print(f"\n⚠️ Partial deployment detected - VM created (IP: {server_ip}) but services failed")
-                print("This is likely due to Docker Compose or SSH command failures")
-        except Exception:
-            # If we can't get the IP, it's a complete failure
-            pass
-            
-        return False
-        
-    # Verify deployment by checking server IP
-    try:
-        print("\n🔍 Verifying deployment...")
-        server_ip = subprocess.check_output(
-            ["terraform", "output", "-raw", "server_public_ip"],
-            cwd=TERRAFORM_DIR
-        ).decode('utf-8').strip()
-        
-        if not server_ip:
-            print("\n❌ Deployment verification failed: No server IP found")
-            return False
-            
-        print(f"\n✅ Deployment successful! Server IP: {server_ip}")
-        return True
-    except Exception as e:
-        print(f"\n❌ Deployment verification failed: {str(e)}")
-        return False
+        print("\n🔍 Checking for partial deployment...")
+        server_ip = get_server_ip()
+        if server_ip:
+            print(f"\n⚠️ Partial deployment detected - VM created (IP: {server_ip}) but services failed")
+            print("This is likely due to Docker Compose or SSH command failures")
+        raise deploy_pipeline.StepFailed("Terraform apply failed")
+    return {}
+
+
+def server_ip_step():
+    """Read the server IP from the Terraform output, polling on short intervals until it appears."""
+    print("\n🔍 Verifying deployment...")
+    deadline = time.monotonic() + SERVER_IP_DEADLINE_SECONDS
+    server_ip = readiness.poll_until(get_server_ip, deadline)
+    if not server_ip:
+        print(f"\n❌ Deployment verification failed: No server IP found within {SERVER_IP_DEADLINE_SECONDS} seconds")
+        print("Please ensure Terraform has been applied successfully and the Azure resources are properly created.")
+        raise deploy_pipeline.StepFailed("Failed to retrieve server public IP from Terraform output")
+    print(f"\n✅ Deployment successful! Server IP: {server_ip}")
+    return {'server_ip': server_ip}
 
 
-def update_ssh_config():
-    """Update SSH config with the new server IP."""
-    script_path = script_dir / "update_ssh_config_with_new_ips.py"
-    
-    # Get the public IP from Terraform output with retries
-    max_retries = 5
-    retry_delay = 10  # Start with 10 seconds
-    server_ip = None
-    
-    for attempt in range(1, max_retries + 1):
+def get_server_ip():
+    """Read the server IP from the Terraform output, or None if it isn't available."""
+    with deploy_trace.span("terraform output server_public_ip", category="command") as span_args:
         try:
-            print(f"Attempt {attempt}/{max_retries}: Getting server IP from Terraform output...")
             server_ip = subprocess.check_output(
                 ["terraform", "output", "-raw", "server_public_ip"],
                 cwd=TERRAFORM_DIR
             ).decode('utf-8').strip()
-            
-            if server_ip:
-                print(f"Successfully retrieved server IP: {server_ip}")
-                break
-            else:
-                print("Warning: Empty server IP returned from Terraform output.")
         except subprocess.CalledProcessError as e:
-            print(f"Warning: Could not get server IP from Terraform output (Attempt {attempt}/{max_retries})")
-            print(f"Error details: {str(e)}")
-            
-            if attempt < max_retries:
-                wait_time = retry_delay * (2 ** (attempt - 1))  # Exponential backoff
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-            else:
-                print("Error: Failed to get server IP after multiple attempts.")
-                print("Please ensure Terraform has been applied successfully and the Azure resources are properly created.")
-                raise Exception("Failed to retrieve server public IP from Terraform output")
-    
-    if not server_ip:
-        print("Error: Unable to obtain a valid server IP after all retry attempts.")
-        raise Exception("Failed to obtain a valid server IP")
-
-    subprocess.run(
-        [
-            "python3",
-            str(script_path),
-            "CPEN321_SERVER",
-            server_ip,
-            str(AZURE_VM_PRIVATE_KEY_PATHNAME),
-        ],
-        check=True,
-    )
+            print(f"Warning: Could not get server IP from Terraform output: {e}")
+            server_ip = None
+        span_args['found'] = bool(server_ip)
+    return server_ip or None
+
+
+def wait_for_server_ready(server_ip, run_mode="app"):
+    """Probe the VM until it accepts SSH (and HTTPS in app mode) and record the time-to-ready."""
+    # In test mode only the test container runs, so nginx never listens on 443
+    checks = readiness.build_checks(server_ip, check_setup=False, check_https=(run_mode == "app"))
+    with deploy_trace.span("wait for server ready", host=server_ip) as span_args:
+        ready, timings = readiness.wait_until_ready(checks, READINESS_DEADLINE_SECONDS)
+        span_args['ready'] = ready
+        span_args['time_to_ready'] = timings
+    for check, seconds in timings.items():
+        metrics.set_gauge("time_to_ready_seconds", seconds, check=check)
+    metrics.set_gauge("server_ready", int(ready))
+    if not ready:
+        print(f"Warning: {server_ip} did not become ready within {READINESS_DEADLINE_SECONDS} seconds")
+    return ready
+
+
+def update_ssh_config_step(server_ip, run_mode="app", write_ssh_config=True):
+    """Wait for the VM, then point the SSH config host at it."""
+    wait_for_server_ready(server_ip, run_mode)
+
+    if not write_ssh_config:
+        print("Skipping SSH config update")
+        return {'ssh_hosts_changed': []}
+
+    changed = ssh_config.update_hosts({
+        SSH_HOST_NAME: ssh_config.host_options(server_ip, AZURE_VM_PRIVATE_KEY_PATHNAME),
+    })
+    return {'ssh_hosts_changed': changed}
+
+
+def resolve_context_step(prefix):
+    """Resolve the owner tag and subscription id once for every later step."""
+    owner_tag = get_owner_tag(prefix)
+    print(f"\nUsing owner tag: {owner_tag}")
+    return {'owner_tag': owner_tag, 'subscription_id': get_azure_subscription_id()}
+
+
+def generate_tfvars_step(owner_tag, terraform_dir):
+    """Write terraform.tfvars in-process for the resolved owner tag."""
+    print("\n📝 Generating terraform.tfvars...")
+    return {'tfvars_file': generate_tfvars.write_tfvars(owner_tag, terraform_dir)}
+
+
+# The deployment: one process, each step fed with the outputs of the earlier ones
+DEPLOY_PIPELINE = deploy_pipeline.Pipeline(
+    [
+        deploy_pipeline.Step("resolve context", resolve_context_step,
+                             inputs=['prefix'], outputs=['owner_tag', 'subscription_id']),
+        deploy_pipeline.Step("generate tfvars", generate_tfvars_step,
+                             inputs=['owner_tag', 'terraform_dir'], outputs=['tfvars_file']),
+        deploy_pipeline.Step("terraform init", terraform_init_step, inputs=['terraform_dir']),
+        deploy_pipeline.Step("import existing resources", import_existing_resources_step,
+                             inputs=['owner_tag', 'subscription_id']),
+        deploy_pipeline.Step("terraform plan", terraform_plan_step,
+                             inputs=['owner_tag', 'run_mode', 'force_redeploy', 'use_plan_cache'],
+                             outputs=['has_changes']),
+        deploy_pipeline.Step("terraform apply", terraform_apply_step, inputs=['has_changes']),
+        deploy_pipeline.Step("verify deployment", server_ip_step, outputs=['server_ip']),
+        deploy_pipeline.Step("update ssh config", update_ssh_config_step,
+                             inputs=['server_ip', 'run_mode', 'write_ssh_config'], outputs=['ssh_hosts_changed']),
+    ],
+    inputs=['prefix', 'terraform_dir', 'run_mode', 'force_redeploy', 'use_plan_cache', 'write_ssh_config'],
+)
 
 
-def terraform_destroy(owner_tag):
+def terraform_destroy(owner_tag, kill_stale_terraform=True):
     """Run Terraform destroy command to tear down infrastructure."""
     set_script_directory()
     set_terraform_directory()
-    kill_terraform_processes()
+    if kill_stale_terraform:
+        kill_terraform_processes()
     
     # Initialize Terraform
     print("\n🔄 Initializing Terraform...")
-    if not run_command("terraform init", cwd=TERRAFORM_DIR):
+    if not terraform_init.init_terraform(TERRAFORM_DIR, runner=run_command):
         sys.exit(1)
         
     # Destroy Terraform configuration
     print("\n🧨 Destroying Terraform infrastructure...")
     if not run_command(
-        f"terraform destroy -auto-approve -var 'owner_tag={owner_tag}'",
+        ["terraform", "destroy", "-auto-approve", "-var", f"owner_tag={owner_tag}", "-var", f"backend_dir={BACKEND_DIR}"],
         cwd=TERRAFORM_DIR,
     ):
         sys.exit(1)
@@ -542,32 +357,189 @@ def terraform_destroy(owner_tag):
     print("\n✅ Infrastructure destroyed successfully!")
 
 
-def main(prefix=None, run_mode="app"):
+def main(prefix=None, run_mode="app", force_redeploy=False, use_plan_cache=True,
+         kill_stale_terraform=True, write_ssh_config=True):
     """Main function to deploy infrastructure."""
-    # Get owner tag and generate terraform.tfvars
-    owner_tag = get_owner_tag(prefix)
-    
     set_script_directory()
     set_terraform_directory()
-    kill_terraform_processes()
-    
-    # Generate tfvars
-    print(f"\nUsing owner tag: {owner_tag}")
-    print("\n📝 Generating terraform.tfvars...")
-    generate_tfvars_script = script_dir / "generate_tfvars.py"
-    if not run_command(f"{generate_tfvars_script} {owner_tag}", cwd=script_dir):
+    if kill_stale_terraform:
+        kill_terraform_processes()
+
+    try:
+        DEPLOY_PIPELINE.run(
+            prefix=prefix, terraform_dir=TERRAFORM_DIR, run_mode=run_mode, force_redeploy=force_redeploy,
+            use_plan_cache=use_plan_cache, write_ssh_config=write_ssh_config,
+        )
+    except deploy_pipeline.StepFailed as e:
+        print(f"\n❌ Infrastructure deployment failed: {e}")
         sys.exit(1)
-    
-    # Run Terraform commands and only update SSH config if successful
-    deployment_success = run_terraform_commands(owner_tag, run_mode)
-    
-    if deployment_success:
-        print("\n✅ Infrastructure deployment completed successfully!")
-        update_ssh_config()
+    print("\n✅ Infrastructure deployment completed successfully!")
+
+
+def redeploy_services(run_mode="app"):
+    """Sync changed backend files to the existing VM and restart only the affected services.
+
+    Skips init, imports, plan and apply entirely. Returns True on success.
+    """
+    set_script_directory()
+    server_ip = get_server_ip()
+    if not server_ip:
+        print("\n❌ No server IP in the Terraform output. Run a full deployment first.")
+        return False
+    print(f"\n🔄 Redeploying services on {server_ip} in {run_mode} mode")
+
+    print("\n📦 Syncing changed backend files...")
+    with deploy_trace.span("sync backend files") as span_args:
+        changed = service_sync.sync_backend(server_ip, AZURE_VM_PRIVATE_KEY_PATHNAME, BACKEND_DIR)
+        if changed is None:
+            return False
+        span_args['changed_files'] = len(changed)
+
+    services = service_sync.services_for_changes(changed, run_mode)
+    if services:
+        print(f"\n🐳 Restarting services: {', '.join(services)}")
     else:
-        print("\n❌ Infrastructure deployment failed - skipping SSH config update")
-        sys.exit(1)
+        print("\n🐳 No service inputs changed, only making sure every service is running")
+    with deploy_trace.span("restart services", services=services):
+        if not service_sync.restart_services(
+            server_ip, AZURE_VM_PRIVATE_KEY_PATHNAME, services, run_mode,
+            runner=run_command
+        ):
+            return False
+
+    if run_mode == "app":
+        wait_for_server_ready(server_ip, run_mode)
+    print("\n✅ Services redeployed successfully!")
+    return True
+
+
+def prepare_environment_dir(owner_tag):
+    """Create or refresh the isolated Terraform working copy of one environment.
+
+    Only the configuration is copied. State, plans, generated files, logs and
+    the .terraform directory stay private to the working copy.
+    """
+    environment_dir = ENVIRONMENTS_DIR / owner_tag
+    environment_dir.mkdir(parents=True, exist_ok=True)
 
+    config_files = {
+        path.name: path for path in BASE_TERRAFORM_DIR.glob('*.tf')
+        if path.name != terraform_imports.IMPORTS_FILE_NAME
+    }
+    for stale_file in environment_dir.glob('*.tf'):
+        if stale_file.name not in config_files and stale_file.name != terraform_imports.IMPORTS_FILE_NAME:
+            stale_file.unlink()
+    for name, path in config_files.items():
+        shutil.copy2(path, environment_dir / name)
+
+    # Start from the same provider versions as the main working directory
+    lock_file = BASE_TERRAFORM_DIR / terraform_init.LOCK_FILE_NAME
+    if lock_file.exists() and not (environment_dir / terraform_init.LOCK_FILE_NAME).exists():
+        shutil.copy2(lock_file, environment_dir / terraform_init.LOCK_FILE_NAME)
+    return environment_dir
+
+
+def deploy_environment(owner_tag, environment_dir, run_mode, force_redeploy, use_plan_cache):
+    """Deploy one environment in a child process. Returns a result dict."""
+    log_file = environment_dir / 'deploy.log'
+    command = [
+        sys.executable, str(pathlib.Path(__file__).resolve()),
+        "--prefix", owner_tag,
+        "--run-mode", run_mode,
+        "--no-kill-terraform",
+        "--skip-ssh-config",
+        "--trace-file", str(environment_dir / 'deploy_trace.json'),
+        "--log-file", str(environment_dir / 'terraform.log'),
+    ]
+    if force_redeploy:
+        command.append("--force-redeploy")
+    if not use_plan_cache:
+        command.append("--no-plan-cache")
+    env = dict(os.environ, BITESWIPE_TERRAFORM_DIR=str(environment_dir))
+    if metrics.registry.enabled:
+        # Each child exports its own files instead of overwriting those of this run
+        env['BITESWIPE_METRICS_DIR'] = str(metrics.registry.output_dir / 'environments' / owner_tag)
+
+    print(f"[{owner_tag}] Deploying, output in {log_file}")
+    with deploy_trace.span(f"deploy {owner_tag}", category="environment") as span_args:
+        start = time.monotonic()
+        with open(log_file, 'w') as log:
+            exit_code = subprocess.run(
+                command, cwd=script_dir, env=env,
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, check=False
+            ).returncode
+        duration = time.monotonic() - start
+        span_args['exit_code'] = exit_code
+
+    server_ip = None
+    if exit_code == 0:
+        result = subprocess.run(
+            ["terraform", "output", "-raw", "server_public_ip"],
+            cwd=environment_dir, capture_output=True, text=True, check=False
+        )
+        server_ip = result.stdout.strip() if result.returncode == 0 else None
+    print(f"[{owner_tag}] {'✅ Deployed' if exit_code == 0 else '❌ Failed'} in {duration:.1f}s")
+    metrics.observe("environment_deploy", duration, environment=owner_tag)
+    metrics.set_gauge("environment_deploy_success", int(exit_code == 0), environment=owner_tag)
+    return {
+        'owner_tag': owner_tag,
+        'exit_code': exit_code,
+        'duration': duration,
+        'server_ip': server_ip,
+        'log_file': log_file,
+    }
+
+
+def deploy_environments(owner_tags, run_mode="app", force_redeploy=False, use_plan_cache=True, max_parallel=None,
+                        write_ssh_config=True):
+    """Deploy several owner tags at once, each in its own working copy and state.
+
+    The deployed VMs are added to the SSH config as CPEN321_SERVER_<owner tag>
+    in one update. Returns True if every environment deployed successfully.
+    """
+    environment_dirs = {}
+    with deploy_trace.span("prepare environments"):
+        for owner_tag in owner_tags:
+            environment_dirs[owner_tag] = prepare_environment_dir(owner_tag)
+            # The provider cache is not safe for concurrent inits, so initialize one at a time;
+            # the deploys themselves then skip init
+            print(f"\n🔍 [{owner_tag}] Running Terraform init...")
+            if not terraform_init.init_terraform(environment_dirs[owner_tag], runner=run_command):
+                print(f"❌ [{owner_tag}] Terraform init failed")
+                return False
+
+    print(f"\n🚀 Deploying {len(owner_tags)} environments in parallel: {', '.join(owner_tags)}")
+    with ThreadPoolExecutor(max_workers=max_parallel or len(owner_tags)) as executor:
+        futures = [
+            executor.submit(deploy_environment, owner_tag, environment_dirs[owner_tag],
+                            run_mode, force_redeploy, use_plan_cache)
+            for owner_tag in owner_tags
+        ]
+        results = [future.result() for future in futures]
+
+    print("\n📊 Deployment results")
+    print(f"{'environment':<20} {'result':<8} {'time (s)':>9}  {'server ip':<16} log")
+    for result in results:
+        status = "ok" if result['exit_code'] == 0 else f"exit {result['exit_code']}"
+        print(f"{result['owner_tag']:<20} {status:<8} {result['duration']:>9.1f}  "
+              f"{result['server_ip'] or '-':<16} {result['log_file']}")
+
+    hosts = {
+        f"{SSH_HOST_NAME}_{result['owner_tag']}": ssh_config.host_options(
+            result['server_ip'], AZURE_VM_PRIVATE_KEY_PATHNAME)
+        for result in results if result['server_ip']
+    }
+    if hosts and write_ssh_config:
+        with deploy_trace.span("update ssh config", hosts=list(hosts)):
+            changed = ssh_config.update_hosts(hosts)
+        print(f"\nSSH config: {', '.join(changed) + ' updated' if changed else 'already up to date'}")
+
+    failed = [result['owner_tag'] for result in results if result['exit_code'] != 0]
+    if failed:
+        print(f"\n❌ Deployment failed for: {', '.join(failed)}")
+        return False
+    print("\n✅ All environments deployed successfully!")
+    return True
 
 
 if __name__ == "__main__":
@@ -577,13 +549,66 @@ if __name__ == "__main__":
     parser.add_argument('--run-mode', type=str, choices=['test', 'app'], default='app', 
                         help='Mode to run: "test" to run tests, "app" to run the application (default: app)')
     parser.add_argument('--destroy', action='store_true', help='Destroy infrastructure instead of creating it')
+    parser.add_argument('--services-only', action='store_true',
+                        help='Sync changed backend files to the existing VM and restart only the affected services, without Terraform')
+    parser.add_argument('--prefixes', type=str,
+                        help='Comma-separated owner tags to deploy in parallel, each with its own working copy and state')
+    parser.add_argument('--max-parallel', type=int, help='Limit for --prefixes (default: all at once)')
+    parser.add_argument('--no-kill-terraform', action='store_true',
+                        help='Do not kill other terraform processes before starting (set for parallel deploys)')
+    parser.add_argument('--skip-ssh-config', action='store_true', help='Do not write the new IP to the SSH config')
+    parser.add_argument('--force-redeploy', action='store_true',
+                        help='Redeploy the services even if nothing shipped to the VM has changed')
+    parser.add_argument('--no-plan-cache', action='store_true',
+                        help='Always recompute the Terraform plan instead of reusing a matching saved plan')
+    parser.add_argument('--trace-file', type=str, default=str(TRACE_FILE),
+                        help=f'Where to write the Chrome trace of the run (default: {TRACE_FILE})')
+    parser.add_argument('--log-file', type=str, default=str(COMMAND_LOG_FILE),
+                        help=f'File that collects the output of every command (default: {COMMAND_LOG_FILE})')
     args = parser.parse_args()
-    
-    if args.destroy:
-        # Destroy infrastructure
-        print(f"Destroying infrastructure with prefix: {args.prefix if args.prefix else get_owner_tag()}")
-        terraform_destroy(get_owner_tag(args.prefix))
-    else:
-        # Create/update infrastructure
-        run_mode = args.run_mode if hasattr(args, 'run_mode') else 'app'
-        main(args.prefix, run_mode)
+
+    # Start each run with an empty command log
+    COMMAND_LOG_FILE = pathlib.Path(args.log_file)
+    COMMAND_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    open(COMMAND_LOG_FILE, 'w').close()
+
+    # Turn the SIGTERM sent on a CI timeout into a normal exit so the trace is still written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    metrics.configure("deploy_infra")
+    action = ("destroy" if args.destroy else "services" if args.services_only
+              else "environments" if args.prefixes else "deploy")
+    started = time.monotonic()
+    succeeded = False
+    try:
+        if args.destroy:
+            # Destroy infrastructure
+            print(f"Destroying infrastructure with prefix: {args.prefix if args.prefix else get_owner_tag()}")
+            with deploy_trace.span("destroy"):
+                terraform_destroy(get_owner_tag(args.prefix), not args.no_kill_terraform)
+        else:
+            # Create/update infrastructure
+            run_mode = args.run_mode if hasattr(args, 'run_mode') else 'app'
+            if args.services_only:
+                with deploy_trace.span("redeploy services", run_mode=run_mode):
+                    if not redeploy_services(run_mode):
+                        sys.exit(1)
+            elif args.prefixes:
+                owner_tags = [tag.strip() for tag in args.prefixes.split(',') if tag.strip()]
+                with deploy_trace.span("deploy environments", run_mode=run_mode, environments=owner_tags):
+                    if not deploy_environments(owner_tags, run_mode, args.force_redeploy,
+                                               not args.no_plan_cache, args.max_parallel,
+                                               not args.skip_ssh_config):
+                        sys.exit(1)
+            else:
+                with deploy_trace.span("deploy", run_mode=run_mode):
+                    main(args.prefix, run_mode, args.force_redeploy, not args.no_plan_cache,
+                         not args.no_kill_terraform, not args.skip_ssh_config)
+        succeeded = True
+    finally:
+        # Always report timings, a failed or timed-out deploy is when they matter most
+        deploy_trace.tracer.print_summary()
+        deploy_trace.tracer.export(args.trace_file)
+        metrics.observe("run", time.monotonic() - started, action=action, run_mode=args.run_mode)
+        metrics.set_gauge("run_success", int(succeeded), action=action, run_mode=args.run_mode)
+        metrics.export()
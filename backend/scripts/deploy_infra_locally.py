@@ -1,37 +1,193 @@
 #!/usr/bin/env python3
 import os
+import hashlib
+import json
+import pathlib
 import subprocess
 import argparse
+import sys
+import time
+
+import readiness
+import seed_database
+import service_sync
+
+# How long the services get to become ready after `docker-compose up`
+READY_DEADLINE_SECONDS = int(os.getenv('BITESWIPE_LOCAL_READY_DEADLINE', '180'))
+# Lines of container logs shown for a service that did not come up
+LOG_TAIL_LINES = 50
+
+# Hashes of the service inputs at the last successful bring-up (listed in .dockerignore)
+STATE_FILE_NAME = '.local_stack_state.json'
+# Inputs the services are built from or mount, relative to the backend directory
+INPUT_FILES = ['dockerfile', 'docker-compose.yml', seed_database.SEED_COMPOSE_FILE, '.env', 'package.json', 'package-lock.json', 'tsconfig.json']
+INPUT_DIRS = ['src', 'nginx/nginx-entrypoint', 'nginx/certs']
+
+# Compose files of the stack; --seed adds the override that keeps bulk-seeded data
+COMPOSE_FILES = ['docker-compose.yml']
+
+def compose_command(*args):
+    return ['docker-compose', *[arg for name in COMPOSE_FILES for arg in ('-f', name)], *args]
+
+def service_probe(service, command):
+    """Check run inside a service's container, e.g. a Mongo ping."""
+    return lambda: readiness.probe_command(compose_command('exec', '-T', service, *command))
+
+def build_service_checks():
+    """Readiness checks per service, run at the same time.
+
+    mongo and app only expose their ports on the compose network, so they are
+    probed from inside their containers; nginx is probed on the published ports.
+    """
+    return [
+        ("mongo", service_probe("mongo", ["mongosh", "--quiet", "--eval", "db.adminCommand('ping').ok"])),
+        # Any HTTP response means the app is accepting requests
+        ("app", service_probe("app", ["sh", "-c", "curl -s -o /dev/null --max-time 5 http://localhost:$PORT/"])),
+        ("nginx", lambda: readiness.probe_tcp("127.0.0.1", 80) and readiness.probe_https("127.0.0.1", 443)),
+    ]
+
+def container_failure(service):
+    """Return why a service's container can't become ready (exited or restarting), or None."""
+    container_id = subprocess.run(
+        compose_command('ps', '-q', service), capture_output=True, text=True, check=False
+    ).stdout.strip()
+    if not container_id:
+        return "container not created"
+    state = subprocess.run(
+        ['docker', 'inspect', '-f', '{{.State.Status}} {{.State.ExitCode}}', container_id],
+        capture_output=True, text=True, check=False
+    ).stdout.split()
+    if state and state[0] in ('exited', 'dead', 'restarting'):
+        return f"container {state[0]} (exit code {state[1] if len(state) > 1 else '?'})"
+    return None
+
+def wait_for_services(deadline_seconds=READY_DEADLINE_SECONDS):
+    """Wait until every service takes traffic. Returns True if they all did."""
+    print(f"\n⏳ Waiting for mongo, app and nginx to become ready (deadline {deadline_seconds}s)...")
+    ready, timings, failures = readiness.wait_until_all_ready(
+        build_service_checks(), deadline_seconds, failed=container_failure
+    )
+
+    print("\n📊 Time to ready")
+    for service, _ in build_service_checks():
+        print(f"  {service:<8} {f'{timings[service]:.1f}s' if service in timings else 'not ready'}")
+
+    for service, reason in failures.items():
+        print(f"\n❌ {service}: {reason}, last {LOG_TAIL_LINES} log lines:")
+        subprocess.run(compose_command('logs', '--no-color', '--tail', str(LOG_TAIL_LINES), service), check=False)
+    return ready
+
+def hash_inputs(backend_dir):
+    """Content hash of every service input, keyed by path relative to the backend directory."""
+    backend_dir = pathlib.Path(backend_dir)
+    paths = [backend_dir / name for name in INPUT_FILES]
+    for directory in INPUT_DIRS:
+        paths.extend(sorted(path for path in (backend_dir / directory).rglob('*') if path.is_file()))
+    return {
+        path.relative_to(backend_dir).as_posix(): hashlib.sha256(path.read_bytes()).hexdigest()
+        for path in paths if path.is_file()
+    }
+
+def load_input_hashes(backend_dir):
+    try:
+        with open(pathlib.Path(backend_dir) / STATE_FILE_NAME, 'r') as f:
+            return json.load(f)['inputs']
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+def save_input_hashes(backend_dir, inputs):
+    with open(pathlib.Path(backend_dir) / STATE_FILE_NAME, 'w') as f:
+        json.dump({'inputs': inputs}, f, indent=2, sort_keys=True)
+
+def changed_inputs(previous, current):
+    """Paths added, removed or modified since the last bring-up."""
+    return sorted(path for path in set(previous) | set(current) if previous.get(path) != current.get(path))
+
+def start_incrementally(previous, current):
+    """Rebuild or recreate only the services whose inputs changed, then start anything not running."""
+    if previous is None:
+        print("\n🚀 No previous bring-up recorded, building and starting every service...")
+        subprocess.run(compose_command('up', '-d', '--build'), check=True)
+        return
+
+    changed = changed_inputs(previous, current)
+    services = service_sync.services_for_changes(changed)
+    for path in changed:
+        print(f"  changed: {path}")
+    print(f"\n🚀 Services to rebuild or recreate: {', '.join(services) if services else 'none'}")
+
+    if "app" in services:
+        subprocess.run(compose_command('build', 'app'), check=True)
+        # The new image makes compose recreate the container
+        subprocess.run(compose_command('up', '-d', '--no-deps', 'app'), check=True)
+    if "nginx" in services:
+        # Mounted files only change inside a recreated container
+        subprocess.run(compose_command('up', '-d', '--no-deps', '--force-recreate', 'nginx'), check=True)
+    # Compose recreates whatever a docker-compose.yml or .env change affects and starts stopped services;
+    # running services with unchanged inputs are left alone
+    subprocess.run(compose_command('up', '-d'), check=True)
 
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Start BiteSwipe services')
     parser.add_argument('-q', '--quiet', action='store_true', help='Run in quiet mode (hide container logs)')
+    parser.add_argument('--no-wait', action='store_true', help='Do not wait for the services to become ready')
+    parser.add_argument('--deadline', type=int, default=READY_DEADLINE_SECONDS,
+                        help=f'Seconds the services get to become ready (default: {READY_DEADLINE_SECONDS})')
+    parser.add_argument('--clean', action='store_true',
+                        help='Tear the stack down and start it from scratch instead of only restarting what changed')
+    parser.add_argument('--seed', type=int, nargs='?', const=seed_database.DEFAULT_SCALE, metavar='SCALE',
+                        help='Bulk-seed Mongo with SCALE synthetic users and sessions once the services are up '
+                             f'(default scale: {seed_database.DEFAULT_SCALE:,})')
     args = parser.parse_args()
+    if args.seed is not None:
+        COMPOSE_FILES.append(seed_database.SEED_COMPOSE_FILE)
 
     # Change to the backend directory containing docker-compose.yml
     script_dir = os.path.dirname(os.path.abspath(__file__))
     backend_dir = os.path.dirname(script_dir)  # Parent of scripts directory is backend
     os.chdir(backend_dir)
-    
-    print("\n🧹 Cleaning up any existing containers...")
-    subprocess.run(['docker-compose', 'down'], check=True)
-    
-    print("\n🚀 Starting BiteSwipe services with docker-compose...")
+
     print("\nService URLs (will be available after startup):")
     print("📱 Backend API: http://localhost:3000")
     print("💾 MongoDB: mongodb://localhost:27017")
     print("\nTo view logs: docker-compose logs -f")
     print("To stop services: docker-compose down\n")
-    
-    # Start the services
+
+    start = time.monotonic()
+    previous_inputs = load_input_hashes(backend_dir)
+    current_inputs = hash_inputs(backend_dir)
+    # Start the services in the background, so startup can be gated on readiness
+    if args.clean:
+        print("\n🧹 Cleaning up any existing containers...")
+        subprocess.run(compose_command('down'), check=True)
+        print("\n🚀 Starting BiteSwipe services with docker-compose...")
+        subprocess.run(compose_command('up', '-d', '--build'), check=True)
+    else:
+        start_incrementally(previous_inputs, current_inputs)
+
+    if not args.no_wait and not wait_for_services(args.deadline):
+        print("\n❌ Services did not come up. Stop them with: docker-compose down")
+        sys.exit(1)
+    # Only remembered once the services are up, so a failed bring-up is retried in full
+    save_input_hashes(backend_dir, current_inputs)
+    print(f"\n✅ Services up after {time.monotonic() - start:.1f}s")
+
+    if args.seed is not None and not seed_database.run(
+            seed_database.counts_for(args.seed), compose_files=COMPOSE_FILES):
+        print("\n❌ Seeding failed, the services are still running")
+        sys.exit(1)
+
     if args.quiet:
-        # Run in detached mode and only show errors
-        subprocess.run(['docker-compose', 'up', '-d'], check=True)
         print("Services started in quiet mode. Use 'docker-compose logs -f' to view logs if needed.")
-    else:
-        # Run in foreground mode with logs
-        subprocess.run(['docker-compose', 'up'], check=True)
+        return
+
+    # Follow the logs in the foreground; Ctrl-C stops the services like a foreground `up` would
+    try:
+        subprocess.run(compose_command('logs', '-f', '--tail', '20'), check=False)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping services...")
+        subprocess.run(compose_command('stop'), check=False)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Run the deploy steps in one process, with explicit inputs and outputs.
+
+A step is a plain function. It declares the values it reads by name; the
+pipeline passes those values in as keyword arguments, and the step returns a
+dict with the values it declared as outputs. The pipeline starts from a few
+inputs (owner tag, run mode, flags...), merges each step's outputs into them
+and hands the result to the next step. Because everything runs in one
+process, values such as the owner tag or the subscription id are looked up
+once and passed along, instead of every script recomputing them.
+
+The steps are checked when the pipeline is built: each input must be a
+pipeline input or an output of an earlier step. Every step is recorded as a
+phase span in the deploy trace and as a pipeline_step timer in the metrics.
+
+A step that can't produce its outputs raises StepFailed, which stops the
+pipeline.
+"""
+
+import time
+
+import deploy_trace
+import metrics
+
+
+class StepFailed(Exception):
+    """A step failed; the steps after it are not run."""
+
+
+class Step:
+    """One named step: a function of its inputs that returns its outputs."""
+
+    def __init__(self, name, run, inputs=(), outputs=()):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def __repr__(self):
+        return f"Step({self.name!r}, inputs={list(self.inputs)}, outputs={list(self.outputs)})"
+
+
+class Pipeline:
+    """Ordered steps over a shared dict of named values."""
+
+    def __init__(self, steps, inputs=()):
+        self.steps = list(steps)
+        self.inputs = tuple(inputs)
+        available = set(self.inputs)
+        for step in self.steps:
+            missing = [name for name in step.inputs if name not in available]
+            if missing:
+                raise ValueError(f"Step '{step.name}' needs {', '.join(missing)}, "
+                                 "which no earlier step or pipeline input provides")
+            available.update(step.outputs)
+
+    def describe(self):
+        """One line per step with what it reads and produces."""
+        return [
+            f"{step.name}: {', '.join(step.inputs) or '-'} -> {', '.join(step.outputs) or '-'}"
+            for step in self.steps
+        ]
+
+    def run(self, **values):
+        """Run every step in order. Returns the values; raises StepFailed if a step fails."""
+        missing = [name for name in self.inputs if name not in values]
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {', '.join(missing)}")
+
+        for step in self.steps:
+            start = time.perf_counter()
+            result = "failed"
+            try:
+                with deploy_trace.span(step.name) as span_args:
+                    outputs = step.run(**{name: values[name] for name in step.inputs}) or {}
+                    absent = [name for name in step.outputs if name not in outputs]
+                    if absent:
+                        span_args['error'] = f"missing outputs: {', '.join(absent)}"
+                        raise StepFailed(f"Step '{step.name}' did not produce {', '.join(absent)}")
+                    # Flags such as has_changes are cheap to keep in the trace
+                    span_args.update({name: value for name, value in outputs.items() if isinstance(value, bool)})
+                    values.update(outputs)
+                result = "ok"
+            finally:
+                metrics.observe("pipeline_step", time.perf_counter() - start, step=step.name)
+                metrics.inc("pipeline_steps", step=step.name, result=result)
+        return values
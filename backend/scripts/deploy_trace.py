@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Timed spans for the deploy pipeline.
+
+Every phase of a deployment and every subprocess it launches is recorded as
+a span. At the end of a run the spans are written as a Chrome trace
+(open it in chrome://tracing or https://ui.perfetto.dev) together with a
+per-phase summary, and a summary table is printed so slow phases are visible
+straight from the CI log.
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import threading
+import time
+
+
+class Tracer:
+    """Collects timed spans and exports them."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+        self._origin_wall = time.time()
+
+    @contextlib.contextmanager
+    def span(self, name, category="phase", **args):
+        """Time the enclosed block. Yields a dict the caller can add details to."""
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        span_args = dict(args)
+        start = time.perf_counter()
+        try:
+            yield span_args
+        except BaseException as e:
+            span_args.setdefault('error', repr(e))
+            raise
+        finally:
+            end = time.perf_counter()
+            self._local.depth = depth
+            with self._lock:
+                self.spans.append({
+                    'name': name,
+                    'category': category,
+                    'start': start - self._origin,
+                    'duration': end - start,
+                    'depth': depth,
+                    'thread': threading.get_ident(),
+                    'args': span_args,
+                })
+
+    def summary(self):
+        """Aggregate the spans by category and name, in order of first appearance."""
+        rows = {}
+        for span in sorted(self.spans, key=lambda s: s['start']):
+            key = (span['category'], span['name'])
+            row = rows.setdefault(key, {
+                'category': span['category'],
+                'name': span['name'],
+                'depth': span['depth'],
+                'count': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+            })
+            row['count'] += 1
+            row['total_seconds'] += span['duration']
+            row['max_seconds'] = max(row['max_seconds'], span['duration'])
+        return list(rows.values())
+
+    def to_chrome_trace(self):
+        """Return the spans in the Chrome trace event format."""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            events.append({
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': round(span['start'] * 1e6),
+                'dur': round(span['duration'] * 1e6),
+                'pid': pid,
+                'tid': span['thread'],
+                'args': span['args'],
+            })
+        events.sort(key=lambda e: e['ts'])
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'started_at': self._origin_wall,
+                'summary': self.summary(),
+            },
+        }
+
+    def export(self, path):
+        """Write the Chrome trace JSON file."""
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f, indent=2)
+        print(f"\n📈 Deploy trace written to {path}")
+
+    def print_summary(self):
+        """Print a table of the time spent per phase and per command."""
+        rows = self.summary()
+        if not rows:
+            return
+        # Nested spans are indented under the phase that started them
+        labels = ["  " * row['depth'] + row['name'] for row in rows]
+        name_width = min(max(len(label) for label in labels), 70)
+        print("\n⏱️  Deploy timing summary")
+        print(f"{'category':<9} {'name':<{name_width}} {'count':>5} {'total (s)':>10} {'max (s)':>9}")
+        print("-" * (name_width + 37))
+        for row, label in zip(rows, labels):
+            name = label if len(label) <= name_width else label[:name_width - 3] + "..."
+            print(f"{row['category']:<9} {name:<{name_width}} {row['count']:>5} "
+                  f"{row['total_seconds']:>10.2f} {row['max_seconds']:>9.2f}")
+
+
+# Process-wide tracer used by the deploy scripts
+tracer = Tracer()
+
+
+def span(name, category="phase", **args):
+    """Record a span on the process-wide tracer."""
+    return tracer.span(name, category, **args)
@@ -1,405 +1,293 @@
 #!/usr/bin/env python3
-import json
 import os
 import pathlib
-import subprocess
 import time
 import re
-import getpass
 import argparse
 import sys  # Added for sys.exit
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import azure_inventory
+import azure_operations
+import deploy_context
+import generate_tfvars as generate_tfvars_module
+import metrics
+import terraform_imports
+import terraform_plan_cache
+import terraform_state
 
 # Determine the path to the terraform directory relative to the script
 script_dir = pathlib.Path(__file__).resolve().parent
-TERRAFORM_DIR = script_dir / '../terraform'
+TERRAFORM_DIR = pathlib.Path(os.getenv('BITESWIPE_TERRAFORM_DIR', script_dir / '../terraform'))
+
+# Resources of a deployment, keyed by a short node name: (Azure type, name suffix)
+DEPLOYMENT_RESOURCES = {
+    'vm': ("Microsoft.Compute/virtualMachines", "-biteswipe"),
+    'nic': ("Microsoft.Network/networkInterfaces", "-biteswipe-nic"),
+    'subnet': ("Microsoft.Network/virtualNetworks/subnets", "-internal"),
+    'public_ip': ("Microsoft.Network/publicIPAddresses", "-biteswipe-public-ip"),
+    'nsg': ("Microsoft.Network/networkSecurityGroups", "-biteswipe-nsg"),
+    'vnet': ("Microsoft.Network/virtualNetworks", "-biteswipe-network"),
+}
+
+# Nodes that must be gone before a node can be deleted. The NIC holds the
+# subnet, public IP and NSG, so those three are deleted in parallel once it is gone.
+# The subnet is deleted through its virtual network (see delete_deployment_resource)
+DELETE_DEPENDENCIES = {
+    'vm': [],
+    'nic': ['vm'],
+    'subnet': ['nic'],
+    'public_ip': ['nic'],
+    'nsg': ['nic'],
+    'vnet': ['subnet'],
+}
+
+MAX_PARALLEL_DELETES = 4
+RETRY_BACKOFF_SECONDS = 5
+
+# Local Terraform state of the deployment, forgotten once its resource group is deleted
+STATE_FILE_NAMES = ('terraform.tfstate', 'terraform.tfstate.backup')
 
 def get_owner_tag(prefix=None):
     """Get owner tag from command-line argument, environment, or system username."""
-    # First check if a prefix was provided as a command-line argument
-    if prefix:
-        return prefix
-        
-    # Check if we're running on GitHub Actions main branch
-    github_ref = os.getenv('GITHUB_REF')
-    if github_ref and github_ref == 'refs/heads/main':
-        # Use a fixed production tag for main branch
-        return "master"
-        
-    # For any other branch on GH Actions, use GITHUB_ACTOR
-    owner = os.getenv('GITHUB_ACTOR')
-    if not owner:
-        # Fallback to system username for local runs
-        owner = getpass.getuser()
-    
-    return owner
-
-def check_resource_group_exists(resource_group_name):
-    """Check if a resource group exists."""
-    try:
-        result = subprocess.run(
-            ["az", "group", "show", "--name", resource_group_name],
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        return result.returncode == 0
-    except Exception:
-        return False
+    # terraform.tfvars is regenerated from the owner tag here, so don't read it back
+    return deploy_context.get_owner_tag(prefix, read_tfvars=False, terraform_dir=TERRAFORM_DIR)
 
 def generate_tfvars(owner_tag):
     """Generate terraform.tfvars file."""
-    tfvars_content = f'owner_tag = "{owner_tag}"'
-    tfvars_file = TERRAFORM_DIR / 'terraform.tfvars'
-    
-    print(f"📝 Generating terraform.tfvars...")
-    with open(tfvars_file, 'w') as f:
-        f.write(tfvars_content)
-    print(f"Generated terraform.tfvars with owner_tag = {owner_tag}")
+    print("📝 Generating terraform.tfvars...")
+    generate_tfvars_module.write_tfvars(owner_tag, TERRAFORM_DIR)
 
-def get_azure_resources(owner_tag):
-    """Get all Azure resources with the given prefix."""
-    try:
-        result = subprocess.check_output(
-            ["az", "resource", "list", 
-             "--resource-group", f"{owner_tag}-biteswipe-resources",
-             "--query", "[].{name: name, type: type, id: id}",
-             "--output", "json"],
-            text=True
-        )
-        return json.loads(result)
-    except subprocess.CalledProcessError:
-        print(f"Warning: Could not list resources in resource group {owner_tag}-biteswipe-resources")
-        return []
+def delete_deployment_resource(resource_group_name, resources, node, force=False):
+    """Delete one node of the deployment and wait for it. Returns True on success."""
+    resource_type, name = resources[node]
+    if node == 'subnet':
+        # A child of the virtual network, deleted through it
+        return azure_operations.delete_subnet(resource_group_name, resources['vnet'][1], name)
+    return azure_operations.delete_resource(resource_group_name, resource_type, name, force)
 
-def get_terraform_resource_type(azure_type):
-    """Convert Azure resource type to Terraform resource type."""
-    type_map = {
-        'Microsoft.Network/virtualNetworks': 'azurerm_virtual_network',
-        'Microsoft.Network/publicIPAddresses': 'azurerm_public_ip',
-        'Microsoft.Network/networkSecurityGroups': 'azurerm_network_security_group',
-        'Microsoft.Network/networkInterfaces': 'azurerm_network_interface',
-        'Microsoft.Network/virtualNetworks/subnets': 'azurerm_subnet',
-        'Microsoft.Compute/virtualMachines': 'azurerm_linux_virtual_machine',
-        'Microsoft.Resources/resourceGroups': 'azurerm_resource_group'
-    }
-    return type_map.get(azure_type)
+def delete_resources_in_dependency_order(resource_group_name, resource_prefix, max_attempts=3):
+    """Delete the deployment's resources following DELETE_DEPENDENCIES.
 
-def get_terraform_resource_name(resource_name, owner_tag):
-    """Generate Terraform resource name from Azure resource name."""
-    name = resource_name.replace(f"{owner_tag}-biteswipe-", "")
-    name_map = {
-        'network': 'vnet',
-        'public-ip': 'public_ip',
-        'nsg': 'nsg',
-        'nic': 'nic',
-        'internal': 'subnet',
-        'resources': 'rg'
+    Independent resources are deleted at the same time. When a deletion fails,
+    its dependents are held back and only those nodes are retried on the next
+    attempt. Returns the (type, name) pairs that could not be deleted.
+    """
+    resources = {
+        node: (resource_type, f"{resource_prefix}{suffix}")
+        for node, (resource_type, suffix) in DEPLOYMENT_RESOURCES.items()
     }
-    return name_map.get(name, name)
-
-def resource_exists(owner_tag, resource_type, resource_name):
-    """Check if an Azure resource exists."""
-    resource_group_name = f"{owner_tag}-biteswipe-resources"
-    
-    # First check if resource group exists
-    if not check_resource_group_exists(resource_group_name):
-        return False
-        
-    try:
-        subprocess.run(
-            ["az", "resource", "show",
-             "--resource-group", resource_group_name,
-             "--resource-type", resource_type,
-             "--name", resource_name],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        return True
-    except subprocess.CalledProcessError:
-        return False
-
-def get_azure_subscription_id():
-    """Get Azure subscription ID from environment variable or Azure CLI."""
-    # First try to get from environment variable
-    subscription_id = os.getenv('ARM_SUBSCRIPTION_ID')
-    
-    # If not found, try to get from Azure CLI
-    if not subscription_id:
-        try:
-            result = subprocess.run(
-                ["az", "account", "show", "--query", "id", "-o", "tsv"],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            subscription_id = result.stdout.strip()
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            print("Error: Could not get subscription ID from Azure CLI")
-            subscription_id = None
-            
-    if not subscription_id:
-        print("Error: Azure subscription ID not found. Make sure you're logged in to Azure CLI or ARM_SUBSCRIPTION_ID is set.")
-    else:
-        print(f"Using Azure Subscription ID: {subscription_id}")
-        
-    return subscription_id
+    # One listing decides what is left to delete
+    azure_inventory.invalidate_inventory(resource_group_name)
+    done = {
+        node for node, (resource_type, name) in resources.items()
+        if not azure_inventory.resource_exists(resource_group_name, resource_type, name,
+                                               parent_name=resources['vnet'][1])
+    }
+    for node in sorted(done):
+        print(f"Resource {resources[node][0]}/{resources[node][1]} does not exist, skipping deletion")
 
-def is_in_terraform_state(resource_address):
-    """Check if a resource is already in the Terraform state."""
-    try:
-        result = subprocess.run(
-            ["terraform", "state", "list", resource_address],
-            cwd=TERRAFORM_DIR,
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        # If the command returns the resource address, it's in the state
-        return resource_address in result.stdout
-    except Exception:
-        # If there's an error, assume it's not in the state
-        return False
+    for attempt in range(max_attempts):
+        pending = [node for node in resources if node not in done]
+        if not pending:
+            break
+        print(f"\nAttempt {attempt + 1} of {max_attempts} for {resource_group_name}: {', '.join(pending)}")
+        if attempt > 0:
+            metrics.inc("delete_retries", resource_group=resource_group_name)
+            # Deletions are awaited, so this only gives Azure time to release what held the failed nodes
+            time.sleep(RETRY_BACKOFF_SECONDS * attempt)
 
-def import_resource(owner_tag, azure_type, resource_name, tf_type, tf_name):
-    """Import a resource into Terraform state if it exists."""
-    if not resource_exists(owner_tag, azure_type, resource_name):
-        print(f"Resource {azure_type}/{resource_name} does not exist, skipping import")
-        return False
-        
-    # Get the subscription ID
-    subscription_id = get_azure_subscription_id()
-    if not subscription_id:
-        print(f"Cannot import {resource_name}: No valid subscription ID found")
-        return False
+        failed = set()
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DELETES) as executor:
+            running = {}
+            while True:
+                # Start every node whose dependencies are gone and that isn't blocked by a failure
+                for node in pending:
+                    if node in done or node in failed or node in running.values():
+                        continue
+                    dependencies = DELETE_DEPENDENCIES[node]
+                    if any(dependency in failed for dependency in dependencies):
+                        failed.add(node)
+                        print(f"[{resources[node][1]}] Held back, a resource it depends on failed to delete")
+                    elif all(dependency in done for dependency in dependencies):
+                        future = executor.submit(delete_deployment_resource, resource_group_name,
+                                                 resources, node, attempt > 0)
+                        running[future] = node
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = running.pop(future)
+                    deleted = future.result()
+                    (done if deleted else failed).add(node)
+                    metrics.inc("resource_deletes", resource_type=resources[node][0],
+                                result="ok" if deleted else "failed")
 
-    # Check if the resource is already in Terraform state
-    resource_address = f"{tf_type}.{tf_name}"
-    if is_in_terraform_state(resource_address):
-        print(f"Resource {resource_name} is already in Terraform state as {resource_address}, skipping import")
-        return True
+    azure_inventory.invalidate_inventory(resource_group_name)
+    return [resources[node] for node in resources if node not in done]
 
-    try:
-        resource_id = f"/subscriptions/{subscription_id}/resourceGroups/{owner_tag}-biteswipe-resources/providers/{azure_type}/{resource_name}"
-        print(f"Importing {resource_name} as {tf_type}.{tf_name}...")
-        subprocess.run(
-            ["terraform", "import", f"{tf_type}.{tf_name}", resource_id],
-            cwd=TERRAFORM_DIR,
-            check=True
-        )
-        print(f"Successfully imported {tf_type}: {tf_name}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to import {tf_type}: {tf_name}")
-        print(f"Error: {e}")
-        return False
+def clear_local_state():
+    """Forget the deleted deployment locally: Terraform state, saved plan and generated imports."""
+    for name in STATE_FILE_NAMES:
+        state_file = TERRAFORM_DIR / name
+        if state_file.exists():
+            state_file.unlink()
+    terraform_state.invalidate_state_index(TERRAFORM_DIR)
+    terraform_plan_cache.clear_plan(TERRAFORM_DIR)
+    terraform_imports.clear_import_blocks(TERRAFORM_DIR)
+    print("Cleared local Terraform state, saved plan and generated imports")
 
-def get_azure_subscription_id():
-    """Get Azure subscription ID from environment variable or Azure CLI."""
-    # First try to get from environment variable
-    subscription_id = os.getenv('ARM_SUBSCRIPTION_ID')
+def get_resource_group_patterns(owner_tag, prefix=None):
+    """Resource groups a teardown looks for."""
+    resource_group_patterns = [
+        deploy_context.get_resource_group_name(owner_tag)
+    ]
     
-    # If not found, try to get from Azure CLI
-    if not subscription_id:
-        try:
-            result = subprocess.run(
-                ["az", "account", "show", "--query", "id", "-o", "tsv"],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            subscription_id = result.stdout.strip()
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            print("Error: Could not get subscription ID from Azure CLI")
-            subscription_id = None
-            
-    if not subscription_id:
-        print("Error: Azure subscription ID not found. Make sure you're logged in to Azure CLI or ARM_SUBSCRIPTION_ID is set.")
-    else:
-        print(f"Using Azure Subscription ID: {subscription_id}")
-        
-    return subscription_id
+    # Only add vm-biteswipe-resources if not using a custom prefix
+    if not prefix:
+        resource_group_patterns.append("vm-biteswipe-resources")
+    return resource_group_patterns
 
-def destroy_resource(owner_tag, resource_type, resource_name, force=False):
-    """Try to destroy a specific Azure resource."""
-    resource_group_name = f"{owner_tag}-biteswipe-resources"
-    
-    # Check if the resource group exists first
-    if not check_resource_group_exists(resource_group_name):
-        print(f"Resource group {resource_group_name} does not exist, skipping deletion of {resource_type}/{resource_name}")
-        return True  # Return true since we don't need to delete anything
-        
-    try:
-        print(f"Attempting to delete {resource_type}/{resource_name}...")
-        subprocess.run(
-            ["az", "resource", "delete",
-             "--resource-group", resource_group_name,
-             "--resource-type", resource_type,
-             "--name", resource_name,
-             "--verbose"] + (["--force"] if force else []),
-            check=True
-        )
-        print(f"Successfully deleted {resource_type}/{resource_name}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to delete {resource_type}/{resource_name}: {e}")
-        return False
+def fast_destroy(owner_tag, resource_group_patterns, wait_for_deletion=False):
+    """Submit an asynchronous deletion of every existing group and clear local state.
 
-def import_existing_resources(owner_tag):
-    """Import existing Azure resources into Terraform state."""
-    print(f"Searching for existing resources with prefix '{owner_tag}-biteswipe'...")
-    
-    # Define resources to import
-    resources_to_import = [
-        ("Microsoft.Network/publicIPAddresses", f"{owner_tag}-biteswipe-public-ip", "azurerm_public_ip", "public_ip"),
-        ("Microsoft.Network/virtualNetworks", f"{owner_tag}-biteswipe-network", "azurerm_virtual_network", "vnet"),
-        ("Microsoft.Network/networkInterfaces", f"{owner_tag}-biteswipe-nic", "azurerm_network_interface", "nic"),
-        ("Microsoft.Compute/virtualMachines", f"{owner_tag}-biteswipe", "azurerm_linux_virtual_machine", "vm"),
-        ("Microsoft.Network/networkSecurityGroups", f"{owner_tag}-biteswipe-nsg", "azurerm_network_security_group", "nsg")
-    ]
+    The local state describes the owner's resource group, so it is cleared
+    once that group's deletion is accepted (or done, when waiting). Returns
+    the groups that are still there because Azure refused (or, when waiting,
+    failed) their deletion.
+    """
+    existing_groups = azure_inventory.existing_resource_groups(resource_group_patterns)
+    if not existing_groups:
+        print("No resource groups to delete")
+    accepted = azure_operations.submit_group_deletes(existing_groups)
+    remaining = [rg for rg in existing_groups if rg not in accepted]
+    metrics.inc("group_deletes", len(accepted), path="fast", result="accepted")
+    metrics.inc("group_deletes", len(existing_groups) - len(accepted), path="fast", result="refused")
+    if accepted and wait_for_deletion:
+        results = azure_operations.wait_for_group_deletions(accepted)
+        remaining += [rg for rg in accepted if not results[rg]]
+    elif accepted:
+        print(f"Deletion of {', '.join(accepted)} continues in Azure (check with: az group list)")
+    for rg_name in accepted:
+        azure_inventory.invalidate_inventory(rg_name)
 
-    imported_resources = []
-    for azure_type, resource_name, tf_type, tf_name in resources_to_import:
-        if import_resource(owner_tag, azure_type, resource_name, tf_type, tf_name):
-            imported_resources.append((azure_type, resource_name))
+    if deploy_context.get_resource_group_name(owner_tag) not in remaining:
+        clear_local_state()
+    return remaining
 
-    # Try to import network interface association only if both NIC and NSG exist
-    if any(r[0] == "Microsoft.Network/networkInterfaces" for r in imported_resources) and \
-       any(r[0] == "Microsoft.Network/networkSecurityGroups" for r in imported_resources):
-        try:
-            nic_id = f"/subscriptions/{get_azure_subscription_id()}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/networkInterfaces/{owner_tag}-biteswipe-nic"
-            nsg_id = f"/subscriptions/{get_azure_subscription_id()}/resourceGroups/{owner_tag}-biteswipe-resources/providers/Microsoft.Network/networkSecurityGroups/{owner_tag}-biteswipe-nsg"
-            association_id = f"{nic_id}|{nsg_id}"
-            
-            print("Importing network interface association...")
-            subprocess.run(
-                ["terraform", "import", "azurerm_network_interface_security_group_association.nic_nsg_association", association_id],
-                cwd=TERRAFORM_DIR,
-                check=True
-            )
-            print("Successfully imported network interface association")
-        except subprocess.CalledProcessError:
-            print("Warning: Failed to import network interface association")
+def destroy_infrastructure(prefix=None, fast=False, wait_for_deletion=False):
+    """Destroy the Azure infrastructure in the correct order.
 
-def destroy_infrastructure(prefix=None):
-    """Destroy the Azure infrastructure in the correct order."""
-    # Initialize Terraform
-    subprocess.run(["terraform", "init"], cwd=TERRAFORM_DIR, check=True)
+    With fast, the resource groups are deleted asynchronously without touching
+    Terraform first. Only groups whose deletion is refused go on to the
+    deletion path below.
 
-    # Get owner tag and generate tfvars
+    The resources are deleted with az, not terraform destroy, so nothing is
+    imported into the Terraform state first.
+    """
     owner_tag = get_owner_tag(prefix)
+    resource_group_patterns = get_resource_group_patterns(owner_tag, prefix)
+
+    if fast:
+        resource_group_patterns = fast_destroy(owner_tag, resource_group_patterns, wait_for_deletion)
+        if not resource_group_patterns:
+            return True
+        print(f"\nFalling back to deleting {', '.join(resource_group_patterns)}...")
+
+    # Generate tfvars
     generate_tfvars(owner_tag)
     
     print(f"Using owner tag: {owner_tag}")
     
-    # Try to import existing resources first, so Terraform knows what to destroy
-    try:
-        if check_resource_group_exists(f"{owner_tag}-biteswipe-resources"):
-            import_existing_resources(owner_tag)
-    except Exception as e:
-        print(f"Warning: Error during resource import: {e}")
-        print("Continuing with deletion process...")
-    
     # Track if any resource group was successfully deleted
     any_resources_deleted = False
     
-    # Check for the existence of resource group patterns
-    resource_group_patterns = [
-        f"{owner_tag}-biteswipe-resources"
-    ]
-    
-    # Only add vm-biteswipe-resources if not using a custom prefix
-    if not prefix:
-        resource_group_patterns.append("vm-biteswipe-resources")
-    
+    existing_groups = azure_inventory.existing_resource_groups(resource_group_patterns)
     for rg_name in resource_group_patterns:
-        print(f"\nChecking if resource group {rg_name} exists...")
-        if check_resource_group_exists(rg_name):
-            print(f"Resource group {rg_name} exists. Attempting direct deletion...")
-            try:
-                # Try to delete the resource group directly
-                subprocess.run(
-                    ["az", "group", "delete",
-                    "--name", rg_name,
-                    "--yes"],
-                    check=True
-                )
-                print(f"✅ Successfully deleted resource group {rg_name} directly")
-                any_resources_deleted = True
-                continue  # Skip to next resource group pattern
-            except subprocess.CalledProcessError:
-                print(f"Direct resource group deletion failed for {rg_name}, falling back to individual resource deletion...")
-        else:
+        if rg_name not in existing_groups:
             print(f"Resource group {rg_name} does not exist, skipping")
-            continue  # Skip to next resource group pattern
-            
-        # If we get here, we need to try individual resource deletion
+
+    # Try to delete the resource groups directly, all at once, polling their state until they are gone.
+    # After --fast, Azure has just refused (or failed) that for every group left, so don't ask again
+    direct_results = {}
+    if existing_groups and not fast:
+        print(f"\nAttempting direct deletion of {', '.join(existing_groups)}...")
+        direct_results = azure_operations.delete_groups(existing_groups)
+    for rg_name, deleted in direct_results.items():
+        metrics.inc("group_deletes", path="direct", result="ok" if deleted else "failed")
+        # A failed delete may still have removed part of the group
+        azure_inventory.invalidate_inventory(rg_name)
+        if deleted:
+            print(f"✅ Successfully deleted resource group {rg_name} directly")
+            any_resources_deleted = True
+        else:
+            print(f"Direct resource group deletion failed for {rg_name}, falling back to individual resource deletion...")
+
+    failed_groups = existing_groups if fast else [rg for rg, deleted in direct_results.items() if not deleted]
+    for rg_name in failed_groups:
         # Get the resource prefix based on the resource group name
         resource_prefix = "vm" if rg_name.startswith("vm-") else owner_tag
         
-        resource_order = [
-            # First delete the VM
-            ("Microsoft.Compute/virtualMachines", f"{resource_prefix}-biteswipe"),
-            
-            # Then delete network interface associations
-            ("Microsoft.Network/networkInterfaces", f"{resource_prefix}-biteswipe-nic"),
-            
-            # Then delete the subnet
-            ("Microsoft.Network/virtualNetworks/subnets", f"{resource_prefix}-internal"),
-            
-            # Then delete networking resources
-            ("Microsoft.Network/publicIPAddresses", f"{resource_prefix}-biteswipe-public-ip"),
-            ("Microsoft.Network/networkSecurityGroups", f"{resource_prefix}-biteswipe-nsg"),
-            ("Microsoft.Network/virtualNetworks", f"{resource_prefix}-biteswipe-network"),
-        ]
-
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            print(f"\nAttempt {attempt + 1} of {max_attempts} for {rg_name}")
-            failed_resources = []
-
-            # Try to delete resources in order
-            for resource_type, resource_name in resource_order:
-                if not destroy_resource(resource_prefix, resource_type, resource_name, force=(attempt > 0)):
-                    failed_resources.append((resource_type, resource_name))
+        try:
+            failed_resources = delete_resources_in_dependency_order(rg_name, resource_prefix)
+        except azure_inventory.InventoryError as e:
+            # Without a listing nothing can be skipped safely, leave it to the forced group delete
+            print(f"Warning: {e}")
+            failed_resources = [(rg_name, "unknown resources")]
+        if not failed_resources:
+            print(f"\nAll resources in {rg_name} deleted successfully!")
+            any_resources_deleted = True
+        else:
+            print(f"\nFailed to delete some resources in {rg_name} after all attempts.")
+            print("Failed resources:", failed_resources)
 
-            if not failed_resources:
-                print(f"\nAll resources in {rg_name} deleted successfully!")
+            # As a last resort, try to delete the entire resource group with force
+            print(f"\nAttempting to force delete entire resource group {rg_name}...")
+            deleted = azure_operations.delete_group(rg_name, force=True)
+            metrics.inc("group_deletes", path="force", result="ok" if deleted else "failed")
+            azure_inventory.invalidate_inventory(rg_name)
+            if deleted:
+                print(f"Successfully force deleted resource group {rg_name}")
                 any_resources_deleted = True
-                break
-            elif attempt < max_attempts - 1:
-                print(f"\nSome resources in {rg_name} failed to delete. Waiting before retry...")
-                print("Failed resources:", failed_resources)
-                time.sleep(30)  # Wait before next attempt
             else:
-                print(f"\nFailed to delete some resources in {rg_name} after all attempts.")
-                print("Failed resources:", failed_resources)
-                
-                # As a last resort, try to delete the entire resource group with force
-                print(f"\nAttempting to force delete entire resource group {rg_name}...")
-                try:
-                    subprocess.run(
-                        ["az", "group", "delete",
-                        "--name", rg_name,
-                        "--yes", "--force"],
-                        check=True
-                    )
-                    print(f"Successfully force deleted resource group {rg_name}")
-                    any_resources_deleted = True
-                except subprocess.CalledProcessError:
-                    print(f"Failed to force delete resource group {rg_name}")
+                print(f"Failed to force delete resource group {rg_name}")
     
     # Return success if any resource group was deleted or if no resource groups were found
     # (which means there's nothing to delete, so it's a success)
-    return any_resources_deleted or all(not check_resource_group_exists(rg) for rg in resource_group_patterns)
+    remaining_groups = azure_inventory.existing_resource_groups(resource_group_patterns)
+    metrics.set_gauge("remaining_resource_groups", len(remaining_groups))
+    for rg_name in resource_group_patterns:
+        if rg_name in remaining_groups:
+            print(f"❌ {rg_name}: still exists")
+        elif rg_name in existing_groups:
+            print(f"✅ {rg_name}: deleted")
+    success = any_resources_deleted or not remaining_groups
+    if success:
+        # The generated import blocks refer to resources that no longer exist
+        terraform_imports.clear_import_blocks(TERRAFORM_DIR)
+    return success
 
 if __name__ == "__main__":
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description='Destroy Azure infrastructure for BiteSwipe.')
     parser.add_argument('--prefix', type=str, help='Prefix for resource names (overrides GITHUB_ACTOR/username)')
+    parser.add_argument('--fast', action='store_true',
+                        help='Delete the resource groups asynchronously and clear local state, skipping Terraform unless Azure refuses')
+    parser.add_argument('--wait', action='store_true', help='With --fast, wait until the resource groups are gone')
     args = parser.parse_args()
-    
-    if destroy_infrastructure(args.prefix):
+
+    metrics.configure("destroy_infra")
+    mode = "fast" if args.fast else "full"
+    started = time.monotonic()
+    succeeded = False
+    try:
+        succeeded = destroy_infrastructure(args.prefix, args.fast, args.wait)
+    finally:
+        metrics.observe("run", time.monotonic() - started, action="destroy", mode=mode)
+        metrics.set_gauge("run_success", int(succeeded), action="destroy", mode=mode)
+        metrics.export()
+
+    if succeeded:
         print("✅ Infrastructure destroyed successfully")
         sys.exit(0)
     else:
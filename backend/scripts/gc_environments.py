@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Garbage-collect stale BiteSwipe environments.
+
+Every owner (GitHub actor or --prefix) that ever deployed leaves a
+<owner>-biteswipe-resources group behind. This lists all of them with a
+single `az group list`, decides per group whether it has expired under the
+retention policy, and deletes the expired groups in parallel, a few at a time.
+
+Retention policy:
+    - groups of the shared environments (master, dev) and of --keep-owner are kept
+    - with --owner, only the groups of those owners are considered
+    - a group expires once it is older than --max-age
+    - groups whose age can't be told, or that are already being deleted, are left alone
+
+The age comes from the group's `created` tag (set by Terraform). Azure reports
+no creation time for a group itself, so groups without the tag (created before
+it existed, or adopted by an import, which never sets it) are dated by their
+oldest resource, with one `az resource list` per untagged group.
+
+Usage:
+    gc_environments.py --dry-run                     # report only
+    gc_environments.py --max-age 14d --keep-owner alice
+    gc_environments.py --owner bob --max-age 0 --max-parallel 2
+"""
+
+import argparse
+import datetime
+import json
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import azure_operations
+
+RESOURCE_GROUP_SUFFIX = "-biteswipe-resources"
+# Owner tags of the environments deployed from main and develop (see deploy_context)
+PROTECTED_OWNERS = ("master", "dev")
+DEFAULT_MAX_AGE = "7d"
+DEFAULT_MAX_PARALLEL = 4
+
+DELETE = "delete"
+KEEP = "keep"
+
+
+def parse_age(value):
+    """Parse an age such as 7d, 36h, 90m or a plain number of days into a timedelta."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([dhm]?)\s*', str(value))
+    if not match:
+        raise ValueError(f"invalid age '{value}', expected e.g. 7d, 36h or 90m")
+    amount, unit = float(match.group(1)), match.group(2) or 'd'
+    unit_name = {'d': 'days', 'h': 'hours', 'm': 'minutes'}[unit]
+    return datetime.timedelta(**{unit_name: amount})
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        created = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return created if created.tzinfo else created.replace(tzinfo=datetime.timezone.utc)
+
+
+def oldest_resource_time(resource_group_name):
+    """Creation time of the oldest resource in the group, or None if it has none (or can't be listed)."""
+    result = subprocess.run(
+        ["az", "resource", "list",
+         "--resource-group", resource_group_name,
+         "--query", "[].{name: name, createdTime: createdTime}",
+         "--output", "json"],
+        capture_output=True,
+        text=True,
+        check=False
+    )
+    if result.returncode != 0:
+        return None
+    created = [_parse_timestamp(resource.get('createdTime')) for resource in json.loads(result.stdout or '[]')]
+    return min((timestamp for timestamp in created if timestamp), default=None)
+
+
+def list_environments():
+    """List every BiteSwipe resource group with one az call, dating untagged groups by their resources.
+
+    Returns a list of {name, owner, created, state} dicts, or None if the groups could not be listed.
+    """
+    try:
+        result = subprocess.run(
+            ["az", "group", "list",
+             "--query", f"[?ends_with(name, '{RESOURCE_GROUP_SUFFIX}')]",
+             "--output", "json"],
+            capture_output=True,
+            text=True,
+            check=False
+        )
+    except FileNotFoundError:
+        print("Error: Azure CLI not found")
+        return None
+    if result.returncode != 0:
+        print(f"Error listing resource groups: {result.stderr.strip()}")
+        return None
+
+    environments = []
+    for group in json.loads(result.stdout or '[]'):
+        name = group['name']
+        if not name.lower().endswith(RESOURCE_GROUP_SUFFIX):
+            continue
+        tags = group.get('tags') or {}
+        environments.append({
+            'name': name,
+            'owner': tags.get('owner') or name[:-len(RESOURCE_GROUP_SUFFIX)],
+            'created': _parse_timestamp(tags.get('created')),
+            'state': (group.get('properties') or {}).get('provisioningState'),
+        })
+
+    untagged = [environment for environment in environments
+                if environment['created'] is None and environment['state'] != "Deleting"]
+    if untagged:
+        with ThreadPoolExecutor(max_workers=DEFAULT_MAX_PARALLEL) as executor:
+            for environment, created in zip(untagged, executor.map(
+                    lambda environment: oldest_resource_time(environment['name']), untagged)):
+                environment['created'] = created
+    return environments
+
+
+def apply_policy(environments, max_age, keep_owners=(), only_owners=None, now=None):
+    """Decide what happens to each environment. Returns (environment, action, reason) tuples."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    keep_owners = {owner.lower() for owner in (*PROTECTED_OWNERS, *keep_owners)}
+    only_owners = {owner.lower() for owner in only_owners} if only_owners else None
+
+    decisions = []
+    for environment in sorted(environments, key=lambda env: env['name'].lower()):
+        owner = environment['owner'].lower()
+        age = now - environment['created'] if environment['created'] else None
+        if environment['state'] == "Deleting":
+            decisions.append((environment, KEEP, "already being deleted"))
+        elif owner in keep_owners:
+            decisions.append((environment, KEEP, "protected owner"))
+        elif only_owners is not None and owner not in only_owners:
+            decisions.append((environment, KEEP, "owner not selected"))
+        elif age is None:
+            decisions.append((environment, KEEP, "age unknown"))
+        elif age <= max_age:
+            decisions.append((environment, KEEP, "within max age"))
+        else:
+            decisions.append((environment, DELETE, "older than max age"))
+    return decisions
+
+
+def _format_age(environment, now):
+    if not environment['created']:
+        return "?"
+    age = now - environment['created']
+    if age >= datetime.timedelta(days=1):
+        return f"{age.total_seconds() / 86400:.1f}d"
+    return f"{age.total_seconds() / 3600:.1f}h"
+
+
+def print_report(decisions, now=None):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    print(f"\n{'resource group':<40} {'owner':<16} {'age':>7} {'action':<7} reason")
+    print("-" * 90)
+    for environment, action, reason in decisions:
+        print(f"{environment['name']:<40} {environment['owner']:<16} "
+              f"{_format_age(environment, now):>7} {action:<7} {reason}")
+    expired = sum(1 for _, action, _ in decisions if action == DELETE)
+    print(f"\n{len(decisions)} environment(s), {expired} expired")
+
+
+def delete_environments(resource_group_names, max_parallel=DEFAULT_MAX_PARALLEL, wait_for_deletion=True):
+    """Delete the groups, at most max_parallel at a time. Returns the names that were not deleted."""
+    if not resource_group_names:
+        return []
+    if wait_for_deletion:
+        delete = azure_operations.delete_group
+    else:
+        def delete(name):
+            return bool(azure_operations.submit_group_deletes([name]))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        results = list(executor.map(delete, resource_group_names))
+    return [name for name, deleted in zip(resource_group_names, results) if not deleted]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete stale *-biteswipe-resources groups.')
+    parser.add_argument('--max-age', default=DEFAULT_MAX_AGE,
+                        help=f'Delete environments older than this, e.g. 7d, 36h (default: {DEFAULT_MAX_AGE})')
+    parser.add_argument('--keep-owner', action='append', default=[],
+                        help=f"Never delete this owner's environment (repeatable; {', '.join(PROTECTED_OWNERS)} always kept)")
+    parser.add_argument('--owner', action='append',
+                        help='Only consider the environments of this owner (repeatable)')
+    parser.add_argument('--max-parallel', type=int, default=DEFAULT_MAX_PARALLEL,
+                        help=f'Maximum number of groups deleted at once (default: {DEFAULT_MAX_PARALLEL})')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+    parser.add_argument('--no-wait', action='store_true',
+                        help='Submit the deletions and exit without waiting for them to finish')
+    args = parser.parse_args()
+
+    try:
+        max_age = parse_age(args.max_age)
+    except ValueError as e:
+        parser.error(str(e))
+
+    environments = list_environments()
+    if environments is None:
+        sys.exit(1)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    decisions = apply_policy(environments, max_age, args.keep_owner, args.owner, now)
+    print_report(decisions, now)
+
+    expired = [environment['name'] for environment, action, _ in decisions if action == DELETE]
+    if args.dry_run or not expired:
+        if args.dry_run:
+            print("Dry run, nothing deleted")
+        sys.exit(0)
+
+    print(f"\n🧹 Deleting {len(expired)} environment(s), {args.max_parallel} at a time...")
+    failed = delete_environments(expired, args.max_parallel, wait_for_deletion=not args.no_wait)
+    if failed:
+        print(f"❌ Failed to delete: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"✅ {'Submitted deletion of' if args.no_wait else 'Deleted'} {len(expired)} environment(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Benchmark the deploy/destroy pipeline offline against the fake az/terraform.
+
+Every step runs the real scripts (deploy_infra.py, destroy_infra.py, ...)
+with harness/bin first on PATH, a throwaway HOME (with a dummy SSH key), a
+private Terraform working directory and a fresh fake cloud. For each step the
+wall time, the number of az/terraform launches per command and, for
+deploy_infra.py, the time per phase from its deploy trace are reported.
+
+Default steps, run in order against the same fake cloud:
+    deploy-cold     first deployment into an empty subscription
+    deploy-noop     the same deployment again, nothing changed
+    deploy-adopt    local state lost, resources exist and are adopted
+    destroy         destroy_infra.py tears everything down
+
+Usage:
+    benchmark.py [--steps deploy-cold,deploy-noop] [--latency-scale 0.1]
+                 [--scenario scenario.json] [--json results.json] [--keep]
+"""
+
+import argparse
+import collections
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+harness_dir = pathlib.Path(__file__).resolve().parent
+scripts_dir = harness_dir.parent
+terraform_source_dir = scripts_dir.parent / 'terraform'
+
+OWNER_TAG = "bench"
+
+# Rough latencies of the real CLIs in seconds, scaled by --latency-scale
+DEFAULT_SCENARIO = {
+    "latency": {
+        "default": 0.3,
+        "az": 1.5,
+        "az account show": 1.0,
+        "az resource list": 1.5,
+        "az resource delete": 10.0,
+        "az group delete": 60.0,
+        "az network nic show": 1.5,
+        "terraform": 0.5,
+        "terraform init": 6.0,
+        "terraform show": 1.0,
+        "terraform plan": 15.0,
+        "terraform apply": 120.0,
+        "terraform import": 10.0,
+        "terraform output": 0.5,
+        "terraform destroy": 90.0,
+    },
+    "deletion_seconds": {"group": 60.0, "resource": 10.0},
+    "latency_scale": 0.01,
+    "failures": [],
+}
+
+
+def _forget_local_state(workspace):
+    for name in ('terraform.tfstate', 'terraform.tfstate.backup', 'tfplan', 'tfplan.meta.json'):
+        path = workspace['terraform_dir'] / name
+        if path.exists():
+            path.unlink()
+
+
+STEPS = {
+    'deploy-cold': {
+        'command': ['deploy_infra.py', '--prefix', OWNER_TAG, '--no-kill-terraform'],
+        'traced': True,
+    },
+    'deploy-noop': {
+        'command': ['deploy_infra.py', '--prefix', OWNER_TAG, '--no-kill-terraform'],
+        'traced': True,
+    },
+    'deploy-adopt': {
+        'command': ['deploy_infra.py', '--prefix', OWNER_TAG, '--no-kill-terraform'],
+        'traced': True,
+        'before': _forget_local_state,
+    },
+    'destroy': {
+        'command': ['destroy_infra.py', '--prefix', OWNER_TAG],
+        'traced': False,
+    },
+}
+
+
+def create_workspace(root, scenario):
+    """Lay out HOME, the Terraform working copy and the fake cloud under root."""
+    root = pathlib.Path(root)
+    home = root / 'home'
+    ssh_dir = home / '.ssh' / 'to_azure'
+    ssh_dir.mkdir(parents=True)
+    (ssh_dir / 'CPEN321.pem').write_text("fake private key\n")
+    (ssh_dir / 'CPEN321.pub').write_text("ssh-rsa AAAAfake bench@harness\n")
+    (ssh_dir / 'CPEN321.pem').chmod(0o600)
+
+    terraform_dir = root / 'terraform'
+    terraform_dir.mkdir()
+    for tf_file in terraform_source_dir.glob('*.tf'):
+        if tf_file.name != 'imports_generated.tf':
+            shutil.copy2(tf_file, terraform_dir / tf_file.name)
+
+    cloud_dir = root / 'cloud'
+    cloud_dir.mkdir()
+    (cloud_dir / 'scenario.json').write_text(json.dumps(scenario, indent=2))
+
+    return {
+        'root': root,
+        'home': home,
+        'terraform_dir': terraform_dir,
+        'cloud_dir': cloud_dir,
+        'traces_dir': root / 'traces',
+    }
+
+
+def harness_env(workspace, scenario):
+    """Environment that points the scripts at the fakes and the workspace only."""
+    env = dict(os.environ)
+    for name in ('ARM_SUBSCRIPTION_ID', 'GITHUB_REF', 'GITHUB_ACTOR', 'TF_PLUGIN_CACHE_DIR'):
+        env.pop(name, None)
+    env.update({
+        'PATH': f"{harness_dir / 'bin'}{os.pathsep}{env.get('PATH', '')}",
+        'HOME': str(workspace['home']),
+        'FAKE_CLOUD_DIR': str(workspace['cloud_dir']),
+        'BITESWIPE_TERRAFORM_DIR': str(workspace['terraform_dir']),
+        'BITESWIPE_CONTEXT_CACHE': str(workspace['root'] / 'deploy_context.json'),
+        # The fake VM has no SSH or HTTPS listener, probe once and move on
+        'BITESWIPE_READINESS_DEADLINE': '0',
+        # Poll fake deletions on the same time scale as their latencies
+        'BITESWIPE_POLL_INTERVAL_SCALE': str(scenario.get('latency_scale', 1.0)),
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+    return env
+
+
+def read_invocations(cloud_dir, offset):
+    """Return the invocations logged after byte offset, and the new offset."""
+    log_file = pathlib.Path(cloud_dir) / 'invocations.jsonl'
+    if not log_file.exists():
+        return [], offset
+    with open(log_file, 'r') as f:
+        f.seek(offset)
+        lines = f.readlines()
+        offset = f.tell()
+    return [json.loads(line) for line in lines if line.strip()], offset
+
+
+def phase_times(trace_file):
+    """Total seconds per phase (top two levels) from a deploy trace."""
+    try:
+        with open(trace_file, 'r') as f:
+            summary = json.load(f)['otherData']['summary']
+    except (FileNotFoundError, KeyError, ValueError):
+        return []
+    return [
+        {'name': row['name'], 'depth': row['depth'], 'seconds': row['total_seconds'], 'count': row['count']}
+        for row in summary if row['category'] == 'phase' and row['depth'] <= 1
+    ]
+
+
+def run_step(name, workspace, env, offset, verbose=False):
+    step = STEPS[name]
+    if step.get('before'):
+        step['before'](workspace)
+
+    command = [sys.executable, str(scripts_dir / step['command'][0]), *step['command'][1:]]
+    trace_file = workspace['traces_dir'] / f"{name}.json"
+    if step['traced']:
+        command += ['--trace-file', str(trace_file),
+                    '--log-file', str(workspace['root'] / 'logs' / f"{name}.log")]
+
+    start = time.monotonic()
+    result = subprocess.run(
+        command, cwd=scripts_dir, env=env,
+        stdout=None if verbose else subprocess.PIPE,
+        stderr=subprocess.STDOUT, text=True, check=False
+    )
+    wall = time.monotonic() - start
+
+    invocations, offset = read_invocations(workspace['cloud_dir'], offset)
+    launches = collections.Counter(entry['command'] for entry in invocations)
+    fake_seconds = collections.defaultdict(float)
+    for entry in invocations:
+        fake_seconds[entry['command']] += entry['duration']
+
+    return {
+        'step': name,
+        'exit_code': result.returncode,
+        'wall_seconds': wall,
+        'launches': sum(launches.values()),
+        'by_command': [
+            {'command': command_name, 'count': count, 'seconds': fake_seconds[command_name]}
+            for command_name, count in launches.most_common()
+        ],
+        'phases': phase_times(trace_file) if step['traced'] else [],
+        'output_tail': (result.stdout or '').splitlines()[-20:],
+    }, offset
+
+
+def print_report(results):
+    print("\n📊 Deploy pipeline benchmark")
+    print(f"{'step':<14} {'exit':>4} {'wall (s)':>9} {'launches':>9}")
+    print("-" * 40)
+    for result in results:
+        print(f"{result['step']:<14} {result['exit_code']:>4} {result['wall_seconds']:>9.2f} {result['launches']:>9}")
+
+    for result in results:
+        print(f"\n{result['step']}")
+        for entry in result['by_command']:
+            print(f"  {entry['count']:>3} x {entry['command']:<28} {entry['seconds']:>8.2f}s")
+        for phase in result['phases']:
+            label = "  " * phase['depth'] + phase['name']
+            print(f"  phase {label:<40} {phase['seconds']:>8.2f}s")
+        if result['exit_code'] != 0:
+            print("  last output:")
+            for line in result['output_tail']:
+                print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the deploy scripts against fake az/terraform.')
+    parser.add_argument('--steps', default=','.join(STEPS),
+                        help=f"Comma-separated steps to run in order (default: {','.join(STEPS)})")
+    parser.add_argument('--scenario', help='JSON file with latencies and failures, merged over the defaults')
+    parser.add_argument('--latency-scale', type=float, help='Multiply every fake latency by this factor')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--keep', action='store_true', help='Keep the workspace for inspection')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of the scripts')
+    args = parser.parse_args()
+
+    steps = [step.strip() for step in args.steps.split(',') if step.strip()]
+    unknown = [step for step in steps if step not in STEPS]
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(unknown)}")
+
+    scenario = json.loads(json.dumps(DEFAULT_SCENARIO))
+    if args.scenario:
+        with open(args.scenario, 'r') as f:
+            overrides = json.load(f)
+        scenario['latency'].update(overrides.pop('latency', {}))
+        scenario.update(overrides)
+    if args.latency_scale is not None:
+        scenario['latency_scale'] = args.latency_scale
+
+    root = pathlib.Path(tempfile.mkdtemp(prefix='biteswipe-bench-'))
+    try:
+        workspace = create_workspace(root, scenario)
+        env = harness_env(workspace, scenario)
+        results = []
+        offset = 0
+        for step in steps:
+            print(f"▶ {step}...", flush=True)
+            result, offset = run_step(step, workspace, env, offset, args.verbose)
+            results.append(result)
+
+        print_report(results)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'scenario': scenario, 'results': results}, f, indent=2)
+            print(f"\nResults written to {args.json}")
+    finally:
+        if args.keep:
+            print(f"\nWorkspace kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    sys.exit(0 if all(result['exit_code'] == 0 for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Shared model behind the fake `az` and `terraform` executables.
+
+The fake cloud is a JSON file that records resource groups and their
+resources. Both fakes load it under a file lock, act on it and write it back,
+so several fake processes (e.g. parallel deploys) can run at once.
+
+Everything lives in one directory, given by FAKE_CLOUD_DIR:
+    cloud.json          resource groups, resources and NIC/NSG associations
+    scenario.json       optional latencies and scripted failures (see below)
+    invocations.jsonl   one line per fake invocation: tool, argv, cwd, timing, exit code
+
+scenario.json:
+    {
+      "latency": {"default": 0.05, "az group delete": 2.0, "terraform apply": 3.0},
+      "latency_scale": 1.0,
+      "deletion_seconds": {"group": 1.0, "resource": 0.3},
+      "failures": [
+        {"command": "az group delete", "match": "dev-", "times": 1,
+         "exit_code": 1, "stderr": "Conflict"}
+      ]
+    }
+
+deletion_seconds is how long a deletion started with --no-wait takes to
+finish. Latencies are matched on the longest leading run of the command words
+(flags excluded). A failure applies to invocations whose command words start
+with "command" and whose argv contains "match"; "times" limits how often it
+fires (default: always).
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import pathlib
+import sys
+import time
+
+DEFAULT_SUBSCRIPTION_ID = "00000000-0000-0000-0000-000000000000"
+
+
+class CommandError(Exception):
+    """Raised by a fake command to exit with an error, like the real CLI would."""
+
+    def __init__(self, message, exit_code=1):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+class Delayed:
+    """Returned by a handler that has to block (e.g. `az group wait`) after the cloud is saved."""
+
+    def __init__(self, seconds, output=None):
+        self.seconds = seconds
+        self.output = output
+
+
+def cloud_dir():
+    """Directory holding the fake cloud, from FAKE_CLOUD_DIR."""
+    directory = os.getenv('FAKE_CLOUD_DIR')
+    if not directory:
+        raise CommandError("FAKE_CLOUD_DIR is not set", exit_code=2)
+    return pathlib.Path(directory)
+
+
+def empty_cloud():
+    return {
+        'subscription_id': DEFAULT_SUBSCRIPTION_ID,
+        'groups': {},
+        'associations': {},
+        'failures_fired': {},
+        'next_ip': 10,
+    }
+
+
+@contextlib.contextmanager
+def locked_cloud():
+    """Load the cloud under an exclusive lock and save it on the way out."""
+    directory = cloud_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / 'cloud.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            cloud = json.loads((directory / 'cloud.json').read_text())
+        except (FileNotFoundError, ValueError):
+            cloud = empty_cloud()
+        try:
+            yield cloud
+        finally:
+            # Saved even when the command fails, so fired failures are counted
+            temp_file = directory / f"cloud.json.{os.getpid()}.tmp"
+            temp_file.write_text(json.dumps(cloud, indent=2))
+            os.replace(temp_file, directory / 'cloud.json')
+
+
+def load_scenario():
+    try:
+        return json.loads((cloud_dir() / 'scenario.json').read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def command_words(tool, argv):
+    """The command path of an invocation, e.g. ['az', 'group', 'delete']."""
+    words = [tool]
+    for arg in argv:
+        if arg.startswith('-'):
+            break
+        words.append(arg)
+    return words
+
+
+def latency_for(scenario, words):
+    latencies = scenario.get('latency', {})
+    for length in range(len(words), 0, -1):
+        key = " ".join(words[:length])
+        if key in latencies:
+            return latencies[key] * scenario.get('latency_scale', 1.0)
+    return latencies.get('default', 0.0) * scenario.get('latency_scale', 1.0)
+
+
+def scripted_failure(scenario, cloud, words, argv):
+    """Return the failure to raise for this invocation, if the scenario has one left."""
+    command = " ".join(words)
+    for index, failure in enumerate(scenario.get('failures', [])):
+        if not command.startswith(failure['command']):
+            continue
+        if failure.get('match') and failure['match'] not in " ".join(argv):
+            continue
+        fired = cloud['failures_fired'].get(str(index), 0)
+        if 'times' in failure and fired >= failure['times']:
+            continue
+        cloud['failures_fired'][str(index)] = fired + 1
+        return CommandError(failure.get('stderr', f"Scripted failure of {command}"), failure.get('exit_code', 1))
+    return None
+
+
+def deletion_seconds(scenario, kind):
+    """How long an asynchronous (--no-wait) deletion of a "group" or "resource" takes."""
+    default = {'group': 1.0, 'resource': 0.3}[kind]
+    return scenario.get('deletion_seconds', {}).get(kind, default) * scenario.get('latency_scale', 1.0)
+
+
+def option(argv, *names, default=None):
+    """Value of a --name value or --name=value option."""
+    for index, arg in enumerate(argv):
+        for name in names:
+            if arg == name and index + 1 < len(argv):
+                return argv[index + 1]
+            if arg.startswith(f"{name}="):
+                return arg[len(name) + 1:]
+    return default
+
+
+def render(value, argv):
+    """Format command output like the CLI: JSON, or a scalar --query result with -o tsv.
+
+    Only dotted-path queries (e.g. properties.provisioningState) are evaluated.
+    """
+    query = option(argv, '--query')
+    if option(argv, '-o', '--output') == 'tsv' and query and all(part.isidentifier() for part in query.split('.')):
+        for part in query.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        return "" if value is None else str(value)
+    return json.dumps(value, indent=2)
+
+
+def group_is_gone(group, now=None):
+    """A group (or resource) deleted with --no-wait disappears once its deletion finishes."""
+    deleted_at = group.get('deleted_at')
+    return deleted_at is not None and (now or time.time()) >= deleted_at
+
+
+def live_groups(cloud):
+    """Groups that exist, pruning the groups and resources whose deletion has finished."""
+    now = time.time()
+    for name in [name for name, group in cloud['groups'].items() if group_is_gone(group, now)]:
+        del cloud['groups'][name]
+    for group in cloud['groups'].values():
+        for key in [key for key, resource in group['resources'].items() if group_is_gone(resource, now)]:
+            del group['resources'][key]
+    return cloud['groups']
+
+
+def group_id(cloud, group_name):
+    return f"/subscriptions/{cloud['subscription_id']}/resourceGroups/{group_name}"
+
+
+def create_group(cloud, group_name, location="westus2", tags=None):
+    groups = live_groups(cloud)
+    if group_name not in groups:
+        groups[group_name] = {
+            'name': group_name,
+            'location': location,
+            'tags': tags or {},
+            'created_at': time.time(),
+            'deleted_at': None,
+            'resources': {},
+        }
+    return groups[group_name]
+
+
+def add_resource(cloud, group_name, resource_type, resource_name, properties=None, resource_id=None):
+    group = create_group(cloud, group_name)
+    resource = {
+        'name': resource_name,
+        'type': resource_type,
+        'id': resource_id or f"{group_id(cloud, group_name)}/providers/{resource_type}/{resource_name}",
+        'properties': properties or {},
+        'created_at': time.time(),
+    }
+    group['resources'][f"{resource_type.lower()}/{resource_name.lower()}"] = resource
+    return resource
+
+
+def find_resource(cloud, resource_id):
+    """Return (group, key) of the resource with this id, or (None, None)."""
+    for group in live_groups(cloud).values():
+        for key, resource in group['resources'].items():
+            if resource['id'].lower() == resource_id.lower():
+                return group, key
+    return None, None
+
+
+def resource_exists(cloud, resource_id):
+    parts = resource_id.rstrip('/').split('/')
+    if len(parts) == 5:
+        return parts[4] in live_groups(cloud)
+    return find_resource(cloud, resource_id)[0] is not None
+
+
+def allocate_ip(cloud):
+    """Loopback addresses, so readiness probes against the fake VM fail fast instead of timing out."""
+    cloud['next_ip'] += 1
+    return f"127.0.0.{cloud['next_ip'] % 250 + 2}"
+
+
+def run(tool, handler):
+    """Entry point of a fake executable: apply latency and failures, log the invocation."""
+    argv = sys.argv[1:]
+    words = command_words(tool, argv)
+    start = time.time()
+    exit_code = 0
+    try:
+        scenario = load_scenario()
+        time.sleep(latency_for(scenario, words))
+        with locked_cloud() as cloud:
+            failure = scripted_failure(scenario, cloud, words, argv)
+            if failure:
+                raise failure
+            output = handler(cloud, argv, scenario)
+        # Block outside the lock so other fake processes can carry on
+        if isinstance(output, Delayed):
+            time.sleep(max(output.seconds, 0))
+            output = output.output
+        if output is not None:
+            sys.stdout.write(output if output.endswith("\n") else output + "\n")
+    except CommandError as e:
+        exit_code = e.exit_code
+        if str(e):
+            sys.stderr.write(f"ERROR: {e}\n")
+
+    entry = {
+        'tool': tool,
+        'command': " ".join(words),
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'start': start,
+        'duration': time.time() - start,
+        'exit_code': exit_code,
+    }
+    try:
+        with open(cloud_dir() / 'invocations.jsonl', 'a') as log:
+            log.write(json.dumps(entry) + "\n")
+    except CommandError:
+        pass
+    sys.exit(exit_code)
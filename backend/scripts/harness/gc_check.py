@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Check gc_environments.py against the fake az.
+
+Seeds a fake cloud with BiteSwipe environments of different owners and ages
+(plus a group that isn't BiteSwipe's), then runs the collector twice:
+with --dry-run nothing may change, and for real exactly the expired groups
+must be gone while the protected, kept and recent ones remain. Groups without
+a created tag are dated by their oldest resource, like the real az allows;
+an untagged group without resources has no known age and is kept. Also checks
+that the groups were listed with a single az group list and that no more than
+--max-parallel deletions were in flight at once.
+
+Usage:
+    gc_check.py [--verbose] [--keep]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+harness_dir = pathlib.Path(__file__).resolve().parent
+scripts_dir = harness_dir.parent
+
+import fake_cloud  # noqa: E402
+
+DAY = 86400
+MAX_PARALLEL = 2
+DELETION_SECONDS = 0.5
+
+# name: (owner tag, age in days, tagged with its creation time). Untagged groups
+# get a public IP of that age, except those listed in EMPTY_GROUPS
+ENVIRONMENTS = {
+    'alice-biteswipe-resources': ('alice', 30, True),
+    'bob-biteswipe-resources': ('bob', 10, True),
+    'carol-biteswipe-resources': ('carol', 9, False),
+    'dave-biteswipe-resources': ('dave', 1, True),
+    'frank-biteswipe-resources': ('frank', 20, False),
+    'erin-biteswipe-resources': ('erin', 40, True),
+    'master-biteswipe-resources': ('master', 100, True),
+    'dev-biteswipe-resources': ('dev', 100, True),
+    'unrelated-resources': ('alice', 100, True),
+}
+# With --max-age 7d --keep-owner erin
+EXPECTED_DELETED = {'alice-biteswipe-resources', 'bob-biteswipe-resources', 'carol-biteswipe-resources'}
+EMPTY_GROUPS = {'frank-biteswipe-resources'}
+UNTAGGED = {name for name, (_, _, tagged) in ENVIRONMENTS.items() if not tagged}
+
+
+def seed_cloud(cloud_directory):
+    os.environ['FAKE_CLOUD_DIR'] = str(cloud_directory)
+    (cloud_directory / 'scenario.json').write_text(json.dumps({
+        'latency': {'default': 0.02},
+        'deletion_seconds': {'group': DELETION_SECONDS},
+    }))
+    now = time.time()
+    with fake_cloud.locked_cloud() as cloud:
+        for name, (owner, age_days, tagged) in ENVIRONMENTS.items():
+            created_at = now - age_days * DAY
+            tags = {'owner': owner}
+            if tagged:
+                tags['created'] = datetime.datetime.fromtimestamp(
+                    created_at, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+            group = fake_cloud.create_group(cloud, name, tags=tags)
+            group['created_at'] = created_at
+            if not tagged and name not in EMPTY_GROUPS:
+                resource = fake_cloud.add_resource(cloud, name, "Microsoft.Network/publicIPAddresses",
+                                                   f"{owner}-biteswipe-public-ip")
+                resource['created_at'] = created_at
+
+
+def group_names(cloud_directory):
+    cloud = json.loads((cloud_directory / 'cloud.json').read_text())
+    return set(fake_cloud.live_groups(cloud))
+
+
+def invocations(cloud_directory):
+    log_file = cloud_directory / 'invocations.jsonl'
+    if not log_file.exists():
+        return []
+    return [json.loads(line) for line in log_file.read_text().splitlines() if line.strip()]
+
+
+def capped(entries, max_parallel, deletion_seconds):
+    """True if no deletion was submitted before the one max_parallel places earlier had finished."""
+    submits = sorted(entry['start'] for entry in entries if entry['command'] == 'az group delete')
+    return all(
+        submits[index] - submits[index - max_parallel] >= deletion_seconds
+        for index in range(max_parallel, len(submits))
+    )
+
+
+def run_gc(args, env, verbose):
+    result = subprocess.run(
+        [sys.executable, str(scripts_dir / 'gc_environments.py'), *args],
+        cwd=scripts_dir, env=env, capture_output=True, text=True, check=False
+    )
+    if verbose:
+        print(result.stdout, result.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check gc_environments.py against the fake az.')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of the collector')
+    parser.add_argument('--keep', action='store_true', help='Keep the fake cloud for inspection')
+    args = parser.parse_args()
+
+    root = pathlib.Path(tempfile.mkdtemp(prefix='biteswipe-gc-'))
+    failures = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failures.append(message)
+
+    try:
+        cloud_directory = root / 'cloud'
+        cloud_directory.mkdir()
+        seed_cloud(cloud_directory)
+        env = dict(os.environ)
+        env.update({
+            'PATH': f"{harness_dir / 'bin'}{os.pathsep}{env.get('PATH', '')}",
+            'FAKE_CLOUD_DIR': str(cloud_directory),
+            'BITESWIPE_POLL_INTERVAL_SCALE': '0.05',
+            'PYTHONDONTWRITEBYTECODE': '1',
+        })
+        policy = ['--max-age', '7d', '--keep-owner', 'erin', '--max-parallel', str(MAX_PARALLEL)]
+
+        result = run_gc(policy + ['--dry-run'], env, args.verbose)
+        check(result.returncode == 0, "dry run exits 0")
+        check(group_names(cloud_directory) == set(ENVIRONMENTS), "dry run deletes nothing")
+        check(all(name in result.stdout for name in EXPECTED_DELETED) and "3 expired" in result.stdout,
+              "dry run reports the expired environments")
+        listings = [e for e in invocations(cloud_directory) if e['command'] == 'az group list']
+        resource_listings = [e for e in invocations(cloud_directory) if e['command'] == 'az resource list']
+        check(len(listings) == 1, "environments are listed with a single az group list")
+        check({e['argv'][e['argv'].index('--resource-group') + 1] for e in resource_listings} == UNTAGGED
+              and len(resource_listings) == len(UNTAGGED),
+              "only untagged groups are dated by their resources")
+        check("age unknown" in next((line for line in result.stdout.splitlines()
+                                     if line.startswith('frank-biteswipe-resources')), ''),
+              "an untagged group without resources is kept")
+
+        offset = len(invocations(cloud_directory))
+        result = run_gc(policy, env, args.verbose)
+        remaining = group_names(cloud_directory)
+        check(result.returncode == 0, "collection exits 0")
+        check(not (remaining & EXPECTED_DELETED), "expired environments are deleted")
+        check(remaining == set(ENVIRONMENTS) - EXPECTED_DELETED,
+              "protected, kept, recent and unrelated groups remain")
+        check(capped(invocations(cloud_directory)[offset:], MAX_PARALLEL, DELETION_SECONDS),
+              f"at most {MAX_PARALLEL} deletions in flight at once")
+    finally:
+        if args.keep:
+            print(f"\nFake cloud kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Check readiness.py against local stand-in listeners.
+
+Stands in for a booting VM with a plain TCP listener (ssh), a marker file
+checked by a command (setup) and a self-signed TLS listener that answers
+HTTP (https), each appearing after its own delay on an ephemeral port. Then
+checks that wait_until_ready returns as soon as all three are up, with a
+time-to-ready per check, and that it gives up at the deadline when one of
+the listeners never appears.
+
+The certificate is generated with the openssl CLI, like the nginx entrypoint does.
+
+Usage:
+    readiness_check.py [--verbose]
+"""
+
+import argparse
+import contextlib
+import io
+import pathlib
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+harness_dir = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(harness_dir.parent))
+
+import readiness  # noqa: E402
+
+# Seconds after the start at which each stand-in comes up
+DELAYS = {'ssh': 0.3, 'setup': 0.6, 'https': 0.9}
+# How much later than the last stand-in wait_until_ready may return
+SLACK_SECONDS = 0.5
+POLL_OPTIONS = {'initial_interval': 0.05, 'max_interval': 0.1}
+NEVER_READY_DEADLINE = 1.5
+
+
+class StandInListener:
+    """A socket bound to an ephemeral port that only starts listening when told to.
+
+    Until then connections are refused, like a VM whose service isn't up yet.
+    With a TLS context, every connection gets a handshake and an HTTP response.
+    """
+
+    def __init__(self, tls_context=None):
+        self.tls_context = tls_context
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+
+    def start(self):
+        self.sock.listen()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._answer, args=(connection,), daemon=True).start()
+
+    def _answer(self, connection):
+        with contextlib.suppress(OSError, ssl.SSLError), connection:
+            if self.tls_context is None:
+                return
+            with self.tls_context.wrap_socket(connection, server_side=True) as tls_connection:
+                tls_connection.recv(1024)
+                tls_connection.sendall(b"HTTP/1.0 200 OK\r\nContent-Length: 0\r\n\r\n")
+
+    def close(self):
+        self.sock.close()
+
+
+def self_signed_context(directory):
+    cert_file, key_file = directory / 'stand-in.crt', directory / 'stand-in.key'
+    subprocess.run(
+        ["openssl", "req", "-x509", "-nodes", "-days", "1", "-newkey", "rsa:2048",
+         "-keyout", str(key_file), "-out", str(cert_file), "-subj", "/CN=localhost"],
+        capture_output=True, check=True
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_file, key_file)
+    return context
+
+
+def start_stand_ins(directory, start_https=True):
+    """Bring up the stand-ins after their delays. Returns (checks, listeners)."""
+    ssh = StandInListener()
+    https = StandInListener(self_signed_context(directory))
+    marker = directory / 'setup_complete'
+    checks = [
+        ("ssh", lambda: readiness.probe_tcp('127.0.0.1', ssh.port, timeout=0.5)),
+        ("setup", lambda: readiness.probe_command(["test", "-f", str(marker)])),
+        ("https", lambda: readiness.probe_https('127.0.0.1', https.port, timeout=0.5)),
+    ]
+    threading.Timer(DELAYS['ssh'], ssh.start).start()
+    threading.Timer(DELAYS['setup'], marker.touch).start()
+    if start_https:
+        threading.Timer(DELAYS['https'], https.start).start()
+    return checks, [ssh, https]
+
+
+def wait(checks, deadline_seconds, verbose):
+    output = io.StringIO()
+    start = time.monotonic()
+    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+        ready, timings = readiness.wait_until_ready(checks, deadline_seconds, **POLL_OPTIONS)
+    return ready, timings, time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check readiness.py against local stand-in listeners.')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of the probes')
+    args = parser.parse_args()
+
+    root = pathlib.Path(tempfile.mkdtemp(prefix='biteswipe-readiness-'))
+    failures = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failures.append(message)
+
+    try:
+        (root / 'ready').mkdir()
+        checks, listeners = start_stand_ins(root / 'ready')
+        ready, timings, elapsed = wait(checks, 10, args.verbose)
+        last_up = max(DELAYS.values())
+        check(ready, "ready once all three stand-ins are up")
+        check(list(timings) == list(DELAYS), "time to ready is recorded for ssh, setup and https")
+        check(all(timings.get(name, 0) >= delay for name, delay in DELAYS.items()),
+              "no check passes before its stand-in is up")
+        check(last_up <= elapsed < last_up + SLACK_SECONDS,
+              f"returns within {SLACK_SECONDS}s of the last stand-in coming up ({elapsed:.2f}s)")
+        for listener in listeners:
+            listener.close()
+
+        (root / 'never').mkdir()
+        checks, listeners = start_stand_ins(root / 'never', start_https=False)
+        ready, timings, elapsed = wait(checks, NEVER_READY_DEADLINE, args.verbose)
+        check(not ready, "not ready when the https stand-in never appears")
+        check(set(timings) == {'ssh', 'setup'}, "the checks that passed still have their time to ready")
+        check(NEVER_READY_DEADLINE <= elapsed < NEVER_READY_DEADLINE + SLACK_SECONDS,
+              f"gives up at the {NEVER_READY_DEADLINE}s deadline ({elapsed:.2f}s)")
+        for listener in listeners:
+            listener.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,41 +2,46 @@
 import os
 import subprocess
 import pathlib
-import getpass
+import sys
+
+import azure_inventory
+import deploy_context
+import terraform_init
+import terraform_state
 
 # Determine the path to the terraform directory relative to the script
 script_dir = pathlib.Path(__file__).resolve().parent
-TERRAFORM_DIR = script_dir.parent / 'terraform'
+TERRAFORM_DIR = pathlib.Path(os.getenv('BITESWIPE_TERRAFORM_DIR', script_dir.parent / 'terraform'))
 
-def get_owner_tag():
-    """Get owner tag from environment or system username."""
-    # First try to get from GITHUB_ACTOR environment variable
-    owner = os.getenv('GITHUB_ACTOR')
-    if not owner:
-        # Fallback to system username
-        owner = getpass.getuser()
-    
-    return owner
+def get_owner_tag(prefix=None):
+    """Get owner tag from command-line argument, environment or system username."""
+    return deploy_context.get_owner_tag(prefix, read_tfvars=False, terraform_dir=TERRAFORM_DIR)
+
+def import_resource_group(owner_tag, terraform_dir=TERRAFORM_DIR, subscription_id=None):
+    """Import the resource group into Terraform state.
 
-def import_resource_group(owner_tag):
-    """Import the resource group into Terraform state."""
-    resource_group_name = f"{owner_tag}-biteswipe-resources"
+    Returns True if the group is in the state afterwards, None if there is no
+    group to import and False if the import failed. Callers that already know
+    the subscription id pass it in instead of having it looked up again.
+    """
+    resource_group_name = deploy_context.get_resource_group_name(owner_tag)
     terraform_resource = "azurerm_resource_group.rg"
     
     print(f"Checking if resource group {resource_group_name} exists...")
     
     # Check if the resource group exists
     try:
-        result = subprocess.run(
-            ["az", "group", "show", 
-             "--name", resource_group_name],
-            capture_output=True, 
-            text=True,
-            check=False
-        )
-        
-        if result.returncode != 0:
-            print(f"Resource group {resource_group_name} does not exist.")
+        if not azure_inventory.resource_group_exists(resource_group_name):
+            print(f"Resource group {resource_group_name} does not exist, nothing to import.")
+            return None
+
+        if terraform_state.is_in_terraform_state(terraform_resource, terraform_dir):
+            print(f"Resource group {resource_group_name} is already in Terraform state, skipping import.")
+            return True
+
+        subscription_id = subscription_id or deploy_context.get_azure_subscription_id()
+        if not subscription_id:
+            print("Error: Could not get Azure subscription ID. Make sure you're logged in to Azure CLI or ARM_SUBSCRIPTION_ID is set.")
             return False
             
         print(f"Resource group {resource_group_name} exists. Importing into Terraform state...")
@@ -44,12 +49,13 @@ def import_resource_group(owner_tag):
         # Import the resource group into Terraform state
         import_result = subprocess.run(
             ["terraform", "import", terraform_resource, 
-             f"/subscriptions/{os.getenv('ARM_SUBSCRIPTION_ID')}/resourceGroups/{resource_group_name}"],
-            cwd=TERRAFORM_DIR,
+             f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}"],
+            cwd=terraform_dir,
             capture_output=True,
             text=True,
             check=False
         )
+        terraform_state.invalidate_state_index(terraform_dir)
         
         if import_result.returncode == 0:
             print(f"Successfully imported resource group {resource_group_name} into Terraform state.")
@@ -63,14 +69,17 @@ def import_resource_group(owner_tag):
         return False
 
 if __name__ == "__main__":
-    owner_tag = get_owner_tag()
+    owner_tag = get_owner_tag(sys.argv[1] if len(sys.argv) > 1 else None)
     print(f"Using owner tag: {owner_tag}")
     
     # Initialize terraform first
-    subprocess.run(["terraform", "init"], cwd=TERRAFORM_DIR, check=True)
+    if not terraform_init.init_terraform(TERRAFORM_DIR):
+        sys.exit(1)
     
-    if import_resource_group(owner_tag):
+    imported = import_resource_group(owner_tag)
+    if imported:
         print("✅ Resource group successfully imported!")
         print("You can now run deploy_infra.py")
-    else:
+    elif imported is False:
         print("❌ Resource group import failed.")
+        sys.exit(1)
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Load test the session/swipe API of a locally running BiteSwipe stack.
+
+Simulated users are put in groups; each group runs the flow of API.md
+against the backend at the same time as the other groups:
+
+    POST /users                          every member signs up
+    POST /sessions                       the first member creates a session
+    POST /sessions/:id/invitations       ...and invites the others by email
+    POST /sessions/:joinCode/participants   the others join with the join code
+    POST /sessions/:id/start             the creator starts swiping
+    GET  /sessions/:id/restaurants       every member fetches the restaurants
+    POST /sessions/:id/votes             ...swipes on them
+    POST /sessions/:id/doneSwiping       ...finishes
+    GET  /sessions/:id/result            ...and asks for the result
+
+All requests go through one asyncio HTTP client with a bounded pool of
+keep-alive connections: aiohttp when it is installed, otherwise a small
+HTTP/1.1 client on asyncio streams. The report has the requests per second
+and p50/p95/p99 latency of every endpoint; --json writes it to a file so
+capacity can be compared across releases.
+
+The app port is only exposed on the compose network, so requests go through
+nginx on https://localhost (its certificate is self-signed and not verified).
+
+Usage:
+    load_test.py --start-stack                      # bring the stack up first (deploy_infra_locally.py)
+    load_test.py --users 300 --group-size 3 --concurrency 50 --json load.json
+    load_test.py --base-url http://localhost:3000 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import ssl
+import subprocess
+import sys
+import time
+import urllib.parse
+import uuid
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+DEFAULT_BASE_URL = os.getenv('BITESWIPE_LOAD_BASE_URL', 'https://localhost')
+DEFAULT_USERS = 60
+DEFAULT_GROUP_SIZE = 3
+DEFAULT_CONCURRENCY = 10
+DEFAULT_CONNECTIONS = 50
+DEFAULT_SWIPES = 10
+REQUEST_TIMEOUT_SECONDS = 30
+# UBC, the location the backend tests use
+DEFAULT_LOCATION = {'latitude': 49.2827, 'longitude': -123.1207, 'radius': 1000}
+# Minutes until a started session is completed by the backend
+SESSION_MINUTES = 1
+PERCENTILES = (50, 95, 99)
+
+
+class FlowError(Exception):
+    """A step of a simulated group failed, so the rest of its flow can't run."""
+
+
+class StreamClient:
+    """Minimal HTTP/1.1 JSON client on asyncio streams, with a pool of keep-alive connections."""
+
+    def __init__(self, base_url, connections=DEFAULT_CONNECTIONS, timeout=REQUEST_TIMEOUT_SECONDS):
+        url = urllib.parse.urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.base_path = url.path.rstrip('/')
+        self.timeout = timeout
+        self.ssl_context = None
+        if url.scheme == 'https':
+            self.ssl_context = ssl.create_default_context()
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+        self._slots = asyncio.Semaphore(connections)
+        self._idle = []
+
+    async def _open(self):
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl_context)
+
+    @staticmethod
+    def _close(connection):
+        connection[1].close()
+
+    async def _exchange(self, connection, method, path, body):
+        reader, writer = connection
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = (
+            f"{method} {self.base_path}{path} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            "Accept: application/json\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode() + payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Skip the trailers
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                data += await reader.readexactly(size)
+                await reader.readline()
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+        else:
+            data = await reader.read()
+            keep_alive = False
+        return status, data, keep_alive
+
+    async def request(self, method, path, body=None):
+        """Send a request and return (status, decoded JSON body or None)."""
+        async with self._slots:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._open()
+            try:
+                status, data, keep_alive = await asyncio.wait_for(
+                    self._exchange(connection, method, path, body), self.timeout)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+                self._close(connection)
+                if not reused or isinstance(e, asyncio.TimeoutError):
+                    raise
+                # The server closed an idle keep-alive connection, retry once on a new one
+                connection = await self._open()
+                try:
+                    status, data, keep_alive = await asyncio.wait_for(
+                        self._exchange(connection, method, path, body), self.timeout)
+                except BaseException:
+                    self._close(connection)
+                    raise
+            except BaseException:
+                self._close(connection)
+                raise
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                self._close(connection)
+        return status, _decode(data)
+
+    async def close(self):
+        while self._idle:
+            self._close(self._idle.pop())
+
+
+class AiohttpClient:
+    """The same interface on top of one aiohttp session and its connection pool."""
+
+    def __init__(self, base_url, connections=DEFAULT_CONNECTIONS, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip('/')
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=connections, ssl=False),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+
+    async def request(self, method, path, body=None):
+        async with self.session.request(method, self.base_url + path, json=body) as response:
+            return response.status, _decode(await response.read())
+
+    async def close(self):
+        await self.session.close()
+
+
+def _decode(data):
+    try:
+        return json.loads(data) if data else None
+    except ValueError:
+        return None
+
+
+def create_client(base_url, connections=DEFAULT_CONNECTIONS):
+    client_class = AiohttpClient if aiohttp else StreamClient
+    return client_class(base_url, connections)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Stats:
+    """Latencies and status codes per endpoint (method plus route, e.g. POST /sessions/:id/votes)."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, endpoint, seconds, status):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        statuses = self.statuses.setdefault(endpoint, {})
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def report(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        endpoints = {}
+        for endpoint, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'errors': sum(count for status, count in statuses.items()
+                              if not (isinstance(status, int) and 200 <= status < 300)),
+                'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+                'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+                **{f'p{p}_ms': percentile(latencies, p) * 1000 for p in PERCENTILES},
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'elapsed_seconds': elapsed,
+            'requests': total,
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'requests_per_second': total / elapsed if elapsed else 0.0,
+            'endpoints': endpoints,
+        }
+
+
+async def call(client, stats, method, path, endpoint, body=None, expect=(200, 201)):
+    """Send one request, record its latency under endpoint and return the JSON body."""
+    start = time.perf_counter()
+    try:
+        status, data = await client.request(method, path, body)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        stats.record(endpoint, time.perf_counter() - start, type(e).__name__)
+        raise FlowError(f"{endpoint}: {type(e).__name__}") from e
+    except Exception as e:
+        # aiohttp reports transport errors with its own exception types
+        if aiohttp is None or not isinstance(e, aiohttp.ClientError):
+            raise
+        stats.record(endpoint, time.perf_counter() - start, type(e).__name__)
+        raise FlowError(f"{endpoint}: {type(e).__name__}") from e
+    stats.record(endpoint, time.perf_counter() - start, status)
+    if expect and status not in expect:
+        raise FlowError(f"{endpoint}: HTTP {status} {data}")
+    return data
+
+
+async def swipe(client, stats, session_id, user_id, swipes):
+    """One member fetches the restaurants, votes on up to `swipes` of them and finishes swiping."""
+    restaurants = await call(client, stats, 'GET', f'/sessions/{session_id}/restaurants',
+                             'GET /sessions/:id/restaurants') or []
+    for restaurant in restaurants[:swipes]:
+        restaurant_id = restaurant.get('_id') or restaurant.get('restaurantId')
+        await call(client, stats, 'POST', f'/sessions/{session_id}/votes', 'POST /sessions/:id/votes',
+                   {'userId': user_id, 'restaurantId': restaurant_id, 'liked': random.random() < 0.5})
+    await call(client, stats, 'POST', f'/sessions/{session_id}/doneSwiping', 'POST /sessions/:id/doneSwiping',
+               {'userId': user_id})
+
+
+async def run_group(client, stats, run_id, group, group_size, swipes, location):
+    """Run the whole flow for one group of simulated users."""
+    emails = [f"load-{run_id}-{group}-{member}@biteswipe.test" for member in range(group_size)]
+    users = await asyncio.gather(*(
+        call(client, stats, 'POST', '/users', 'POST /users', {'email': email, 'displayName': email.split('@')[0]})
+        for email in emails
+    ))
+    user_ids = [user['_id'] for user in users]
+    creator_id = user_ids[0]
+
+    session = await call(client, stats, 'POST', '/sessions', 'POST /sessions', {'userId': creator_id, **location})
+    session_id, join_code = session['_id'], session['joinCode']
+    await asyncio.gather(*(
+        call(client, stats, 'POST', f'/sessions/{session_id}/invitations', 'POST /sessions/:id/invitations',
+             {'email': email})
+        for email in emails[1:]
+    ))
+    await asyncio.gather(*(
+        call(client, stats, 'POST', f'/sessions/{join_code}/participants', 'POST /sessions/:joinCode/participants',
+             {'userId': user_id})
+        for user_id in user_ids[1:]
+    ))
+    await call(client, stats, 'POST', f'/sessions/{session_id}/start', 'POST /sessions/:id/start',
+               {'userId': creator_id, 'time': SESSION_MINUTES})
+
+    await asyncio.gather(*(swipe(client, stats, session_id, user_id, swipes) for user_id in user_ids))
+    # Until the session completes the backend may answer "not completed"; that still measures the endpoint
+    await asyncio.gather(*(
+        call(client, stats, 'GET', f'/sessions/{session_id}/result', 'GET /sessions/:id/result', expect=None)
+        for _ in user_ids
+    ))
+
+
+async def run_load(base_url, users, group_size, concurrency, connections, swipes,
+                   location=DEFAULT_LOCATION, duration=None):
+    """Run the groups, at most `concurrency` at a time. Returns (stats, failed group messages).
+
+    With a duration, new groups keep being started until it is over instead of stopping after `users`.
+    """
+    client = create_client(base_url, connections)
+    stats = Stats()
+    failures = []
+    run_id = uuid.uuid4().hex[:8]
+    slots = asyncio.Semaphore(concurrency)
+    group_count = max(1, -(-users // group_size))
+    deadline = time.monotonic() + duration if duration else None
+
+    async def worker(group):
+        async with slots:
+            try:
+                await run_group(client, stats, run_id, group, group_size, swipes, location)
+            except (FlowError, KeyError, TypeError) as e:
+                failures.append(f"group {group}: {e}")
+
+    try:
+        if deadline is None:
+            await asyncio.gather(*(worker(group) for group in range(group_count)))
+        else:
+            # Keep `concurrency` groups in flight until the time is up
+            async def loop(first_group):
+                group = first_group
+                while time.monotonic() < deadline:
+                    await worker(group)
+                    group += concurrency
+            await asyncio.gather(*(loop(first_group) for first_group in range(concurrency)))
+    finally:
+        stats.finished = time.monotonic()
+        await client.close()
+    return stats, failures
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<42} {'count':>7} {'errors':>7} {'req/s':>8} "
+          + " ".join(f"{f'p{p} ms':>8}" for p in PERCENTILES))
+    print("-" * (42 + 8 * 3 + 9 * len(PERCENTILES) + 1))
+    for endpoint, numbers in sorted(report['endpoints'].items(), key=lambda item: item[0].split(' ', 1)[1]):
+        print(f"{endpoint:<42} {numbers['requests']:>7} {numbers['errors']:>7} "
+              f"{numbers['requests_per_second']:>8.1f} "
+              + " ".join(f"{numbers[f'p{p}_ms']:>8.1f}" for p in PERCENTILES))
+    print(f"\n{report['requests']} requests in {report['elapsed_seconds']:.1f}s, "
+          f"{report['requests_per_second']:.1f} req/s, {report['errors']} error(s)")
+
+
+def start_stack():
+    """Bring the local stack up with deploy_infra_locally.py, which returns once it takes traffic."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deploy_infra_locally.py')
+    return subprocess.run([sys.executable, script, '--quiet'], check=False).returncode == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the BiteSwipe session/swipe API.')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help=f'Backend URL (default: {DEFAULT_BASE_URL})')
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS,
+                        help=f'Simulated users in total (default: {DEFAULT_USERS})')
+    parser.add_argument('--group-size', type=int, default=DEFAULT_GROUP_SIZE,
+                        help=f'Users per session, the creator included (default: {DEFAULT_GROUP_SIZE})')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Groups running at the same time (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS,
+                        help=f'Size of the HTTP connection pool (default: {DEFAULT_CONNECTIONS})')
+    parser.add_argument('--swipes', type=int, default=DEFAULT_SWIPES,
+                        help=f'Restaurants each user votes on (default: {DEFAULT_SWIPES})')
+    parser.add_argument('--duration', type=float,
+                        help='Keep starting groups for this many seconds instead of stopping after --users')
+    parser.add_argument('--start-stack', action='store_true',
+                        help='Start the local stack with deploy_infra_locally.py first')
+    parser.add_argument('--json', metavar='FILE', help='Also write the report as JSON to this file')
+    args = parser.parse_args()
+    if args.group_size < 1 or args.concurrency < 1 or args.connections < 1:
+        parser.error('--group-size, --concurrency and --connections must be at least 1')
+
+    if args.start_stack and not start_stack():
+        print("❌ The local stack did not come up")
+        sys.exit(1)
+
+    print(f"\n🔥 {args.users} users in groups of {args.group_size}, {args.concurrency} groups at a time, "
+          f"against {args.base_url} ({'aiohttp' if aiohttp else 'asyncio streams'})...")
+    stats, failures = asyncio.run(run_load(
+        args.base_url, args.users, args.group_size, args.concurrency, args.connections, args.swipes,
+        duration=args.duration,
+    ))
+    report = stats.report()
+    report['failed_groups'] = len(failures)
+    print_report(report)
+    for failure in failures[:10]:
+        print(f"  ❌ {failure}")
+    if len(failures) > 10:
+        print(f"  ... and {len(failures) - 10} more failed group(s)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    sys.exit(1 if failures or not report['requests'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Counters, gauges and timers for the ops scripts, exported for CI.
+
+Each script names itself once (configure("deploy_infra")) and then records
+at its hot points:
+
+    metrics.inc("commands", command="terraform plan", result="ok")
+    metrics.set_gauge("issues", 12, severity="warning")
+    with metrics.timer("deploy_step", step="terraform apply"):
+        ...
+
+At the end of the run, export() writes two files into BITESWIPE_METRICS_DIR:
+    <script>.prom   Prometheus text format, for the node_exporter textfile
+                    collector (written atomically, as the collector may read
+                    it at any time)
+    <script>.json   the same values as a JSON summary, for CI artifacts
+
+Metric names get a biteswipe_ prefix; counters end in _total and timers are
+exported as summaries in seconds (_seconds_count, _seconds_sum) plus a
+_seconds_max gauge. Every sample carries a job label with the script name.
+
+Without BITESWIPE_METRICS_DIR the recorders return right away and nothing is
+written, so the calls can stay in the scripts at no real cost.
+
+Environment variables:
+    BITESWIPE_METRICS_DIR   Directory for the exported files (unset: disabled)
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+
+PREFIX = "biteswipe_"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Metrics:
+    """Metric values of one script run."""
+
+    def __init__(self, job="biteswipe", output_dir=None):
+        self.job = job
+        self.output_dir = pathlib.Path(output_dir) if output_dir else None
+        self.enabled = output_dir is not None
+        self.counters = {}
+        self.gauges = {}
+        # (name, labels) -> [count, sum, max] of the observed seconds
+        self.timers = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter."""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to its current value."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration of a timer."""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            timer = self.timers.setdefault(key, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Time the enclosed block, failed or not."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def to_prometheus(self):
+        """The values in the Prometheus text exposition format."""
+        job = (('job', self.job),)
+        families = {}
+
+        def add(name, kind, labels, value):
+            families.setdefault((PREFIX + name, kind), []).append(
+                f"{PREFIX}{name}{_format_labels(job + labels)} {float(value)!r}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                add(f"{name}_total", "counter", labels, value)
+            for (name, labels), value in sorted(self.gauges.items()):
+                add(name, "gauge", labels, value)
+            for (name, labels), (count, total, longest) in sorted(self.timers.items()):
+                families.setdefault((f"{PREFIX}{name}_seconds", "summary"), []).extend([
+                    f"{PREFIX}{name}_seconds_count{_format_labels(job + labels)} {float(count)!r}",
+                    f"{PREFIX}{name}_seconds_sum{_format_labels(job + labels)} {float(total)!r}",
+                ])
+                add(f"{name}_seconds_max", "gauge", labels, longest)
+        add("last_run_timestamp_seconds", "gauge", (), self._started)
+
+        lines = []
+        for (family, kind), samples in families.items():
+            lines.append(f"# TYPE {family} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        """The values as a JSON-serialisable summary."""
+        def entries(values, value_of):
+            return [{'name': name, 'labels': dict(labels), **value_of(value)}
+                    for (name, labels), value in sorted(values.items())]
+
+        with self._lock:
+            return {
+                'job': self.job,
+                'started_at': self._started,
+                'duration_seconds': time.time() - self._started,
+                'counters': entries(self.counters, lambda value: {'value': value}),
+                'gauges': entries(self.gauges, lambda value: {'value': value}),
+                'timers': entries(self.timers, lambda value: {
+                    'count': value[0], 'total_seconds': value[1], 'max_seconds': value[2]}),
+            }
+
+    def export(self):
+        """Write <job>.prom and <job>.json to the output directory. Returns the paths written."""
+        if not self.enabled:
+            return []
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for path, text in (
+            (self.output_dir / f"{self.job}.prom", self.to_prometheus()),
+            (self.output_dir / f"{self.job}.json", json.dumps(self.to_json(), indent=2)),
+        ):
+            fd, temp_name = tempfile.mkstemp(dir=self.output_dir, prefix=f".{path.name}.")
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.chmod(temp_name, 0o644)
+            os.replace(temp_name, path)
+            paths.append(path)
+        print(f"\n📊 Metrics written to {', '.join(str(path) for path in paths)}")
+        return paths
+
+
+# Process-wide metrics used by the scripts; disabled until configure() finds an output directory
+registry = Metrics()
+
+
+def configure(job, output_dir=None):
+    """Name the running script and enable the export if an output directory is set."""
+    global registry
+    output_dir = output_dir or os.getenv('BITESWIPE_METRICS_DIR')
+    if registry.enabled and registry.job == job:
+        return registry
+    registry = Metrics(job, output_dir)
+    return registry
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    registry.set_gauge(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    registry.observe(name, seconds, **labels)
+
+
+def timer(name, **labels):
+    return registry.timer(name, **labels)
+
+
+def export():
+    return registry.export()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Readiness probes for a deployed BiteSwipe VM.
+
+Instead of sleeping a fixed (or exponentially growing) amount of time between
+checks, the probes are retried on short, jittered intervals under one overall
+deadline. Waiting stops as soon as the VM is usable and the time each check
+took to pass is reported.
+
+The checks, in order:
+    ssh     TCP port 22 accepts connections
+    setup   the cloud-init marker file exists (checked over SSH)
+    https   nginx completes a TLS handshake and answers on port 443
+
+Hosts and ports are parameters, so the probes can be pointed at local
+stand-in listeners.
+
+Usage:
+    readiness.py --host <ip> [--ssh-key <pem>] [--skip-setup] [--skip-https]
+"""
+
+import argparse
+import random
+import socket
+import ssl
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DEADLINE_SECONDS = 600
+DEFAULT_INITIAL_INTERVAL_SECONDS = 1.0
+DEFAULT_MAX_INTERVAL_SECONDS = 5.0
+DEFAULT_JITTER = 0.25
+SETUP_MARKER_FILE = "/tmp/setup_complete"
+
+
+def probe_tcp(host, port, timeout=3.0):
+    """Return True if a TCP connection to host:port succeeds."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def probe_https(host, port=443, path="/", timeout=5.0):
+    """Return True if the server completes a TLS handshake and sends an HTTP response.
+
+    The VM uses a self-signed certificate, so the certificate is not verified.
+    Any HTTP status counts: the goal is to know nginx is serving, not that the
+    route is healthy.
+    """
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            with context.wrap_socket(sock, server_hostname=host) as tls_sock:
+                tls_sock.sendall(f"HEAD {path} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+                return tls_sock.recv(12).startswith(b"HTTP/")
+    except (OSError, ssl.SSLError):
+        return False
+
+
+def probe_command(argv, timeout=15.0):
+    """Return True if the command exits with status 0."""
+    try:
+        result = subprocess.run(
+            argv,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=timeout,
+            check=False
+        )
+        return result.returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def ssh_marker_command(host, key_path, marker=SETUP_MARKER_FILE, user="adminuser", port=22):
+    """Build the ssh command that checks for the setup marker file."""
+    return [
+        "ssh",
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "UserKnownHostsFile=/dev/null",
+        "-o", "LogLevel=ERROR",
+        "-o", "BatchMode=yes",
+        "-o", "ConnectTimeout=5",
+        "-i", str(key_path),
+        "-p", str(port),
+        f"{user}@{host}",
+        f"test -f {marker}",
+    ]
+
+
+def poll_until(check, deadline, initial_interval=DEFAULT_INITIAL_INTERVAL_SECONDS,
+               max_interval=DEFAULT_MAX_INTERVAL_SECONDS, jitter=DEFAULT_JITTER):
+    """Call check() until it returns a truthy value or the deadline passes.
+
+    deadline is an absolute time.monotonic() value. Returns the value from
+    check(), or None if the deadline passed first. Intervals start short and
+    grow slowly; the jitter keeps parallel pollers from hitting in lockstep.
+    """
+    interval = initial_interval
+    while True:
+        value = check()
+        if value:
+            return value
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        delay = interval * random.uniform(1 - jitter, 1 + jitter)
+        time.sleep(min(delay, remaining))
+        interval = min(interval * 1.5, max_interval)
+
+
+def build_checks(host, key_path=None, ssh_port=22, https_port=443, user="adminuser",
+                 marker=SETUP_MARKER_FILE, check_setup=True, check_https=True):
+    """Return the ordered list of (name, check) pairs for a VM."""
+    checks = [("ssh", lambda: probe_tcp(host, ssh_port))]
+    if check_setup and key_path:
+        marker_command = ssh_marker_command(host, key_path, marker, user, ssh_port)
+        checks.append(("setup", lambda: probe_command(marker_command)))
+    if check_https:
+        checks.append(("https", lambda: probe_https(host, https_port)))
+    return checks
+
+
+def wait_until_ready(checks, deadline_seconds=DEFAULT_DEADLINE_SECONDS, **poll_options):
+    """Run the checks in order under one overall deadline.
+
+    Returns (ready, timings) where timings maps each check that passed to the
+    number of seconds from the start until it passed.
+    """
+    start = time.monotonic()
+    deadline = start + deadline_seconds
+    timings = {}
+    for name, check in checks:
+        if not poll_until(check, deadline, **poll_options):
+            print(f"❌ {name} not ready after {time.monotonic() - start:.1f}s (deadline {deadline_seconds}s)")
+            return False, timings
+        timings[name] = time.monotonic() - start
+        print(f"✅ {name} ready after {timings[name]:.1f}s")
+    return True, timings
+
+
+def wait_until_all_ready(checks, deadline_seconds=DEFAULT_DEADLINE_SECONDS, failed=None, **poll_options):
+    """Run the checks at the same time under one overall deadline.
+
+    failed(name), if given, is called after each unsuccessful attempt and
+    returns a reason when that check can never pass (e.g. its container
+    exited); every check then stops right away instead of waiting out the
+    deadline. Returns (ready, timings, failures) where failures maps each
+    check that did not pass to the reason.
+    """
+    start = time.monotonic()
+    deadline = start + deadline_seconds
+    timings = {}
+    failures = {}
+    aborted = threading.Event()
+
+    def run(name, check):
+        def attempt():
+            if aborted.is_set():
+                return True
+            if check():
+                timings[name] = time.monotonic() - start
+                print(f"✅ {name} ready after {timings[name]:.1f}s")
+                return True
+            reason = failed(name) if failed else None
+            if reason:
+                failures[name] = reason
+                aborted.set()
+                return True
+            return False
+
+        if not poll_until(attempt, deadline, **poll_options) and name not in timings:
+            failures[name] = f"not ready after {deadline_seconds}s"
+
+    with ThreadPoolExecutor(max_workers=max(1, len(checks))) as executor:
+        for future in [executor.submit(run, name, check) for name, check in checks]:
+            future.result()
+
+    for name, _ in checks:
+        if name not in timings:
+            failures.setdefault(name, "stopped, another check failed")
+            print(f"❌ {name}: {failures[name]}")
+    return not failures, timings, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wait until a deployed BiteSwipe VM is usable.')
+    parser.add_argument('--host', required=True, help='IP address or DNS name of the VM')
+    parser.add_argument('--ssh-key', help='Private key used to check the setup marker over SSH')
+    parser.add_argument('--user', default='adminuser', help='SSH user (default: adminuser)')
+    parser.add_argument('--ssh-port', type=int, default=22, help='SSH port (default: 22)')
+    parser.add_argument('--https-port', type=int, default=443, help='HTTPS port (default: 443)')
+    parser.add_argument('--marker', default=SETUP_MARKER_FILE,
+                        help=f'File created when VM setup has finished (default: {SETUP_MARKER_FILE})')
+    parser.add_argument('--skip-setup', action='store_true', help='Do not wait for the setup marker file')
+    parser.add_argument('--skip-https', action='store_true', help='Do not wait for HTTPS on the VM')
+    parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE_SECONDS,
+                        help=f'Overall time limit in seconds (default: {DEFAULT_DEADLINE_SECONDS})')
+    args = parser.parse_args()
+
+    checks = build_checks(
+        args.host,
+        key_path=args.ssh_key,
+        ssh_port=args.ssh_port,
+        https_port=args.https_port,
+        user=args.user,
+        marker=args.marker,
+        check_setup=not args.skip_setup,
+        check_https=not args.skip_https,
+    )
+    print(f"[Readiness] Waiting for {', '.join(name for name, _ in checks)} on {args.host}...")
+    ready, timings = wait_until_ready(checks, args.deadline)
+    if ready:
+        print(f"[Readiness] {args.host} ready after {max(timings.values(), default=0):.1f}s")
+    sys.exit(0 if ready else 1)
+
+
+if __name__ == "__main__":
+    main()
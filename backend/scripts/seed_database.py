@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Bulk-seed the local Mongo with synthetic users, sessions and restaurants.
+
+src/scripts/seedDatabase.ts only loads the initial-*.json fixtures; this
+uses them as templates to generate as many documents as a benchmark needs.
+Documents are generated in chunks by several worker processes and streamed
+into Mongo with unordered bulk inserts, so a duplicate or invalid document
+does not stop the rest of its batch. The ObjectIds are derived from the
+document number, so sessions can reference users and restaurants generated
+by other workers without any coordination.
+
+Two ways to reach Mongo:
+    pymongo      when it is installed, straight to --uri; the mongo port is
+                 published on 127.0.0.1 by docker-compose.seed.yml
+    mongoimport  otherwise, run inside the mongo container through
+                 `docker-compose exec`, one import per chunk
+
+Once everything is inserted, the indexes the session queries need are
+created (building them after the load is faster than maintaining them
+during it), and the insert throughput per collection is reported.
+
+The app reseeds (and wipes) the database every time it starts, unless
+SKIP_DB_SEED=true, which docker-compose.seed.yml sets; deploy_infra_locally.py
+--seed starts the stack with that override and then runs this script.
+
+Usage:
+    seed_database.py --scale 1000000                 # 1M users, 1M sessions, 100k restaurants
+    seed_database.py --users 200000 --sessions 50000 --restaurants 5000 --workers 8 --drop
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+
+try:
+    import bson
+    import pymongo
+    from pymongo.errors import BulkWriteError
+except ImportError:
+    pymongo = None
+
+SCRIPT_DIR = pathlib.Path(__file__).resolve().parent
+BACKEND_DIR = SCRIPT_DIR.parent
+DATA_DIR = BACKEND_DIR / 'src' / 'data'
+SEED_COMPOSE_FILE = 'docker-compose.seed.yml'
+
+DEFAULT_URI = os.getenv('BITESWIPE_SEED_DB_URI', 'mongodb://127.0.0.1:27017/biteswipe')
+DEFAULT_SCALE = 1_000_000
+# Restaurants per user at a given --scale
+RESTAURANT_RATIO = 0.1
+DEFAULT_BATCH_SIZE = 5_000
+# Documents per task handed to a worker
+CHUNK_SIZE = 50_000
+DEFAULT_WORKERS = max(2, min(8, os.cpu_count() or 2))
+# Sessions are spread over this many past days
+SESSION_HISTORY_DAYS = 90
+
+# Collection of each mongoose model, and the byte that tags its generated ObjectIds
+COLLECTIONS = {'users': 0x01, 'restaurants': 0x02, 'sessions': 0x03}
+
+# Indexes for the queries in sessionManager and restaurantService:
+# (collection, keys, options); the unique ones match those of the mongoose schemas
+INDEXES = [
+    ('users', [('email', 1)], {'unique': True}),
+    ('sessions', [('joinCode', 1)], {'unique': True}),
+    # getUserSessions: $or over creator / participant / invitee, newest first
+    ('sessions', [('creator', 1), ('createdAt', -1)], {}),
+    ('sessions', [('participants.userId', 1), ('createdAt', -1)], {}),
+    ('sessions', [('pendingInvitations', 1), ('createdAt', -1)], {}),
+    ('sessions', [('status', 1)], {}),
+    # Restaurants fetched from Google are looked up by their place id before being stored
+    ('restaurants', [('sourceData.googlePlaceId', 1)], {}),
+]
+
+
+def load_templates(data_dir=DATA_DIR):
+    """The fixtures of seedDatabase.ts, keyed by collection, without their ids."""
+    templates = {}
+    for collection in COLLECTIONS:
+        documents = json.loads((data_dir / f'initial-{collection}.json').read_text())
+        documents = documents if isinstance(documents, list) else [documents]
+        templates[collection] = [
+            {key: value for key, value in document.items() if key not in ('_id', '__v')}
+            for document in documents
+        ]
+    return templates
+
+
+def object_id_hex(collection, number, epoch):
+    """Deterministic ObjectId: the seeding run's timestamp, the collection tag and the document number."""
+    return f"{epoch:08x}{COLLECTIONS[collection]:02x}{number:014x}"
+
+
+class PymongoSink:
+    """Inserts batches with insert_many(ordered=False) over one client per worker."""
+
+    def __init__(self, uri):
+        self.client = pymongo.MongoClient(uri)
+        self.database = self.client.get_default_database('biteswipe')
+
+    @staticmethod
+    def object_id(hex_id):
+        return bson.ObjectId(hex_id)
+
+    @staticmethod
+    def date(value):
+        return value
+
+    def insert(self, collection, batches):
+        """Insert each batch. Returns (inserted, failed)."""
+        inserted = failed = 0
+        for batch in batches:
+            try:
+                inserted += len(self.database[collection].insert_many(batch, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                inserted += e.details['nInserted']
+                failed += len(e.details['writeErrors'])
+        return inserted, failed
+
+    def close(self):
+        self.client.close()
+
+
+class MongoimportSink:
+    """Streams the documents as Extended JSON into mongoimport inside the mongo container."""
+
+    def __init__(self, uri, compose_files=('docker-compose.yml',)):
+        self.database = urllib.parse.urlsplit(uri).path.strip('/') or 'biteswipe'
+        self.compose_files = list(compose_files)
+
+    @staticmethod
+    def object_id(hex_id):
+        return {'$oid': hex_id}
+
+    @staticmethod
+    def date(value):
+        return {'$date': value.isoformat(timespec='milliseconds').replace('+00:00', 'Z')}
+
+    def insert(self, collection, batches):
+        compose = ['docker-compose'] + [arg for name in self.compose_files for arg in ('-f', name)]
+        batch_size = None
+        process = None
+        count = 0
+        for batch in batches:
+            if process is None:
+                batch_size = len(batch)
+                # mongoimport inserts unordered unless --maintainInsertionOrder is given
+                process = subprocess.Popen(
+                    compose + ['exec', '-T', 'mongo', 'mongoimport', '--quiet', '--db', self.database,
+                               '--collection', collection, '--batchSize', str(batch_size)],
+                    cwd=BACKEND_DIR, stdin=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+                )
+            process.stdin.write("".join(json.dumps(document) + "\n" for document in batch))
+            count += len(batch)
+        if process is None:
+            return 0, 0
+        process.stdin.close()
+        errors = process.stderr.read()
+        if process.wait() != 0:
+            print(errors.strip(), file=sys.stderr)
+            return 0, count
+        return count, 0
+
+    def close(self):
+        pass
+
+
+class Generator:
+    """Builds the documents of each collection from the fixture templates."""
+
+    def __init__(self, templates, counts, epoch, sink):
+        self.templates = templates
+        self.counts = counts
+        self.epoch = epoch
+        self.sink = sink
+
+    def _id(self, collection, number):
+        return self.sink.object_id(object_id_hex(collection, number, self.epoch))
+
+    def user(self, number, rng):
+        template = self.templates['users'][number % len(self.templates['users'])]
+        return {
+            **template,
+            '_id': self._id('users', number),
+            'email': f"seed-{self.epoch:x}-{number}@biteswipe.test",
+            'displayName': f"Seed User {number}",
+            'fcmTokens': [],
+            'sessionHistory': [],
+            'restaurantInteractions': [],
+            'friendList': [],
+            'pendingRequest': [],
+        }
+
+    def restaurant(self, number, rng):
+        template = self.templates['restaurants'][number % len(self.templates['restaurants'])]
+        coordinates = (template.get('location') or {}).get('coordinates') or {}
+        return {
+            **template,
+            '_id': self._id('restaurants', number),
+            'name': f"{template.get('name', 'Restaurant')} #{number}",
+            'location': {
+                **(template.get('location') or {}),
+                # Scatter the copies within a few km of the template
+                'coordinates': {
+                    'latitude': coordinates.get('latitude', 49.26) + rng.uniform(-0.05, 0.05),
+                    'longitude': coordinates.get('longitude', -123.24) + rng.uniform(-0.05, 0.05),
+                },
+            },
+            'rating': round(rng.uniform(2.5, 5.0), 1),
+            'sourceData': {
+                **(template.get('sourceData') or {}),
+                'googlePlaceId': f"seed-{self.epoch:x}-{number}",
+                'lastUpdated': self.sink.date(datetime.datetime.now(datetime.timezone.utc)),
+            },
+        }
+
+    def session(self, number, rng):
+        template = self.templates['sessions'][number % len(self.templates['sessions'])]
+        members = [rng.randrange(self.counts['users']) for _ in range(rng.randint(2, 5))]
+        restaurants = rng.sample(range(self.counts['restaurants']), min(self.counts['restaurants'], rng.randint(5, 10)))
+        status = rng.choices(['COMPLETED', 'MATCHING', 'CREATED'], weights=[90, 5, 5])[0]
+        created = (datetime.datetime.now(datetime.timezone.utc)
+                   - datetime.timedelta(seconds=rng.uniform(0, SESSION_HISTORY_DAYS * 86400)))
+        votes = [
+            {
+                '_id': self.sink.object_id(bson_like_id(rng)),
+                'restaurantId': self._id('restaurants', restaurant),
+                'score': 0, 'totalVotes': 0, 'positiveVotes': 0,
+                'potentialMatchScore': 0, 'potentialMatchSwipe': 0,
+            }
+            for restaurant in restaurants
+        ]
+        for vote in votes:
+            vote['totalVotes'] = len(members) if status != 'CREATED' else 0
+            vote['positiveVotes'] = vote['score'] = rng.randint(0, vote['totalVotes'])
+        return {
+            **template,
+            '_id': self._id('sessions', number),
+            # Longer than the 6 characters the app generates, so they never collide
+            'joinCode': f"S{self.epoch:x}{number:x}".upper(),
+            'creator': self._id('users', members[0]),
+            'participants': [
+                {'_id': self.sink.object_id(bson_like_id(rng)), 'userId': self._id('users', member), 'preferences': []}
+                for member in dict.fromkeys(members)
+            ],
+            'pendingInvitations': [],
+            'status': status,
+            'settings': template.get('settings') or {'location': {'latitude': 49.26, 'longitude': -123.24, 'radius': 1000}},
+            'restaurants': votes,
+            'finalSelections': [],
+            'doneSwiping': [],
+            'createdAt': self.sink.date(created),
+            'expiresAt': self.sink.date(created + datetime.timedelta(minutes=20)),
+        }
+
+    def batches(self, collection, start, stop, batch_size):
+        """Yield lists of at most batch_size documents, numbered start..stop-1."""
+        build = {'users': self.user, 'restaurants': self.restaurant, 'sessions': self.session}[collection]
+        # Seeded per chunk, so a run is reproducible however the chunks are spread over the workers
+        rng = random.Random(f"{collection}-{start}")
+        for batch_start in range(start, stop, batch_size):
+            yield [build(number, rng) for number in range(batch_start, min(batch_start + batch_size, stop))]
+
+
+def bson_like_id(rng):
+    """A random ObjectId for embedded subdocuments, which mongoose gives an _id too."""
+    return f"{rng.getrandbits(96):024x}"
+
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+
+def _init_worker(uri, compose_files, templates, counts, epoch):
+    sink = PymongoSink(uri) if pymongo else MongoimportSink(uri, compose_files)
+    _worker['sink'] = sink
+    _worker['generator'] = Generator(templates, counts, epoch, sink)
+
+
+def _insert_chunk(task):
+    collection, start, stop, batch_size = task
+    began = time.time()
+    inserted, failed = _worker['sink'].insert(collection, _worker['generator'].batches(collection, start, stop, batch_size))
+    return collection, inserted, failed, began, time.time()
+
+
+def plan_chunks(counts, batch_size, chunk_size=CHUNK_SIZE):
+    """Split every collection into (collection, start, stop, batch_size) tasks, interleaved across collections."""
+    per_collection = [
+        [(collection, start, min(start + chunk_size, count), batch_size) for start in range(0, count, chunk_size)]
+        for collection, count in counts.items()
+    ]
+    tasks = []
+    for round_tasks in itertools.zip_longest(*per_collection):
+        tasks.extend(task for task in round_tasks if task)
+    return tasks
+
+
+def seed(counts, uri=DEFAULT_URI, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+         compose_files=('docker-compose.yml',), templates=None):
+    """Insert the documents with a pool of workers. Returns {collection: (inserted, failed, seconds)}."""
+    templates = templates or load_templates()
+    epoch = int(time.time())
+    tasks = plan_chunks(counts, batch_size)
+    results = {collection: [0, 0, None, None] for collection in counts}
+    total = sum(counts.values())
+    done = 0
+
+    with multiprocessing.Pool(workers, _init_worker, (uri, list(compose_files), templates, counts, epoch)) as pool:
+        for collection, inserted, failed, began, ended in pool.imap_unordered(_insert_chunk, tasks):
+            result = results[collection]
+            result[0] += inserted
+            result[1] += failed
+            result[2] = began if result[2] is None else min(result[2], began)
+            result[3] = ended if result[3] is None else max(result[3], ended)
+            done += inserted + failed
+            print(f"  {done:,}/{total:,} documents", end="\r", flush=True)
+    print()
+    return {
+        collection: (inserted, failed, (ended - began) if began is not None else 0.0)
+        for collection, (inserted, failed, began, ended) in results.items()
+    }
+
+
+def create_indexes(uri=DEFAULT_URI, compose_files=('docker-compose.yml',)):
+    """Create the INDEXES (a no-op for the ones that already exist). Returns True on success."""
+    if pymongo:
+        client = pymongo.MongoClient(uri)
+        try:
+            database = client.get_default_database('biteswipe')
+            for collection, keys, options in INDEXES:
+                database[collection].create_index(keys, **options)
+        finally:
+            client.close()
+        return True
+
+    database = urllib.parse.urlsplit(uri).path.strip('/') or 'biteswipe'
+    script = "".join(
+        f"db.getCollection({json.dumps(collection)}).createIndex({json.dumps(dict(keys))}, {json.dumps(options)});"
+        for collection, keys, options in INDEXES
+    )
+    compose = ['docker-compose'] + [arg for name in compose_files for arg in ('-f', name)]
+    result = subprocess.run(compose + ['exec', '-T', 'mongo', 'mongosh', '--quiet', database, '--eval', script],
+                            cwd=BACKEND_DIR, check=False)
+    return result.returncode == 0
+
+
+def drop_collections(uri=DEFAULT_URI, compose_files=('docker-compose.yml',)):
+    """Remove all documents of the seeded collections, like seedDatabase.ts does before loading."""
+    if pymongo:
+        client = pymongo.MongoClient(uri)
+        try:
+            database = client.get_default_database('biteswipe')
+            for collection in COLLECTIONS:
+                database.drop_collection(collection)
+        finally:
+            client.close()
+        return True
+
+    database = urllib.parse.urlsplit(uri).path.strip('/') or 'biteswipe'
+    script = "".join(f"db.getCollection({json.dumps(collection)}).drop();" for collection in COLLECTIONS)
+    compose = ['docker-compose'] + [arg for name in compose_files for arg in ('-f', name)]
+    return subprocess.run(compose + ['exec', '-T', 'mongo', 'mongosh', '--quiet', database, '--eval', script],
+                          cwd=BACKEND_DIR, check=False).returncode == 0
+
+
+def print_report(results):
+    print(f"\n{'collection':<12} {'inserted':>12} {'failed':>8} {'seconds':>9} {'docs/s':>10}")
+    print("-" * 55)
+    for collection, (inserted, failed, seconds) in results.items():
+        rate = inserted / seconds if seconds else 0.0
+        print(f"{collection:<12} {inserted:>12,} {failed:>8,} {seconds:>9.1f} {rate:>10,.0f}")
+
+
+def counts_for(scale, users=None, sessions=None, restaurants=None):
+    return {
+        'users': scale if users is None else users,
+        'restaurants': max(1, int(scale * RESTAURANT_RATIO)) if restaurants is None else restaurants,
+        'sessions': scale if sessions is None else sessions,
+    }
+
+
+def run(counts, uri=DEFAULT_URI, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+        drop=False, compose_files=('docker-compose.yml', SEED_COMPOSE_FILE)):
+    """Seed and index. Returns True if every document was inserted and the indexes were created."""
+    if counts['sessions'] and (not counts['users'] or not counts['restaurants']):
+        print("❌ Sessions need at least one user and one restaurant")
+        return False
+    print(f"\n🌱 Seeding {', '.join(f'{count:,} {collection}' for collection, count in counts.items())} "
+          f"with {workers} workers ({'pymongo' if pymongo else 'mongoimport'}, batches of {batch_size:,})...")
+    if drop and not drop_collections(uri, compose_files):
+        print("❌ Could not drop the existing collections")
+        return False
+
+    start = time.monotonic()
+    results = seed(counts, uri, workers, batch_size, compose_files)
+    print_report(results)
+    inserted = sum(result[0] for result in results.values())
+    elapsed = time.monotonic() - start
+    print(f"\n{inserted:,} documents in {elapsed:.1f}s, {inserted / elapsed if elapsed else 0:,.0f} docs/s")
+
+    index_start = time.monotonic()
+    indexed = create_indexes(uri, compose_files)
+    print(f"{'🗂️  Indexes created' if indexed else '❌ Creating the indexes failed'} "
+          f"in {time.monotonic() - index_start:.1f}s")
+    return indexed and not any(result[1] for result in results.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-seed the local Mongo with synthetic data.')
+    parser.add_argument('--scale', type=int, default=DEFAULT_SCALE,
+                        help=f'Users and sessions to generate, restaurants are a tenth (default: {DEFAULT_SCALE:,})')
+    parser.add_argument('--users', type=int, help='Users to generate (overrides --scale)')
+    parser.add_argument('--sessions', type=int, help='Sessions to generate (overrides --scale)')
+    parser.add_argument('--restaurants', type=int, help='Restaurants to generate (overrides --scale)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Worker processes (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Documents per bulk insert (default: {DEFAULT_BATCH_SIZE:,})')
+    parser.add_argument('--uri', default=DEFAULT_URI, help=f'Mongo URI for pymongo (default: {DEFAULT_URI})')
+    parser.add_argument('--drop', action='store_true', help='Drop the users, sessions and restaurants first')
+    args = parser.parse_args()
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error('--workers and --batch-size must be at least 1')
+
+    counts = counts_for(args.scale, args.users, args.sessions, args.restaurants)
+    sys.exit(0 if run(counts, args.uri, args.workers, args.batch_size, args.drop) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Redeploy the backend services on an existing VM without a Terraform run.
+
+The backend files are synced to the VM with rsync, so only files that changed
+are transferred. The itemized rsync output tells which files changed, and only
+the docker-compose services built from or mounting those files are rebuilt or
+recreated. Unchanged services keep running.
+"""
+
+import subprocess
+
+import command_runner
+import ssh_tunnel
+
+BACKEND_REMOTE_PATH = "/app/backend"
+# The sync and the restart share one multiplexed connection
+SSH_OPTIONS = " ".join([
+    "-o StrictHostKeyChecking=no -o ConnectTimeout=10 -o UserKnownHostsFile=/dev/null -o LogLevel=ERROR",
+    *ssh_tunnel.multiplex_options(),
+])
+
+# rsync filter rules for the files the services are built from. Everything
+# else (certificates, Firebase credentials, the .env written by Terraform,
+# node_modules, Terraform state) is excluded, which also protects the copies
+# already on the VM from --delete
+SYNC_FILTER_RULES = [
+    "+ /src/***",
+    "+ /package*.json",
+    "+ /tsconfig.json",
+    "+ /jest.config.js",
+    "+ /dockerfile",
+    "+ /docker-compose*.yml",
+    "+ /nginx/",
+    "+ /nginx/Dockerfile",
+    "+ /nginx/*-entrypoint/***",
+    "- *",
+]
+
+COMPOSE_FILES = {
+    "app": "docker-compose.yml",
+    "test": "docker-compose.test.yml",
+}
+# Service built from the backend image in each run mode
+BUILD_SERVICES = {
+    "app": "app",
+    "test": "test",
+}
+
+
+def rsync_command(host, key_path, backend_dir, user="adminuser", remote_path=BACKEND_REMOTE_PATH):
+    """Build the rsync command that mirrors the service files to the VM."""
+    command = [
+        "rsync",
+        "--recursive", "--links", "--perms", "--times", "--compress",
+        "--checksum",
+        "--delete",
+        "--itemize-changes",
+        # Machine-readable list of changes: the itemize string, then the path
+        "--out-format=%i %n",
+        "-e", f"ssh {SSH_OPTIONS} -i {key_path}",
+    ]
+    for rule in SYNC_FILTER_RULES:
+        command.append(f"--filter={rule}")
+    command.extend([f"{str(backend_dir).rstrip('/')}/", f"{user}@{host}:{remote_path}/"])
+    return command
+
+
+def parse_itemized_changes(lines):
+    """Return the paths rsync transferred or deleted, from its --itemize-changes output."""
+    changed = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith("*deleting "):
+            changed.append(line[len("*deleting "):].strip())
+            continue
+        item, _, path = line.partition(" ")
+        # Updates are '<' or '>' followed by the file type; directories only get attribute changes
+        if len(item) >= 9 and item[0] in "<>ch" and item[1] == "f":
+            changed.append(path)
+    return changed
+
+
+def sync_backend(host, key_path, backend_dir, user="adminuser", remote_path=BACKEND_REMOTE_PATH):
+    """Sync the service files to the VM. Returns the changed paths, or None if rsync failed."""
+    command = rsync_command(host, key_path, backend_dir, user, remote_path)
+    print(f"$ {command_runner.format_command(command)}")
+    result = subprocess.run(command, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        print(f"rsync failed with exit code {result.returncode}")
+        print(result.stderr)
+        return None
+
+    changed = parse_itemized_changes(result.stdout.splitlines())
+    for path in changed:
+        print(f"  changed: {path}")
+    return changed
+
+
+def services_for_changes(changed_paths, run_mode="app"):
+    """Map changed files to the docker-compose services that have to be rebuilt or recreated."""
+    services = set()
+    for path in changed_paths:
+        if path.startswith("nginx/"):
+            # nginx runs the stock image with its entrypoint and certificates mounted
+            if run_mode == "app":
+                services.add("nginx")
+        elif path.startswith("docker-compose"):
+            # `docker-compose up -d` recreates whatever the compose file change affects
+            continue
+        else:
+            services.add(BUILD_SERVICES[run_mode])
+    return sorted(services)
+
+
+def remote_restart_command(services, run_mode="app", remote_path=BACKEND_REMOTE_PATH):
+    """Build the shell command run on the VM to restart only the affected services."""
+    compose = f"docker-compose -f {COMPOSE_FILES[run_mode]}"
+    commands = [f"cd {remote_path}"]
+
+    if run_mode == "test":
+        # Tests always run again; the image is rebuilt from cache, so unchanged layers are reused
+        commands.append(f"{compose} up --build --remove-orphans --exit-code-from test test")
+        return " && ".join(commands)
+
+    for service in services:
+        if service == BUILD_SERVICES[run_mode]:
+            commands.append(f"{compose} up -d --build --no-deps {service}")
+        else:
+            # Mounted files only change inside a recreated container
+            commands.append(f"{compose} up -d --no-deps --force-recreate {service}")
+    # Start anything that is not running (e.g. after switching from test mode), leave the rest alone
+    commands.append(f"{compose} up -d --remove-orphans")
+    commands.append(f"{compose} ps")
+    return " && ".join(commands)
+
+
+def restart_services(host, key_path, services, run_mode="app", user="adminuser",
+                     remote_path=BACKEND_REMOTE_PATH, runner=None):
+    """Restart the given services on the VM. Returns True on success.
+
+    runner(command) runs the ssh command and returns True on success; by
+    default the output is streamed to the console.
+    """
+    command = [
+        "ssh", *SSH_OPTIONS.split(), "-i", str(key_path), f"{user}@{host}",
+        remote_restart_command(services, run_mode, remote_path),
+    ]
+    if runner is not None:
+        return runner(command)
+    return_code, _ = command_runner.stream_command(command)
+    return return_code == 0
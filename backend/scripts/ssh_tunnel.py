@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Shared SSH master connection to a deployed VM.
+
+One master connection (ControlMaster) is opened per host and kept alive in
+the background; commands, file copies and port forwards then run over it
+as multiplexed channels, without a new TCP connection or key exchange each.
+The same ControlPath is used by the SSH config entry that
+update_ssh_config_with_new_ips.py writes and by the deploy shell scripts,
+so they all share one master.
+
+Port forwards are added to and removed from the running master
+(`ssh -O forward` / `-O cancel`). A local port that is already taken by
+some other process is reported instead of killing that process.
+
+Usage:
+    ssh_tunnel.py debug [--local-port 9229] [--remote-port 9229]   # forward the Node inspector until Ctrl-C
+    ssh_tunnel.py run -- docker ps                                  # run a command over the master
+    ssh_tunnel.py copy <local path> <remote path>                   # copy files over the master
+    ssh_tunnel.py status | stop
+    (all take --host, default CPEN321_SERVER, plus --user and --ssh-key for a bare IP)
+
+Environment variables:
+    BITESWIPE_SSH_CONTROL_PATH   Socket of the master connections (default: ~/.ssh/cm-%C)
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+# %C is a hash of local host, remote host, port and user, short enough for a socket path
+CONTROL_PATH = os.getenv('BITESWIPE_SSH_CONTROL_PATH', '~/.ssh/cm-%C')
+# How long an idle master stays up after its last client has gone
+CONTROL_PERSIST = "10m"
+DEFAULT_HOST = "CPEN321_SERVER"
+DEBUG_PORT = 9229
+
+
+def multiplex_options(control_path=CONTROL_PATH, persist=CONTROL_PERSIST):
+    """ssh/scp options that reuse a master connection, or start one that persists."""
+    return [
+        "-o", "ControlMaster=auto",
+        "-o", f"ControlPath={control_path}",
+        "-o", f"ControlPersist={persist}",
+    ]
+
+
+def port_in_use(port, host="127.0.0.1"):
+    """Return True if something is listening on the local port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        return sock.connect_ex((host, port)) == 0
+
+
+class SshMaster:
+    """A master SSH connection to one host, and the channels multiplexed over it."""
+
+    def __init__(self, host=DEFAULT_HOST, user=None, key_path=None, control_path=CONTROL_PATH,
+                 persist=CONTROL_PERSIST, extra_options=()):
+        self.host = host
+        self.user = user
+        self.key_path = key_path
+        self.control_path = control_path
+        self.persist = persist
+        self.extra_options = list(extra_options)
+
+    @property
+    def destination(self):
+        return f"{self.user}@{self.host}" if self.user else self.host
+
+    def ssh_options(self):
+        """Options for any ssh/scp/rsync run against this host, so it goes through the master."""
+        options = multiplex_options(self.control_path, self.persist) + self.extra_options
+        if self.key_path:
+            options += ["-i", str(self.key_path)]
+        return options
+
+    def _control(self, operation, *options):
+        """Send a control command (check, forward, cancel, exit) to the running master."""
+        return subprocess.run(
+            ["ssh", "-o", f"ControlPath={self.control_path}", *options, "-O", operation, self.destination],
+            capture_output=True, text=True, check=False
+        )
+
+    def is_running(self):
+        return self._control("check").returncode == 0
+
+    def start(self):
+        """Open the master connection in the background, unless it is already up. Returns True on success."""
+        if self.is_running():
+            return True
+        result = subprocess.run(
+            ["ssh", *self.ssh_options(), "-o", "ControlMaster=yes", "-o", "ServerAliveInterval=30",
+             "-N", "-f", self.destination],
+            check=False
+        )
+        return result.returncode == 0
+
+    def stop(self):
+        """Close the master connection and every channel on it."""
+        return self._control("exit").returncode == 0
+
+    def run(self, command, check=False, **kwargs):
+        """Run a remote command over the master. Returns the CompletedProcess."""
+        return subprocess.run(["ssh", *self.ssh_options(), self.destination, command], check=check, **kwargs)
+
+    def copy(self, local_path, remote_path, recursive=True):
+        """Copy local files to the host over the master. Returns True on success."""
+        command = ["scp", *self.ssh_options()]
+        if recursive:
+            command.append("-r")
+        command += [str(local_path), f"{self.destination}:{remote_path}"]
+        return subprocess.run(command, check=False).returncode == 0
+
+    def _forward_spec(self, local_port, remote_port, remote_host):
+        return ["-L", f"{local_port}:{remote_host}:{remote_port}"]
+
+    def forward(self, local_port, remote_port, remote_host="localhost"):
+        """Add a local port forward to the running master. Returns True on success."""
+        if port_in_use(local_port):
+            print(f"Local port {local_port} is already in use, pick another one with --local-port")
+            return False
+        result = self._control("forward", *self._forward_spec(local_port, remote_port, remote_host))
+        if result.returncode != 0:
+            print(result.stderr.strip())
+        return result.returncode == 0
+
+    def cancel_forward(self, local_port, remote_port, remote_host="localhost"):
+        """Remove a port forward from the master, leaving the master itself running."""
+        return self._control("cancel", *self._forward_spec(local_port, remote_port, remote_host)).returncode == 0
+
+
+def debug_tunnel(master, local_port=DEBUG_PORT, remote_port=DEBUG_PORT):
+    """Forward the Node inspector port until interrupted. Returns the exit code."""
+    if not master.start():
+        print(f"❌ Could not connect to {master.destination}")
+        return 1
+    if not master.forward(local_port, remote_port):
+        return 1
+    print(f"🔌 Forwarding localhost:{local_port} -> {master.host}:{remote_port}, press Ctrl-C to stop")
+    # Stop on Ctrl-C and on SIGTERM alike
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            signal.pause()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        master.cancel_forward(local_port, remote_port)
+        print("Forward removed")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared SSH master connection to a deployed VM.')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help=f'SSH config host or address (default: {DEFAULT_HOST})')
+    parser.add_argument('--user', help='Remote user, when --host is an address')
+    parser.add_argument('--ssh-key', help='Private key, when --host is an address')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    debug_parser = subparsers.add_parser('debug', help='Forward the Node inspector port until Ctrl-C')
+    debug_parser.add_argument('--local-port', type=int, default=DEBUG_PORT)
+    debug_parser.add_argument('--remote-port', type=int, default=DEBUG_PORT)
+    run_parser = subparsers.add_parser('run', help='Run a remote command over the master')
+    run_parser.add_argument('remote_command', nargs=argparse.REMAINDER)
+    copy_parser = subparsers.add_parser('copy', help='Copy local files to the host over the master')
+    copy_parser.add_argument('local_path')
+    copy_parser.add_argument('remote_path')
+    subparsers.add_parser('status', help='Show whether the master connection is up')
+    subparsers.add_parser('stop', help='Close the master connection')
+    args = parser.parse_args()
+
+    master = SshMaster(args.host, args.user, args.ssh_key)
+    if args.action == 'debug':
+        sys.exit(debug_tunnel(master, args.local_port, args.remote_port))
+    if args.action == 'status':
+        running = master.is_running()
+        print(f"Master connection to {master.destination} is {'up' if running else 'down'}")
+        sys.exit(0 if running else 1)
+    if args.action == 'stop':
+        sys.exit(0 if master.stop() else 1)
+
+    if not master.start():
+        print(f"❌ Could not connect to {master.destination}")
+        sys.exit(1)
+    if args.action == 'run':
+        remote_command = args.remote_command[1:] if args.remote_command[:1] == ['--'] else args.remote_command
+        sys.exit(master.run(" ".join(remote_command)).returncode)
+    if args.action == 'copy':
+        sys.exit(0 if master.copy(args.local_path, args.remote_path) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
+#!/bin/bash
+# Forward the Node inspector (port 9229) of the deployed VM over the shared SSH master connection.
+# Uses the CPEN321_SERVER entry written to ~/.ssh/config by deploy_infra.py; pass e.g.
+# --host <ip> --user adminuser --ssh-key ~/.ssh/to_azure/CPEN321.pem for another VM,
+# and "debug --local-port 9230" if 9229 is taken locally.
 
-kill $(lsof -ti:9229) 2>/dev/null || true && \
-ssh-keygen -R hamaney-biteswipe.westus2.cloudapp.azure.com && \
-ssh \
-    -o StrictHostKeyChecking=no \
-    -N \
-    -L 9229:localhost:9229 \
-    -i ~/.ssh/to_azure/CPEN321.pem \
-    adminuser@hamaney-biteswipe.westus2.cloudapp.azure.com
\ No newline at end of file
+# The connection options go before the subcommand, so default to debug after them
+for arg in "$@"; do
+    case "$arg" in
+        debug|run|copy|status|stop) exec python3 "$(dirname "$0")/ssh_tunnel.py" "$@" ;;
+    esac
+done
+set -- "$@" debug
+exec python3 "$(dirname "$0")/ssh_tunnel.py" "$@"
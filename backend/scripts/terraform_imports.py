@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Generate Terraform `import {}` blocks for existing Azure resources.
+
+Instead of running `terraform import` once per resource (each run refreshes
+the providers and the state on its own), every resource that exists in Azure
+but is missing from the state is written into one generated file. The next
+`terraform plan` picks all of them up at once and `terraform apply` records
+them in the state.
+"""
+
+import pathlib
+import subprocess
+
+import azure_inventory
+import deploy_context
+import terraform_state
+
+# Determine the path to the terraform directory relative to the script
+script_dir = pathlib.Path(__file__).resolve().parent
+TERRAFORM_DIR = script_dir.parent / 'terraform'
+
+IMPORTS_FILE_NAME = 'imports_generated.tf'
+
+
+def get_expected_resources(owner_tag, subscription_id):
+    """Return the Terraform address and Azure id of every resource in main.tf."""
+    rg_id = f"/subscriptions/{subscription_id}/resourceGroups/{deploy_context.get_resource_group_name(owner_tag)}"
+    network_id = f"{rg_id}/providers/Microsoft.Network"
+    nic_id = f"{network_id}/networkInterfaces/{owner_tag}-biteswipe-nic"
+    nsg_id = f"{network_id}/networkSecurityGroups/{owner_tag}-biteswipe-nsg"
+
+    return [
+        ('azurerm_resource_group.rg', rg_id),
+        ('azurerm_virtual_network.vnet', f"{network_id}/virtualNetworks/{owner_tag}-biteswipe-network"),
+        ('azurerm_subnet.subnet', f"{network_id}/virtualNetworks/{owner_tag}-biteswipe-network/subnets/{owner_tag}-internal"),
+        ('azurerm_network_security_group.nsg', nsg_id),
+        ('azurerm_public_ip.public_ip', f"{network_id}/publicIPAddresses/{owner_tag}-biteswipe-public-ip"),
+        ('azurerm_network_interface.nic', nic_id),
+        ('azurerm_linux_virtual_machine.vm', f"{rg_id}/providers/Microsoft.Compute/virtualMachines/{owner_tag}-biteswipe"),
+        ('azurerm_network_interface_security_group_association.nic_nsg_association', f"{nic_id}|{nsg_id}"),
+    ]
+
+
+def association_exists(association_id):
+    """Check if the NIC in a NIC/NSG association id is attached to that NSG."""
+    nic_id, nsg_id = association_id.split('|')
+    result = subprocess.run(
+        ["az", "network", "nic", "show", "--ids", nic_id,
+         "--query", "networkSecurityGroup.id", "-o", "tsv"],
+        capture_output=True,
+        text=True,
+        check=False
+    )
+    return result.returncode == 0 and result.stdout.strip().lower() == nsg_id.lower()
+
+
+def find_missing_imports(owner_tag, subscription_id, terraform_dir=TERRAFORM_DIR):
+    """Return (address, id) pairs for resources that exist in Azure but not in the state."""
+    missing = []
+    for address, resource_id in get_expected_resources(owner_tag, subscription_id):
+        if terraform_state.is_in_terraform_state(address, terraform_dir):
+            print(f"Resource {address} already in Terraform state, skipping import.")
+            continue
+
+        azure_ids = resource_id.split('|')
+        if not all(azure_inventory.resource_exists_by_id(azure_id) for azure_id in azure_ids):
+            print(f"Resource {resource_id} does not exist in Azure, skipping...")
+            continue
+
+        # The association is not a resource of its own, ask the NIC about it
+        if len(azure_ids) > 1 and not association_exists(resource_id):
+            print(f"Resource {resource_id} does not exist in Azure, skipping...")
+            continue
+
+        missing.append((address, resource_id))
+    return missing
+
+
+def write_import_blocks(imports, terraform_dir=TERRAFORM_DIR):
+    """Write one import block per (address, id) pair, or remove the file if there are none."""
+    imports_file = pathlib.Path(terraform_dir) / IMPORTS_FILE_NAME
+    if not imports:
+        clear_import_blocks(terraform_dir)
+        return None
+
+    lines = ["# Generated by backend/scripts/terraform_imports.py - do not edit.\n"]
+    for address, resource_id in imports:
+        lines.extend([
+            "\n",
+            "import {\n",
+            f"  to = {address}\n",
+            f"  id = \"{resource_id}\"\n",
+            "}\n",
+        ])
+
+    with open(imports_file, 'w') as f:
+        f.writelines(lines)
+    print(f"Generated {imports_file.name} with {len(imports)} import block(s)")
+    return imports_file
+
+
+def clear_import_blocks(terraform_dir=TERRAFORM_DIR):
+    """Remove the generated import blocks so they don't refer to stale resources."""
+    imports_file = pathlib.Path(terraform_dir) / IMPORTS_FILE_NAME
+    if imports_file.exists():
+        imports_file.unlink()
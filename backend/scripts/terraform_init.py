@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Run `terraform init` only when it is needed, with a shared provider cache.
+
+Every script that touches the Terraform working directory used to run
+`terraform init` on its own, and each init could download the azurerm
+provider again. Now:
+
+- providers are kept in one plugin cache directory shared by all working
+  directories and runs (TF_PLUGIN_CACHE_DIR, default
+  ~/.terraform.d/plugin-cache), which CI can also cache between jobs
+- init is skipped entirely when the dependency lock file and the
+  `terraform {}` settings (required providers, backend) are unchanged since
+  the last successful init of the working directory
+
+Usage:
+    terraform_init.py [terraform_dir] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import re
+import subprocess
+import sys
+
+# Determine the path to the terraform directory relative to the script
+script_dir = pathlib.Path(__file__).resolve().parent
+TERRAFORM_DIR = script_dir.parent / 'terraform'
+
+DEFAULT_PLUGIN_CACHE_DIR = pathlib.Path.home() / '.terraform.d' / 'plugin-cache'
+LOCK_FILE_NAME = '.terraform.lock.hcl'
+# Kept inside .terraform so deleting that directory also forces a new init
+INIT_MARKER_FILE = pathlib.Path('.terraform') / 'biteswipe_init.json'
+
+
+def configure_plugin_cache():
+    """Point Terraform (and every terraform process started from here) at the shared plugin cache."""
+    cache_dir = pathlib.Path(os.environ.setdefault('TF_PLUGIN_CACHE_DIR', str(DEFAULT_PLUGIN_CACHE_DIR)))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # The lock file is generated on the first init rather than committed, and
+    # without this Terraform 1.4+ refuses to fill the lock file from the cache
+    os.environ.setdefault('TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE', 'true')
+    return cache_dir
+
+
+def _terraform_blocks(content):
+    """Return the text of every top-level `terraform { ... }` block."""
+    blocks = []
+    for match in re.finditer(r'^terraform\s*{', content, re.MULTILINE):
+        depth = 0
+        for end in range(match.end() - 1, len(content)):
+            if content[end] == '{':
+                depth += 1
+            elif content[end] == '}':
+                depth -= 1
+                if depth == 0:
+                    blocks.append(content[match.start():end + 1])
+                    break
+    return blocks
+
+
+def compute_init_fingerprint(terraform_dir=TERRAFORM_DIR):
+    """Hash everything `terraform init` depends on."""
+    terraform_dir = pathlib.Path(terraform_dir)
+    digest = hashlib.sha256()
+
+    lock_file = terraform_dir / LOCK_FILE_NAME
+    if lock_file.exists():
+        digest.update(lock_file.read_bytes())
+    digest.update(b"\0")
+
+    # Required providers, required version and backend configuration
+    for tf_file in sorted(terraform_dir.glob('*.tf')):
+        for block in _terraform_blocks(tf_file.read_text()):
+            digest.update(f"{tf_file.name}\0{block}\0".encode())
+
+    # Partial backend configuration passed in from outside
+    for backend_file in sorted(terraform_dir.glob('*.tfbackend')):
+        digest.update(f"{backend_file.name}\0".encode())
+        digest.update(backend_file.read_bytes())
+    digest.update(os.getenv('TF_CLI_ARGS_init', '').encode())
+
+    return digest.hexdigest()
+
+
+def is_initialized(terraform_dir=TERRAFORM_DIR):
+    """Check whether the last successful init of terraform_dir is still valid."""
+    terraform_dir = pathlib.Path(terraform_dir)
+    if not (terraform_dir / '.terraform' / 'providers').is_dir():
+        return False
+    try:
+        with open(terraform_dir / INIT_MARKER_FILE, 'r') as f:
+            marker = json.load(f)
+    except (FileNotFoundError, IOError, ValueError):
+        return False
+    return marker.get('fingerprint') == compute_init_fingerprint(terraform_dir)
+
+
+def _run_init(command, cwd):
+    """Default runner: fail loudly like the plain `terraform init` calls did."""
+    return subprocess.run(command, cwd=cwd, check=True).returncode == 0
+
+
+def init_terraform(terraform_dir=TERRAFORM_DIR, runner=_run_init, force=False):
+    """Run `terraform init` in terraform_dir unless it is already up to date.
+
+    runner(command, cwd) runs the command and returns True on success.
+    Returns True if the directory is initialized afterwards.
+    """
+    terraform_dir = pathlib.Path(terraform_dir)
+    configure_plugin_cache()
+
+    if not force and is_initialized(terraform_dir):
+        print("Terraform already initialized and providers unchanged, skipping init.")
+        return True
+
+    if not runner(["terraform", "init", "-input=false"], terraform_dir):
+        return False
+
+    # The lock file may have just been created, so fingerprint after init
+    with open(terraform_dir / INIT_MARKER_FILE, 'w') as f:
+        json.dump({'fingerprint': compute_init_fingerprint(terraform_dir)}, f, indent=2)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run terraform init only if needed, using a shared plugin cache.')
+    parser.add_argument('terraform_dir', nargs='?', default=str(TERRAFORM_DIR),
+                        help=f'Terraform working directory (default: {TERRAFORM_DIR})')
+    parser.add_argument('--force', action='store_true', help='Run terraform init even if it looks up to date')
+    args = parser.parse_args()
+
+    try:
+        initialized = init_terraform(args.terraform_dir, force=args.force)
+    except subprocess.CalledProcessError:
+        initialized = False
+    sys.exit(0 if initialized else 1)
+
+
+if __name__ == "__main__":
+    main()
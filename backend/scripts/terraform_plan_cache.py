@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Reuse saved Terraform plans between deploys.
+
+`terraform plan -detailed-exitcode` tells whether a plan has any changes.
+The result is saved next to the plan file together with a fingerprint of
+everything the plan was computed from: the Terraform configuration, the
+variables, the files shipped to the VM and the state it was planned against.
+
+On the next run, if the fingerprint and the state are unchanged, the plan
+does not have to be recomputed: an empty plan means apply can be skipped, and
+a non-empty one can be applied as is.
+"""
+
+import glob
+import hashlib
+import json
+import pathlib
+
+# Determine the path to the terraform directory relative to the script
+script_dir = pathlib.Path(__file__).resolve().parent
+TERRAFORM_DIR = script_dir.parent / 'terraform'
+
+PLAN_FILE_NAME = 'tfplan'
+PLAN_META_FILE_NAME = 'tfplan.meta.json'
+
+# Files that end up on the VM, relative to the backend directory.
+# Keep in sync with local.backend_file_patterns in terraform/main.tf
+BACKEND_FILE_PATTERNS = [
+    "src/**",
+    "package*.json",
+    "tsconfig.json",
+    "jest.config.js",
+    "dockerfile",
+    "docker-compose*.yml",
+    ".env",
+    "nginx/Dockerfile",
+    "nginx/*-entrypoint/*",
+    "terraform/deploy_services.sh",
+]
+
+# Exit codes of `terraform plan -detailed-exitcode`
+PLAN_NO_CHANGES = 0
+PLAN_HAS_CHANGES = 2
+
+
+def _hash_file(digest, path, label):
+    digest.update(label.encode())
+    digest.update(b"\0")
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    digest.update(b"\0")
+
+
+def _backend_files(backend_dir):
+    files = set()
+    for pattern in BACKEND_FILE_PATTERNS:
+        for match in glob.glob(pattern, root_dir=backend_dir, recursive=True):
+            if (backend_dir / match).is_file():
+                files.add(match)
+    return sorted(files)
+
+
+def compute_fingerprint(owner_tag, run_mode, terraform_dir=TERRAFORM_DIR, extra_files=(), backend_dir=None):
+    """Hash every input of a plan except the state.
+
+    backend_dir is the backend checkout being deployed, by default the parent
+    of terraform_dir.
+    """
+    terraform_dir = pathlib.Path(terraform_dir)
+    backend_dir = pathlib.Path(backend_dir) if backend_dir else terraform_dir.parent
+    digest = hashlib.sha256()
+    digest.update(f"owner_tag={owner_tag}\0run_mode={run_mode}\0backend_dir={backend_dir.resolve()}\0".encode())
+
+    # Configuration, including the generated import blocks, and the variables
+    for tf_file in sorted(terraform_dir.glob('*.tf')) + sorted(terraform_dir.glob('*.tfvars')):
+        _hash_file(digest, tf_file, f"terraform/{tf_file.name}")
+
+    # Files the deploy_backend trigger hashes
+    for relative_path in _backend_files(backend_dir):
+        _hash_file(digest, backend_dir / relative_path, relative_path)
+
+    # Files read by the configuration from outside the repository (e.g. the SSH public key)
+    for extra_file in extra_files:
+        extra_file = pathlib.Path(extra_file).expanduser()
+        if extra_file.is_file():
+            _hash_file(digest, extra_file, str(extra_file))
+
+    return digest.hexdigest()
+
+
+def read_state_version(terraform_dir=TERRAFORM_DIR):
+    """Return the lineage and serial of the local state, or None if there is no state."""
+    try:
+        with open(pathlib.Path(terraform_dir) / 'terraform.tfstate', 'r') as f:
+            state = json.load(f)
+    except (FileNotFoundError, IOError, ValueError):
+        return None
+    return {'lineage': state.get('lineage'), 'serial': state.get('serial')}
+
+
+def save_plan_meta(fingerprint, has_changes, terraform_dir=TERRAFORM_DIR):
+    """Record what the plan file in terraform_dir was computed from."""
+    meta = {
+        'fingerprint': fingerprint,
+        'state': read_state_version(terraform_dir),
+        'has_changes': has_changes,
+    }
+    with open(pathlib.Path(terraform_dir) / PLAN_META_FILE_NAME, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_reusable_plan(fingerprint, terraform_dir=TERRAFORM_DIR):
+    """Return the saved plan metadata if it still matches the inputs and the state, else None."""
+    terraform_dir = pathlib.Path(terraform_dir)
+    try:
+        with open(terraform_dir / PLAN_META_FILE_NAME, 'r') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, IOError, ValueError):
+        return None
+
+    if meta.get('fingerprint') != fingerprint:
+        return None
+    if meta.get('state') != read_state_version(terraform_dir):
+        return None
+    # A plan with changes can only be reused if the plan file is still there
+    if meta.get('has_changes') and not (terraform_dir / PLAN_FILE_NAME).exists():
+        return None
+    return meta
+
+
+def clear_plan(terraform_dir=TERRAFORM_DIR):
+    """Remove the saved plan and its metadata, e.g. once the plan has been applied."""
+    for name in (PLAN_FILE_NAME, PLAN_META_FILE_NAME):
+        path = pathlib.Path(terraform_dir) / name
+        if path.exists():
+            path.unlink()
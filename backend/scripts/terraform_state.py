@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+In-memory index of the resource addresses held in the Terraform state.
+
+A single `terraform show -json` snapshot answers every "already in state?"
+check. The snapshot is kept until something changes the state (an import),
+at which point the caller invalidates it and the next lookup reloads it.
+"""
+
+import json
+import pathlib
+import subprocess
+
+# Determine the path to the terraform directory relative to the script
+script_dir = pathlib.Path(__file__).resolve().parent
+TERRAFORM_DIR = script_dir.parent / 'terraform'
+
+# Snapshots keyed by the resolved terraform directory
+_state_indexes = {}
+
+
+def _collect_addresses(module, addresses):
+    """Add the addresses of a module and all of its child modules to the set."""
+    for resource in module.get('resources', []):
+        addresses.add(resource['address'])
+    for child_module in module.get('child_modules', []):
+        _collect_addresses(child_module, addresses)
+
+
+def load_state_addresses(terraform_dir=TERRAFORM_DIR):
+    """Read the Terraform state once and return the set of resource addresses."""
+    try:
+        result = subprocess.run(
+            ["terraform", "show", "-json"],
+            cwd=terraform_dir,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        state = json.loads(result.stdout or '{}')
+    except (subprocess.CalledProcessError, FileNotFoundError, json.JSONDecodeError) as e:
+        # If the state can't be read, treat it as empty
+        print(f"Warning: Could not read Terraform state: {e}")
+        return set()
+
+    addresses = set()
+    # An empty state has no "values" section at all
+    root_module = state.get('values', {}).get('root_module', {})
+    _collect_addresses(root_module, addresses)
+    return addresses
+
+
+def get_state_index(terraform_dir=TERRAFORM_DIR, refresh=False):
+    """Return the cached address index, loading it on first use or when refresh is set."""
+    key = str(pathlib.Path(terraform_dir).resolve())
+    if refresh or key not in _state_indexes:
+        _state_indexes[key] = load_state_addresses(terraform_dir)
+    return _state_indexes[key]
+
+
+def invalidate_state_index(terraform_dir=None):
+    """Drop the cached snapshot so the next lookup reads the state again."""
+    if terraform_dir is None:
+        _state_indexes.clear()
+    else:
+        _state_indexes.pop(str(pathlib.Path(terraform_dir).resolve()), None)
+
+
+def is_in_terraform_state(resource_address, terraform_dir=TERRAFORM_DIR):
+    """Check if a resource is already in the Terraform state."""
+    return resource_address in get_state_index(terraform_dir)
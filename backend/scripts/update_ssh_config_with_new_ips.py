@@ -1,57 +1,183 @@
 #!/usr/bin/env python3
+"""
+Update ~/.ssh/config with the hosts of deployed VMs.
 
-import sys
+The config is parsed once into host blocks, indexed by host name, so any
+number of hosts is upserted in a single pass; everything else in the file
+(comments, Match blocks, other hosts) is written back untouched. Updates
+hold an exclusive lock on ~/.ssh/config.lock and replace the file
+atomically (temp file plus rename), so concurrent deploys can neither
+corrupt the config nor lose each other's entries.
+
+Usage from Python:
+    import update_ssh_config_with_new_ips as ssh_config
+    ssh_config.update_hosts({
+        "CPEN321_SERVER": ssh_config.host_options("20.1.2.3", "~/.ssh/to_azure/CPEN321.pem"),
+    })
+
+Usage from the command line:
+    update_ssh_config_with_new_ips.py <host_name> <ip_address> <key_path> [<host_name> <ip_address> <key_path> ...]
+"""
+
+import contextlib
+import fcntl
 import os
 import pathlib
+import sys
+import tempfile
+
+import ssh_tunnel
+
+SSH_USER = "adminuser"
+
+
+def default_config_path():
+    return pathlib.Path.home() / '.ssh' / 'config'
+
+
+def host_options(ip_address, key_path, user=SSH_USER):
+    """The options written for a deployed VM, in the order they appear in its block.
+
+    Connections share one master connection (see ssh_tunnel.py), so only the
+    first one pays for the TCP handshake and key exchange.
+    """
+    return {
+        'HostName': ip_address,
+        'User': user,
+        'IdentityFile': str(key_path),
+        'StrictHostKeyChecking': 'no',
+        'ControlMaster': 'auto',
+        'ControlPath': ssh_tunnel.CONTROL_PATH,
+        'ControlPersist': ssh_tunnel.CONTROL_PERSIST,
+        'ServerAliveInterval': '30',
+    }
+
+
+class SshConfig:
+    """An SSH config split into a preamble and Host/Match blocks, with Host blocks indexed by name."""
+
+    def __init__(self, text=""):
+        self.preamble = []
+        self.blocks = []
+        # Host name -> index in self.blocks, for blocks with a single host pattern
+        self.index = {}
+        for line in text.splitlines(keepends=True):
+            keyword = line.strip().split(None, 1)[0].lower() if line.strip() else ''
+            if keyword in ('host', 'match'):
+                self.blocks.append([line])
+                patterns = line.split()[1:]
+                if keyword == 'host' and len(patterns) == 1:
+                    self.index[patterns[0]] = len(self.blocks) - 1
+            elif self.blocks:
+                self.blocks[-1].append(line)
+            else:
+                self.preamble.append(line)
 
-def update_ssh_config(host_name, ip_address, key_path):
+    @staticmethod
+    def _render_block(host_name, options):
+        return [f"Host {host_name}\n"] + [f"    {key} {value}\n" for key, value in options.items()]
+
+    def upsert(self, host_name, options):
+        """Replace the block of host_name, or append one. Returns True if the config changed."""
+        block = self._render_block(host_name, options)
+        position = self.index.get(host_name)
+        if position is None:
+            if self.blocks and self.blocks[-1] and self.blocks[-1][-1].strip():
+                # Keep a blank line between the previous block and the new one
+                self.blocks[-1].append("\n")
+            elif not self.blocks and self.preamble and self.preamble[-1].strip():
+                self.preamble.append("\n")
+            self.blocks.append(block)
+            self.index[host_name] = len(self.blocks) - 1
+            return True
+
+        # Keep the blank lines and comments that trail the old block
+        old_block = self.blocks[position]
+        trailing = []
+        for line in reversed(old_block[1:]):
+            if line.strip() and not line.strip().startswith('#'):
+                break
+            trailing.insert(0, line)
+        if old_block[:len(old_block) - len(trailing)] == block:
+            return False
+        self.blocks[position] = block + trailing
+        return True
+
+    def hosts(self):
+        return list(self.index)
+
+    def render(self):
+        lines = list(self.preamble)
+        for block in self.blocks:
+            lines.extend(block)
+        text = "".join(lines)
+        return text if not text or text.endswith("\n") else text + "\n"
+
+
+@contextlib.contextmanager
+def locked_config(config_path):
+    """Hold an exclusive lock for read-modify-write of the config, shared with other deploys."""
+    config_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    with open(config_path.parent / f"{config_path.name}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def write_atomically(config_path, text):
+    """Write the config to a temp file next to it and rename it into place."""
+    mode = config_path.stat().st_mode & 0o777 if config_path.exists() else 0o600
+    fd, temp_name = tempfile.mkstemp(dir=config_path.parent, prefix=f".{config_path.name}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_name, mode)
+        os.replace(temp_name, config_path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+def update_hosts(hosts, config_path=None):
+    """Upsert several hosts ({host name: options}) in one locked read-modify-write.
+
+    Returns the names of the hosts whose block changed; the file is only
+    rewritten if there are any.
+    """
+    # Follow a symlinked config so the rename replaces the real file
+    config_path = pathlib.Path(config_path or default_config_path()).expanduser().resolve()
+    with locked_config(config_path):
+        try:
+            text = config_path.read_text()
+        except FileNotFoundError:
+            text = ""
+        config = SshConfig(text)
+        changed = [host_name for host_name, options in hosts.items() if config.upsert(host_name, options)]
+        if changed:
+            write_atomically(config_path, config.render())
+    return changed
+
+
+def update_ssh_config(host_name, ip_address, key_path, config_path=None):
     """Update ~/.ssh/config with the new host configuration."""
-    ssh_config_path = pathlib.Path.home() / '.ssh' / 'config'
-    
-    # Create config file if it doesn't exist
-    if not ssh_config_path.exists():
-        ssh_config_path.parent.mkdir(parents=True, exist_ok=True)
-        ssh_config_path.touch()
-
-    # Read existing config
-    with open(ssh_config_path, 'r') as f:
-        lines = f.readlines()
-
-    # Remove existing host configuration if present
-    new_lines = []
-    skip = False
-    for line in lines:
-        if line.strip().startswith('Host ' + host_name):
-            skip = True
-            continue
-        if skip and line.strip().startswith('Host '):
-            skip = False
-        if not skip:
-            new_lines.append(line)
-
-    # Add new host configuration
-    new_lines.extend([
-        f'\nHost {host_name}\n',
-        f'    HostName {ip_address}\n',
-        f'    User adminuser\n',
-        f'    IdentityFile {key_path}\n',
-        f'    StrictHostKeyChecking no\n'
-    ])
-
-    # Write updated config
-    with open(ssh_config_path, 'w') as f:
-        f.writelines(new_lines)
+    return update_hosts({host_name: host_options(ip_address, key_path)}, config_path)
+
 
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: update_ssh_config.py <host_name> <ip_address> <key_path>")
+    args = sys.argv[1:]
+    if not args or len(args) % 3:
+        print("Usage: update_ssh_config_with_new_ips.py <host_name> <ip_address> <key_path> "
+              "[<host_name> <ip_address> <key_path> ...]")
         sys.exit(1)
 
-    host_name = sys.argv[1]
-    ip_address = sys.argv[2]
-    key_path = sys.argv[3]
-
-    update_ssh_config(host_name, ip_address, key_path)
+    hosts = {
+        args[i]: host_options(args[i + 1], args[i + 2])
+        for i in range(0, len(args), 3)
+    }
+    changed = update_hosts(hosts)
+    print(f"Updated SSH config for {', '.join(changed)}" if changed else "SSH config already up to date")
 
 if __name__ == "__main__":
     main()
@@ -21,19 +21,23 @@ fi
 echo "Extracted MongoDB settings: Host=${DB_HOST}, Port=${DB_PORT}, DB=${DB_NAME}"
 
 
-echo "Database is empty or force seeding is enabled - running seed script..."
-  
-# Export DB_URI for the seed script to use
-export DB_URI
-
-# Run the seed script with current environment
-node -r dotenv/config ./node_modules/.bin/ts-node src/scripts/seedDatabase.ts
-
-if [ $? -eq 0 ]; then
-  echo "Database seeded successfully"
+if [ "${SKIP_DB_SEED}" = "true" ]; then
+  echo "SKIP_DB_SEED is set - keeping the existing data"
 else
-  echo "Error: Database seeding failed"
-  # Continue anyway - the app might work with existing data
+  echo "Database is empty or force seeding is enabled - running seed script..."
+  
+  # Export DB_URI for the seed script to use
+  export DB_URI
+
+  # Run the seed script with current environment
+  node -r dotenv/config ./node_modules/.bin/ts-node src/scripts/seedDatabase.ts
+
+  if [ $? -eq 0 ]; then
+    echo "Database seeded successfully"
+  else
+    echo "Error: Database seeding failed"
+    # Continue anyway - the app might work with existing data
+  fi
 fi
 
 # Start the application with the current environment
@@ -13,6 +13,8 @@ echo "[**********************] Service deployment [**********************]"
 # Fixed configuration values
 SSH_KEY="$HOME/.ssh/to_azure/CPEN321.pem"
 SSH_OPTS="-o StrictHostKeyChecking=no -o ConnectTimeout=10 -o UserKnownHostsFile=/dev/null -o LogLevel=ERROR"
+# Reuse one multiplexed connection for every check and command (see scripts/ssh_tunnel.py)
+SSH_OPTS="$SSH_OPTS -o ControlMaster=auto -o ControlPath=$HOME/.ssh/cm-%C -o ControlPersist=10m"
 BACKEND_REMOTE_PATH="/app/backend"
 
 # VM_IP is required
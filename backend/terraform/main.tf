@@ -19,6 +19,12 @@ resource "azurerm_resource_group" "rg" {
 
   tags = {
     owner = var.owner_tag
+    # Creation time, used by scripts/gc_environments.py to find stale environments
+    created = timestamp()
+  }
+
+  lifecycle {
+    ignore_changes = [tags["created"]]
   }
 }
 
@@ -196,12 +202,37 @@ resource "azurerm_linux_virtual_machine" "vm" {
 # Add locals block for environment variables
 locals {
   # Read and extract Google Maps API key from .env
-  env_content = file("${path.module}/../.env")
+  # Backend checkout the deployment is built from. Isolated working copies of
+  # this directory (see deploy_infra.py --prefixes) pass it in explicitly
+  backend_dir = coalesce(var.backend_dir, abspath("${path.module}/.."))
+
+  env_content = file("${local.backend_dir}/.env")
   google_maps_api_key = trimspace(replace(
     regexall("GOOGLE_MAPS_API_KEY=[^\n]*", local.env_content)[0],
     "GOOGLE_MAPS_API_KEY=", 
     ""
   ))
+
+  # Files that end up on the VM, relative to the backend directory.
+  # Keep in sync with BACKEND_FILE_PATTERNS in scripts/terraform_plan_cache.py
+  backend_file_patterns = [
+    "src/**",
+    "package*.json",
+    "tsconfig.json",
+    "jest.config.js",
+    "dockerfile",
+    "docker-compose*.yml",
+    ".env",
+    "nginx/Dockerfile",
+    "nginx/*-entrypoint/*",
+    "terraform/deploy_services.sh",
+  ]
+  backend_files = sort(distinct(flatten([
+    for pattern in local.backend_file_patterns : tolist(fileset(local.backend_dir, pattern))
+  ])))
+  backend_hash = sha1(join("\n", [
+    for f in local.backend_files : "${f}:${filesha1("${local.backend_dir}/${f}")}"
+  ]))
 }
 
 # Add Azure storage blob data source and download step for Firebase cert
@@ -230,8 +261,12 @@ data "azurerm_storage_blob" "ssl_key" {
 
 # Separate deployment resource that can be triggered independently
 resource "null_resource" "deploy_backend" {
+  # Redeploy only when something that is shipped to the VM changes, so an
+  # unchanged environment produces an empty plan
   triggers = {
-    always_run = "${timestamp()}"
+    vm_id        = azurerm_linux_virtual_machine.vm.id
+    run_mode     = var.run_mode
+    backend_hash = local.backend_hash
   }
 
   provisioner "local-exec" {
@@ -246,8 +281,9 @@ resource "null_resource" "deploy_backend" {
       SSH_KEY="$HOME/.ssh/to_azure/CPEN321.pem"
       VM_IP="${azurerm_public_ip.public_ip.ip_address}"
       VM_FQDN="${azurerm_public_ip.public_ip.fqdn}"
-      SSH_OPTS="-o StrictHostKeyChecking=no -o ConnectTimeout=10"
-      BACKEND_PATH="$(pwd)/../../backend"
+      # Every ssh/scp of the deploy shares one multiplexed connection (see scripts/ssh_tunnel.py)
+      SSH_OPTS="-o StrictHostKeyChecking=no -o ConnectTimeout=10 -o ControlMaster=auto -o ControlPath=$HOME/.ssh/cm-%C -o ControlPersist=10m"
+      BACKEND_PATH="${local.backend_dir}"
       BACKEND_REMOTE_PATH="/app/backend"
 
       # Print configuration information
@@ -260,55 +296,29 @@ resource "null_resource" "deploy_backend" {
       ls -l $SSH_KEY
       chmod 600 $SSH_KEY
       
-      # Wait for SSH connectivity
-      echo "[Deploy] Waiting for SSH to become available..."
-      for i in $(seq 1 30); do
-        if ssh $SSH_OPTS -i $SSH_KEY adminuser@$VM_IP "echo 'SSH connection successful'" 2>/dev/null; then
-          echo "[Deploy] SSH is now available"
-          break
-        fi
-        echo "[Deploy] Attempt $i: Waiting for SSH... (VM_IP=$VM_IP)"
-        sleep 10
-        if [ $i -eq 30 ]; then
-          echo "[Deploy] Failed to establish SSH connection after 30 attempts"
-          exit 1
-        fi
-      done
-      
-      # Wait for VM setup to complete
-      echo "[Deploy] Waiting for setup script to complete..."
-      for i in $(seq 1 30); do
-        if ssh $SSH_OPTS -i $SSH_KEY adminuser@$VM_IP "test -f /tmp/setup_complete && echo 'Setup complete file found'"; then
-          echo "[Deploy] Setup script completed successfully"
-          break
-        fi
-        echo "[Deploy] Attempt $i: Setup still in progress..."
-        # Check if we can see the cloud-init log
-        ssh $SSH_OPTS -i $SSH_KEY adminuser@$VM_IP "sudo tail -n 5 /var/log/cloud-init-output.log" || echo "Could not read cloud-init log"
-        sleep 10
-        if [ $i -eq 30 ]; then
-          echo "[Deploy] Failed to complete setup after 30 attempts"
+      # Wait for SSH and the VM setup script, probing on short jittered intervals
+      echo "[Deploy] Waiting for SSH and the setup script to complete..."
+      python3 "${local.backend_dir}/scripts/readiness.py" \
+        --host "$VM_IP" \
+        --ssh-key "$SSH_KEY" \
+        --skip-https \
+        --deadline 600 || {
+          echo "[Deploy] VM did not become ready, last cloud-init output:"
+          ssh $SSH_OPTS -i $SSH_KEY adminuser@$VM_IP "sudo tail -n 20 /var/log/cloud-init-output.log" || echo "Could not read cloud-init log"
           exit 1
-        fi
-      done
+        }
       
       # Verify Docker installation
       echo "[Deploy] Verifying Docker setup..."
       ssh $SSH_OPTS -i $SSH_KEY adminuser@$VM_IP "~/setup_docker.sh"
       
       echo "[Deploy] Waiting for Docker verification..."
-      for i in $(seq 1 10); do
-        if ssh $SSH_OPTS -i $SSH_KEY adminuser@$VM_IP "test -f /tmp/docker_verified"; then
-          echo "[Deploy] Docker verified successfully"
-          break
-        fi
-        echo "[Deploy] Attempt $i: Waiting for Docker verification..."
-        sleep 5
-        if [ $i -eq 10 ]; then
-          echo "[Deploy] Failed to verify Docker after 10 attempts"
-          exit 1
-        fi
-      done
+      python3 "${local.backend_dir}/scripts/readiness.py" \
+        --host "$VM_IP" \
+        --ssh-key "$SSH_KEY" \
+        --marker /tmp/docker_verified \
+        --skip-https \
+        --deadline 60
       
       echo "[Deploy] Setup and connectivity phase completed successfully!"
       echo [**********************] Setup and initial connectivity checks [**********************]
@@ -326,8 +336,9 @@ EOF
       # --- Configuration ---
       SSH_KEY="$HOME/.ssh/to_azure/CPEN321.pem"
       VM_IP="${azurerm_public_ip.public_ip.ip_address}"
-      SSH_OPTS="-o StrictHostKeyChecking=no -o ConnectTimeout=10"
-      BACKEND_PATH="$(pwd)/../../backend"
+      # Every ssh/scp of the deploy shares one multiplexed connection (see scripts/ssh_tunnel.py)
+      SSH_OPTS="-o StrictHostKeyChecking=no -o ConnectTimeout=10 -o ControlMaster=auto -o ControlPath=$HOME/.ssh/cm-%C -o ControlPersist=10m"
+      BACKEND_PATH="${local.backend_dir}"
       BACKEND_REMOTE_PATH="/app/backend"
       
       # Create environment file
@@ -356,8 +367,9 @@ EOF
       # --- Configuration ---
       SSH_KEY="$HOME/.ssh/to_azure/CPEN321.pem"
       VM_IP="${azurerm_public_ip.public_ip.ip_address}"
-      SSH_OPTS="-o StrictHostKeyChecking=no -o ConnectTimeout=10"
-      BACKEND_PATH="$(pwd)/../../backend"
+      # Every ssh/scp of the deploy shares one multiplexed connection (see scripts/ssh_tunnel.py)
+      SSH_OPTS="-o StrictHostKeyChecking=no -o ConnectTimeout=10 -o ControlMaster=auto -o ControlPath=$HOME/.ssh/cm-%C -o ControlPersist=10m"
+      BACKEND_PATH="${local.backend_dir}"
       BACKEND_REMOTE_PATH="/app/backend"
       
       # Copy backend files to VM
@@ -431,7 +443,7 @@ EOF
     command = <<EOF
       #!/bin/bash
       # Run the deployment script with the VM IP address - using absolute path
-      bash "${path.module}/deploy_services.sh" --vm-ip="${azurerm_public_ip.public_ip.ip_address}" --run-mode="${var.run_mode}"
+      bash "${local.backend_dir}/terraform/deploy_services.sh" --vm-ip="${azurerm_public_ip.public_ip.ip_address}" --run-mode="${var.run_mode}"
 EOF
   }
 
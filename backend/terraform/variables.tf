@@ -62,3 +62,9 @@ variable "run_mode" {
     error_message = "The run_mode must be either 'test' or 'app'."
   }
 }
+
+variable "backend_dir" {
+  description = "Absolute path of the backend directory to deploy, defaults to the parent of the Terraform directory"
+  type        = string
+  default     = null
+}